@@ -1,5 +1,10 @@
 # agent/agent.py
-import os, base64, json, datetime, sys, requests, yaml
+# requests / yaml are imported on first use: most invocations need only one of them,
+# and `python agent/bench.py --startup` keeps the import cost of this module in check.
+import os, base64, contextlib, copy, hashlib, hmac, json, datetime, math, re, sys, time, atexit, random, threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+from urllib.parse import urlencode
 
 # ===== Apps Script + Make blueprint constants =====
 APPS_SCRIPT_CODE_GS = r"""/* Apps Script Web App (listener) */
@@ -18,7 +23,7 @@ function doPost(e) {
       const sheetName = body.sheetName || "GOTM_Votes";
       const ss = SpreadsheetApp.getActiveSpreadsheet();
       const sh = ss.getSheetByName(sheetName) || ss.insertSheet(sheetName);
-      sh.appendRow([now, body.player || "", body.source || "", body.meta ? JSON.stringify(body.meta) : ""]);
+      sh.appendRow([now, body.player || "", body.source || "", body.meta ? JSON.stringify(body.meta) : "", body.voter || ""]);
       return ContentService.createTextOutput(JSON.stringify({ok:true, wrote:true}))
                            .setMimeType(ContentService.MimeType.JSON);
     }
@@ -32,6 +37,43 @@ function doPost(e) {
                            .setMimeType(ContentService.MimeType.JSON);
     }
 
+    // Many rows per request: {type, id, sheetName?, items:[{ts, player, source, meta, voter} | {ts, text}]}.
+    // One setValues per batch; a retried batch id is acknowledged without writing twice.
+    if (type === "gotm_vote_batch" || type === "live_update_batch") {
+      const isVote = type === "gotm_vote_batch";
+      const items = Array.isArray(body.items) ? body.items : [];
+      const rows = items.map(function (it) {
+        return isVote
+          ? [it.ts || now, it.player || "", it.source || "", it.meta ? JSON.stringify(it.meta) : "", it.voter || ""]
+          : [it.ts || now, it.text || ""];
+      });
+      const cache = CacheService.getScriptCache();
+      const key = body.id ? "batch:" + body.id : null;
+      // Check, write and mark the batch id under one lock: a client retry that arrives while the
+      // first request is still writing waits here and then sees the id. getLastRow + setValues
+      // must not interleave with another batch either.
+      const lock = LockService.getScriptLock();
+      lock.waitLock(30000);
+      try {
+        if (key && cache.get(key)) {
+          return ContentService.createTextOutput(JSON.stringify({ok:true, wrote:0, duplicate:true}))
+                               .setMimeType(ContentService.MimeType.JSON);
+        }
+        if (rows.length) {
+          const ss = SpreadsheetApp.getActiveSpreadsheet();
+          const sheetName = body.sheetName || (isVote ? "GOTM_Votes" : "LiveLog");
+          const sh = ss.getSheetByName(sheetName) || ss.insertSheet(sheetName);
+          sh.getRange(sh.getLastRow() + 1, 1, rows.length, rows[0].length).setValues(rows);
+          SpreadsheetApp.flush();   // rows are committed before the id is marked and the lock released
+        }
+        if (key) cache.put(key, "1", 21600);
+      } finally {
+        lock.releaseLock();
+      }
+      return ContentService.createTextOutput(JSON.stringify({ok:true, wrote:rows.length}))
+                           .setMimeType(ContentService.MimeType.JSON);
+    }
+
     return ContentService.createTextOutput(JSON.stringify({ok:false, msg:"unknown type"}))
                          .setMimeType(ContentService.MimeType.JSON);
   } catch (err) {
@@ -69,8 +111,9 @@ APPS_SCRIPT_README = r"""# Apps Script Web App (Listener)
 
 What it does:
 - type=test_ping → {ok:true}
-- type=gotm_vote → appends to GOTM_Votes
+- type=gotm_vote → appends [timestamp, player, source, meta, voter] to GOTM_Votes
 - type=live_update → appends to LiveLog
+- type=gotm_vote_batch / live_update_batch → many rows (`items`) with one setValues; a repeated batch `id` is ignored
 
 Optional: in Project Settings → Script properties set MAKE_WEBHOOK_URL to enable postToMake(payload).
 """
@@ -83,7 +126,7 @@ MAKE_BLUEPRINT_GOTM = r"""{
     {"id": 2, "name": "Google Sheets - Add row", "type": "google-sheets-add-row",
       "metadata": {"label": "Append row to GOTM_Votes"},
       "mapper": {"spreadsheet": "SELECT_AT_IMPORT", "sheet": "GOTM_Votes",
-                 "values": [{"value": "{{now}}"}, {"value": "{{player}}"}, {"value": "{{source}}"}, {"value": "{{json}}"}]}}
+                 "values": [{"value": "{{now}}"}, {"value": "{{player}}"}, {"value": "{{source}}"}, {"value": "{{json}}"}, {"value": "{{voter}}"}]}}
   ],
   "links": [{"from_module":1,"to_module":2}]
 }
@@ -100,7 +143,7 @@ MAKE_BLUEPRINT_LIVE = r"""{
                  "method": "POST",
                  "headers": [{"name":"Authorization","value":"Bearer {{secrets.AGENT_GH_TOKEN}}"},
                              {"name":"Accept","value":"application/vnd.github+json"}],
-                 "body": "{\"body\":\"/update live {\\\"updated\\\":\\\"{{now}}\\\",\\\"text\\\":\\\"{{text}}\\\"}\"}"}}
+                 "body": "{\"body\":\"/live note {{text}}\"}"}}
   ],
   "links": [{"from_module":1,"to_module":2}]
 }
@@ -113,73 +156,1061 @@ env_owner, env_repo = (repo_env.split("/", 1) + ["", ""])[:2]
 GH_OWNER = os.getenv("GH_OWNER") or env_owner or "your-username"
 GH_REPO  = os.getenv("GH_REPO")  or env_repo  or "your-repo"
 TOKEN = os.getenv("AGENT_GH_TOKEN") or os.getenv("GITHUB_TOKEN", "")
-API = "https://api.github.com"
+# GitHub starts no workflows from pushes made with the Actions GITHUB_TOKEN (workflow_dispatch
+# is the exception), so site-deploy.yml's push trigger is only relied on for a PAT, or for a
+# GitHub App token when AGENT_TOKEN_STARTS_WORKFLOWS=true (its ghs_ prefix matches GITHUB_TOKEN's).
+_starts = os.getenv("AGENT_TOKEN_STARTS_WORKFLOWS")
+TOKEN_STARTS_WORKFLOWS = (_starts.lower() in ("1", "true", "yes") if _starts
+                          else TOKEN.startswith(("ghp_", "github_pat_")))
+API = (os.getenv("AGENT_API_URL") or "https://api.github.com").rstrip("/")   # override for agent/fakehub.py
+
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", ".agent-cache")   # restored between runs by actions/cache
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+def get_session():
+    """The pooled requests.Session, created (and `requests` imported) on first use."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            s = requests.Session()
+            if TOKEN:
+                s.headers.update({"Authorization": f"Bearer {TOKEN}"})
+            s.headers.update({"Accept": "application/vnd.github+json"})
+            _SESSION = s
+    return _SESSION
+
+# ---------- Config ----------
+CONFIG_PATH = os.getenv("AGENT_CONFIG") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yml")
+DEFAULT_ENSURE_FILES = (
+    "site/data/table.json",
+    "site/data/live.json",
+    "site/data/fixtures.json",
+    "site/data/results.json",
+    "site/data/stats.json",
+)
+_EMPTY = MappingProxyType({})
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class Config(namedtuple("Config", [
+        "timezone",                 # str
+        "ensure_files",             # tuple[str]
+        "deploy_debounce_seconds",  # float
+        "deploy_push_branches",     # tuple[str]
+        "gotm_vote_window_days",    # int
+        "gotm_channels",            # tuple[str]
+        "raw",                      # read-only mapping of the whole file
+])):
+    """agent/config.yml, parsed once into an immutable object."""
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        raw = _freeze(data if isinstance(data, dict) else {})
+        site, gotm = raw.get("site") or _EMPTY, raw.get("gotm") or _EMPTY
+        def get(section, key, default):
+            # Only a missing key (or `key:` with no value) falls back: 0 and [] are kept.
+            value = section.get(key)
+            return default if value is None else value
+        return cls(
+            timezone=str(raw.get("timezone") or "Europe/London"),
+            ensure_files=tuple(get(site, "ensure_files", DEFAULT_ENSURE_FILES)),
+            deploy_debounce_seconds=float(get(site, "deploy_debounce_seconds", 0)),
+            deploy_push_branches=tuple(get(site, "deploy_push_branches", ("main",))),
+            gotm_vote_window_days=int(get(gotm, "vote_window_days", 7)),
+            gotm_channels=tuple(get(gotm, "channels", ())),
+            raw=raw,
+        )
+
+    def section(self, name):
+        return self.raw.get(name) or _EMPTY
+
+_CONFIG = None
+def load_cfg(path=None):
+    """
+    (Re)load optional agent/config.yml to customize behavior. A missing or unparseable
+    file means defaults; PyYAML not being installed is an error, not silently ignored.
+    """
+    global _CONFIG
+    import yaml
+    path = path or CONFIG_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        data = {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Ignoring {path}: {e}")
+        data = {}
+    _CONFIG = Config.from_dict(data)
+    return _CONFIG
+
+def cfg():
+    return _CONFIG if _CONFIG is not None else load_cfg()
+
+# ---------- Tracing ----------
+TRACE_PATH = os.getenv("AGENT_TRACE_PATH", os.path.join(CACHE_DIR, "trace.jsonl"))
+TRACE_KEEP_LINES = 20000
+
+ENDPOINT_PATTERNS = [
+    (re.compile(r"/contents/.+"), "/contents/{path}"),
+    (re.compile(r"/git/(ref|refs)/heads/.+"), r"/git/\1/heads/{branch}"),
+    (re.compile(r"/git/(blobs|commits|trees)/[^/]+"), r"/git/\1/{sha}"),
+    (re.compile(r"/(issues|pulls)/\d+"), r"/\1/{n}"),
+]
+
+def endpoint_template(url):
+    """api.github.com/repos/o/r/contents/site/data/x.json → /contents/{path}"""
+    repo_prefix = f"{API}/repos/{GH_OWNER}/{GH_REPO}"
+    if url.startswith(repo_prefix):
+        path = url[len(repo_prefix):].split("?", 1)[0] or "/"
+    elif url.startswith(API):
+        path = url[len(API):].split("?", 1)[0]
+    else:
+        return "(external)"
+    for pattern, template in ENDPOINT_PATTERNS:
+        path = pattern.sub(template, path)
+    return path
 
-SESSION = requests.Session()
-if TOKEN:
-    SESSION.headers.update({"Authorization": f"Bearer {TOKEN}"})
-SESSION.headers.update({"Accept": "application/vnd.github+json"})
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
 
-CFG = {}
-def load_cfg():
-    """Load optional agent/config.yml to customize behavior."""
-    global CFG
-    try:
-        with open("agent/config.yml", "r", encoding="utf-8") as f:
-            CFG = yaml.safe_load(f) or {}
-    except Exception:
-        CFG = {}
+class Tracer:
+    """
+    Collects spans for one run: "http" per GitHub call, "make" per webhook post,
+    "command" per handle_command. HTTP spans are tagged with the command running on
+    the same thread. flush() appends to TRACE_PATH (JSONL, kept via actions/cache), so
+    summary_markdown's per-run table only covers spans since the last flush.
+    """
+
+    def __init__(self, path=TRACE_PATH):
+        self.path = path
+        self.run = os.getenv("GITHUB_RUN_ID") or f"local-{os.getpid()}-{int(time.time())}"
+        self.spans = []          # not yet flushed
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def record(self, kind, name, ms, **attrs):
+        span = {"run": self.run, "ts": round(time.time(), 3), "kind": kind, "name": name,
+                "ms": round(ms, 2), "command": getattr(self.local, "command", None), **attrs}
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def http(self, method, url, r, started):
+        if getattr(r, "_content", False) not in (False, None):
+            bytes_in = len(r._content)
+        else:
+            bytes_in = int(r.headers.get("Content-Length") or 0)
+        body = getattr(r.request, "body", None) if getattr(r, "request", None) is not None else None
+        self.record("http", f"{method.upper()} {endpoint_template(url)}",
+                    (time.perf_counter() - started) * 1000,
+                    status=r.status_code, cache=getattr(r, "from_cache", None),
+                    bytes_out=len(body) if isinstance(body, (bytes, str)) or hasattr(body, "__len__") else 0,
+                    bytes_in=bytes_in)
+
+    @contextlib.contextmanager
+    def command(self, name):
+        started, outer = time.perf_counter(), getattr(self.local, "command", None)
+        self.local.command = name
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)[:200]
+            raise
+        finally:
+            self.local.command = outer
+            self.record("command", name, (time.perf_counter() - started) * 1000, error=error)
+
+    def flush(self):
+        """Append the spans to TRACE_PATH and drop them from memory (serve mode runs for days)."""
+        with self.lock:
+            new, self.spans = self.spans, []
+        if not new:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in new:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+        if os.path.getsize(self.path) > TRACE_KEEP_LINES * 300:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()[-TRACE_KEEP_LINES:]
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def history(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+
+    def summary_markdown(self):
+        with self.lock:
+            spans = list(self.spans)
+        lines = []
+        http = [s for s in spans if s["kind"] in ("http", "make")]
+        if http:
+            lines += ["### Agent HTTP calls (this run)", "",
+                      "| command | call | status | cache | ms | bytes out | bytes in |",
+                      "|---|---|---|---|---:|---:|---:|"]
+            for s in http:
+                lines.append(f"| {s['command'] or '—'} | `{s['name']}` | {s.get('status', '')} | "
+                             f"{s.get('cache') or ''} | {s['ms']:.0f} | {s.get('bytes_out', 0)} | {s.get('bytes_in', 0)} |")
+            lines.append(f"\nTotal: {len(http)} calls, {sum(s['ms'] for s in http):.0f} ms\n")
+        by_command = {}
+        for s in self.history() + spans:
+            if s["kind"] == "command":
+                by_command.setdefault(s["name"], []).append(s["ms"])
+        if by_command:
+            lines += ["### Command latency (all recorded runs)", "",
+                      "| command | runs | p50 ms | p95 ms |", "|---|---:|---:|---:|"]
+            for name, ms in sorted(by_command.items()):
+                lines.append(f"| `{name}` | {len(ms)} | {percentile(ms, 50):.0f} | {percentile(ms, 95):.0f} |")
+        return "\n".join(lines)
+
+    def write_step_summary(self):
+        path = os.getenv("GITHUB_STEP_SUMMARY")
+        text = self.summary_markdown()
+        if path and text:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+TRACER = Tracer()
+
+def command_name(cmd):
+    words = (cmd or "").strip().lower().split()
+    if not words:
+        return "(empty)"
+    if words[0] in ("/update", "/patch", "/setup", "/gotm", "/ensure", "/wire", "/test") and len(words) > 1:
+        return " ".join(words[:2]).split("{", 1)[0].split("[", 1)[0].strip()
+    return words[0]
+
+# ---------- Request scheduler (rate limits, retries, write concurrency) ----------
+class RateLimitExhausted(RuntimeError):
+    pass
+
+class RequestScheduler:
+    """
+    Sends requests through `get_session()`, tracking the primary rate-limit budget from
+    X-RateLimit-* headers. 429s, secondary-rate-limit 403s and 5xx are retried with
+    jittered exponential backoff (Retry-After wins when present); writes are capped
+    at `write_concurrency` in flight.
+    """
+
+    def __init__(self, get_session, max_retries=4, base_delay=1.0, max_delay=60.0,
+                 write_concurrency=2, max_wait=120.0):
+        self.get_session = get_session
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.writes = threading.BoundedSemaphore(write_concurrency)
+        self.lock = threading.Lock()
+        self.sleep = time.sleep
+        self.limit = self.remaining = self.reset = None
+        self.requests = self.charged = self.retries = 0
+        self.waited = 0.0
+
+    def backoff(self, attempt):
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _observe(self, r):
+        h = r.headers
+        with self.lock:
+            self.requests += 1
+            if r.status_code != 304:           # conditional hits are free
+                self.charged += 1
+            if "X-RateLimit-Remaining" in h:
+                self.remaining = int(h["X-RateLimit-Remaining"])
+                self.limit = int(h.get("X-RateLimit-Limit", self.limit or 0))
+                self.reset = int(h.get("X-RateLimit-Reset", self.reset or 0))
+
+    def _retry_delay(self, method, r, attempt):
+        """Seconds to wait before retrying `r`, or None if it should be returned as is."""
+        code = r.status_code
+        limited = code == 429 or (code == 403 and (
+            "Retry-After" in r.headers
+            or r.headers.get("X-RateLimit-Remaining") == "0"
+            or "rate limit" in r.text.lower()))
+        if not limited and not (code >= 500 and self._idempotent(method, r.url)):
+            return None
+        if "Retry-After" in r.headers:
+            try:
+                return float(r.headers["Retry-After"])
+            except ValueError:
+                pass
+        if r.headers.get("X-RateLimit-Remaining") == "0" and r.headers.get("X-RateLimit-Reset"):
+            return max(0.0, int(r.headers["X-RateLimit-Reset"]) - time.time()) + 1
+        return self.backoff(attempt)
+
+    @staticmethod
+    def _idempotent(method, url):
+        # Git objects are content-addressed, so re-POSTing a blob/tree/commit is harmless.
+        return method.upper() != "POST" or ("/git/" in url and "/git/refs" not in url)
+
+    def _wait_for_budget(self):
+        with self.lock:
+            if self.remaining != 0 or not self.reset:
+                return
+            delay = self.reset - time.time() + 1
+        if delay <= 0:
+            return
+        if delay > self.max_wait:
+            raise RateLimitExhausted(f"GitHub rate limit exhausted; resets in {int(delay)}s")
+        self._pause(delay)
+
+    def _pause(self, delay):
+        delay = min(delay, self.max_wait)
+        with self.lock:
+            self.waited += delay
+        self.sleep(delay)
+
+    def send(self, method, url, **kwargs):
+        import requests
+        write = method.upper() not in ("GET", "HEAD")
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_budget()
+            if write:
+                self.writes.acquire()
+            try:
+                r = self.get_session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries or not self._idempotent(method, url):
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                self._observe(r)
+                delay = self._retry_delay(method, r, attempt)
+                if delay is None or attempt == self.max_retries:
+                    return r
+            finally:
+                if write:
+                    self.writes.release()
+            with self.lock:
+                self.retries += 1
+            self._pause(delay)
+
+    def budget_report(self):
+        return {
+            "requests": self.requests,
+            "charged": self.charged,
+            "retries": self.retries,
+            "waited_s": round(self.waited, 2),
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset": self.reset,
+        }
+
+SCHEDULER = RequestScheduler(get_session)
+
+# ---------- HTTP cache (ETag / Last-Modified) ----------
+
+# Seconds a cached GET is served without asking GitHub at all; after that it is
+# revalidated with If-None-Match (a 304 costs no rate limit). First prefix wins.
+# Override per prefix with `cache.ttl` in agent/config.yml.
+DEFAULT_CACHE_TTLS = [
+    ("/contents/", 0),
+    ("/git/blobs/", 30 * 86400),   # content-addressed, never changes
+    ("/git/", 0),
+    ("/pages/builds", 0),
+    ("/issues", 0),
+    ("/", 3600),          # repo metadata (default_branch etc.)
+]
+
+class HttpCache:
+    """
+    Size-bounded LRU of GET responses, persisted as JSON between runs. Shared by the
+    serve workers and the thread pools, so every method takes the lock.
+    """
+
+    def __init__(self, path, max_bytes=5_000_000, max_entry_bytes=1_000_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = None          # loaded lazily: key -> entry
+        self.size = 0
+        self.dirty = False
+        self.hits = self.revalidated = self.misses = 0
+        self.lock = threading.RLock()
+        self.save_lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for key, entry in json.load(f):
+                    self.entries[key] = entry
+                    self.size += entry["size"]
+        except Exception:
+            self.entries.clear(); self.size = 0
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or self.entries is None:
+                return
+            items = list(self.entries.items())
+            self.dirty = False
+        # Written outside the lock so requests aren't held up; save_lock keeps the tmp file to one writer.
+        with self.save_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(items, f)
+                os.replace(tmp, self.path)
+            except Exception:
+                with self.lock:
+                    self.dirty = True
+                raise
+
+    def count(self, outcome):
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def get(self, key):
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, resp, path):
+        body = resp.text
+        size = len(body)
+        if size > self.max_entry_bytes:
+            return
+        keep = ("Content-Type", "ETag", "Last-Modified", "Link")
+        entry = {
+            "path": path,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "headers": {h: resp.headers[h] for h in keep if h in resp.headers},
+            "body": body,
+            "stored": time.time(),
+            "size": size,
+        }
+        with self.lock:
+            self._load()
+            self.drop(key)
+            self.entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes and self.entries:
+                _, old = self.entries.popitem(last=False)
+                self.size -= old["size"]
+            self.dirty = True
+
+    def touch(self, key):
+        """Restart the TTL after a 304; a no-op if the entry was evicted meanwhile."""
+        with self.lock:
+            entry = (self.entries or {}).get(key)
+            if entry is not None:
+                entry["stored"] = time.time()
+                self.dirty = True
+
+    def drop(self, key):
+        with self.lock:
+            old = self.entries.pop(key, None) if self.entries is not None else None
+            if old is not None:
+                self.size -= old["size"]
+                self.dirty = True
+
+    def invalidate(self, path):
+        """Forget cached GETs under a path that was just written."""
+        path = path.replace("/git/refs/", "/git/ref/")
+        with self.lock:
+            self._load()
+            for key in [k for k, e in self.entries.items() if e["path"].startswith(path)]:
+                self.drop(key)
+
+HTTP_CACHE = HttpCache(os.path.join(CACHE_DIR, "http.json"))
+atexit.register(HTTP_CACHE.save)
+
+def cache_ttl(path):
+    overrides = cfg().section("cache").get("ttl") or {}
+    for prefix, ttl in list(overrides.items()) + DEFAULT_CACHE_TTLS:
+        if path == prefix if prefix == "/" else path.startswith(prefix):
+            return int(ttl)
+    return 0
+
+def _cached_response(entry, url, how):
+    import requests
+    r = requests.Response()
+    r.status_code = 200
+    r._content = entry["body"].encode("utf-8")
+    r.encoding = "utf-8"
+    r.headers.update(entry["headers"])
+    r.url = url
+    r.from_cache = how          # "ttl" (no request made) or "304" (revalidated)
+    return r
+
+def request(method, url, **kwargs):
+    """Every GitHub call goes through here (traced; GETs cached)."""
+    started = time.perf_counter()
+    r = _request(method, url, **kwargs)
+    TRACER.http(method, url, r, started)
+    return r
+
+def _request(method, url, **kwargs):
+    """GETs are served from / revalidated against HTTP_CACHE; writes invalidate it."""
+    repo_prefix = f"{API}/repos/{GH_OWNER}/{GH_REPO}"
+    path = (url[len(repo_prefix):] or "/") if url.startswith(repo_prefix) else None
+    if method.upper() != "GET" or path is None or kwargs.get("stream"):   # streamed bodies aren't cached
+        r = SCHEDULER.send(method, url, **kwargs)
+        if path is not None and r.ok:
+            HTTP_CACHE.invalidate(path)
+        return r
+
+    params = kwargs.get("params") or {}
+    accept = (kwargs.get("headers") or {}).get("Accept", "")
+    key = url + ("?" + urlencode(sorted(params.items())) if params else "") + ("#" + accept if accept else "")
+    entry = HTTP_CACHE.get(key)
+    if entry is not None:
+        if time.time() - entry["stored"] < cache_ttl(path):
+            HTTP_CACHE.count("hits")
+            return _cached_response(entry, url, "ttl")
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        elif entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        kwargs["headers"] = headers
+
+    r = SCHEDULER.send(method, url, **kwargs)
+    if r.status_code == 304 and entry is not None:
+        HTTP_CACHE.count("revalidated")
+        HTTP_CACHE.touch(key)
+        return _cached_response(entry, url, "304")
+    HTTP_CACHE.count("misses")
+    if r.status_code == 200 and (r.headers.get("ETag") or r.headers.get("Last-Modified") or cache_ttl(path)):
+        HTTP_CACHE.put(key, r, path)
+    elif entry is not None:
+        HTTP_CACHE.drop(key)
+    return r
 
 # ---------- GitHub helpers ----------
 def api(method, path, **kwargs):
     url = f"{API}/repos/{GH_OWNER}/{GH_REPO}{path}"
-    return SESSION.request(method, url, **kwargs)
+    return request(method, url, **kwargs)
 
 def get_repo():
-    r = SESSION.get(f"{API}/repos/{GH_OWNER}/{GH_REPO}")
+    r = api("GET", "")
     r.raise_for_status()
     return r.json()
 
+REPO_META = {}
+def remember_repo(meta):
+    """Keep repo metadata from an event payload (or get_repo()) so commands skip the lookup."""
+    if meta and meta.get("default_branch") and \
+            (meta.get("full_name") or "").lower() in ("", f"{GH_OWNER}/{GH_REPO}".lower()):
+        REPO_META.update(default_branch=meta["default_branch"], full_name=meta.get("full_name"))
+
+def repo_default_branch():
+    if "default_branch" not in REPO_META:
+        remember_repo(get_repo())
+    return REPO_META.get("default_branch", "main")
+
 def get_branch_sha(branch):
     r = api("GET", f"/git/ref/heads/{branch}")
     return r.json()["object"]["sha"] if r.status_code == 200 else None
 
-def create_branch(from_branch, new_branch):
-    sha = get_branch_sha(from_branch)
-    if not sha:
-        raise RuntimeError(f"Base branch not found: {from_branch}")
-    r = api("POST", "/git/refs", json={"ref": f"refs/heads/{new_branch}", "sha": sha})
-    r.raise_for_status()
-
 def get_contents(path, ref=None):
     params = {"ref": ref} if ref else {}
     return api("GET", f"/contents/{path}", params=params)
 
-def put_contents(path, content_bytes, message, branch):
-    b64 = base64.b64encode(content_bytes).decode("ascii")
-    r = api("PUT", f"/contents/{path}", json={"message": message, "content": b64, "branch": branch})
-    r.raise_for_status()
-    return r.json()
-
 def get_file_sha(path, ref):
     r = get_contents(path, ref=ref)
     if r.status_code == 200:
         return r.json().get("sha")
     return None
 
-def update_file_text(path, text, message, branch):
-    existing_sha = get_file_sha(path, branch)
-    b64 = base64.b64encode(text.encode("utf-8")).decode("ascii")
+def git_blob_sha(data: bytes):
+    """The sha git (and the Contents/Trees APIs) report for a file with these bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class WriteConflict(RuntimeError):
+    """The file or branch moved between our read and our write (stale sha / non-fast-forward)."""
+
+def is_conflict(r):
+    return r.status_code == 409 or (r.status_code == 422 and (
+        "sha" in r.text or "fast forward" in r.text.lower()))
+
+def write_file_text(path, text, message, branch, existing_sha=None):
+    """
+    PUT `text` unless it is byte-identical to the blob at `existing_sha` (then returns None).
+    Raises WriteConflict if `existing_sha` is no longer the file's current blob.
+    """
+    data = text.encode("utf-8")
+    if existing_sha and git_blob_sha(data) == existing_sha:
+        return None
+    b64 = base64.b64encode(data).decode("ascii")
     body = {"message": message, "content": b64, "branch": branch}
     if existing_sha:
         body["sha"] = existing_sha
     r = api("PUT", f"/contents/{path}", json=body)
+    if is_conflict(r):
+        raise WriteConflict(f"{path} changed since sha {existing_sha}")
     r.raise_for_status()
     return r.json()
 
-def update_file_json(path, obj, message, branch):
-    text = json.dumps(obj, indent=2, ensure_ascii=False)
-    return update_file_text(path, text, message, branch)
+def update_file_text(path, text, message, branch):
+    return write_file_text(path, text, message, branch, get_file_sha(path, branch))
+
+def json_text(obj):
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+def read_json_file(path, ref):
+    """
+    (obj, blob_sha) for a JSON file in the repo, or (None, None) if it doesn't exist.
+    Above 1 MB the Contents API leaves out the content, so it is streamed from the blob.
+    """
+    r = get_contents(path, ref=ref)
+    if r.status_code == 404:
+        return None, None
+    r.raise_for_status()
+    data = r.json()
+    BLOB_SIZES[data["sha"]] = data.get("size")
+    if data.get("encoding") == "none" or (data.get("size") and not data.get("content")):
+        return read_blob_json(data["sha"]), data["sha"]
+    return json.loads(base64.b64decode(data["content"]).decode("utf-8")), data["sha"]
+
+# ---------- Large files (git blobs, streamed) ----------
+# The Contents API inlines files as base64 inside a JSON envelope, so a write holds the
+# text, its bytes, the base64 copy and the request body at once, and reads stop working
+# above 1 MB. Files over LARGE_FILE_BYTES are instead serialised to a spooled temp file,
+# uploaded as a git blob with the base64 encoded chunk by chunk, and read back as raw bytes.
+LARGE_FILE_BYTES = 512 * 1024
+BLOB_SIZES = {}          # blob sha -> size, from tree listings and Contents metadata
+B64_CHUNK = 3 * 16384    # multiple of 3, so chunks encode without padding
+
+class JsonBlob:
+    """A document serialised exactly as json_text() would, kept in a spooled temp file."""
+    def __init__(self, obj):
+        import tempfile
+        self.file = tempfile.SpooledTemporaryFile(max_size=LARGE_FILE_BYTES)
+        encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+        pending, n = [], 0
+        for chunk in encoder.iterencode(obj):       # tokens; written out ~64 KB at a time
+            pending.append(chunk)
+            n += len(chunk)
+            if n >= 1 << 16:
+                self.file.write("".join(pending).encode("utf-8"))
+                pending, n = [], 0
+        self.file.write("".join(pending).encode("utf-8"))
+        self.size = self.file.tell()
+        h = hashlib.sha1(b"blob %d\0" % self.size)
+        for block in self.chunks():
+            h.update(block)
+        self.sha = h.hexdigest()
+
+    @property
+    def large(self):
+        return self.size > LARGE_FILE_BYTES
+
+    def chunks(self, n=1 << 16):
+        self.file.seek(0)
+        return iter(lambda: self.file.read(n), b"")
+
+    def text(self):
+        self.file.seek(0)
+        return self.file.read().decode("utf-8")
+
+class Base64Body:
+    """
+    Request body {"encoding": "base64", "content": "…"} for POST /git/blobs, produced
+    chunk by chunk. len() gives requests a Content-Length; iterating starts over, so a
+    retried request sends the whole body again.
+    """
+    HEAD, TAIL = b'{"encoding": "base64", "content": "', b'"}'
+
+    def __init__(self, blob):
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.HEAD) + 4 * ((self.blob.size + 2) // 3) + len(self.TAIL)
+
+    def __iter__(self):
+        yield self.HEAD
+        for block in self.blob.chunks(B64_CHUNK):
+            yield base64.b64encode(block)
+        yield self.TAIL
+
+def upload_blob(blob):
+    r = api("POST", "/git/blobs", data=Base64Body(blob), headers={"Content-Type": "application/json"})
+    r.raise_for_status()
+    sha = r.json()["sha"]
+    BLOB_SIZES[sha] = blob.size
+    return sha
+
+# ---------- JSON patch (RFC 6902 JSON Patch / RFC 7386 Merge Patch) ----------
+class JsonPatchError(ValueError):
+    pass
+
+def json_merge_patch(target, patch):
+    if not isinstance(patch, dict):
+        return patch
+    out = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            out.pop(key, None)
+        else:
+            out[key] = json_merge_patch(out.get(key), value)
+    return out
+
+def _pointer(path):
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+def _index(container, token, path, allow_end=False):
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index in {path!r}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range in {path!r}")
+    return i
+
+def _resolve(doc, tokens, path):
+    for token in tokens:
+        if isinstance(doc, list):
+            doc = doc[_index(doc, token, path)]
+        elif isinstance(doc, dict) and token in doc:
+            doc = doc[token]
+        else:
+            raise JsonPatchError(f"Path not found: {path!r}")
+    return doc
+
+def _add(doc, path, value):
+    tokens = _pointer(path)
+    if not tokens:
+        return value
+    parent, last = _resolve(doc, tokens[:-1], path), tokens[-1]
+    if isinstance(parent, list):
+        parent.insert(_index(parent, last, path, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise JsonPatchError(f"Cannot add at {path!r}")
+    return doc
+
+def _remove(doc, path):
+    tokens = _pointer(path)
+    if not tokens:
+        raise JsonPatchError("Cannot remove the document root")
+    parent, last = _resolve(doc, tokens[:-1], path), tokens[-1]
+    if isinstance(parent, list):
+        return doc, parent.pop(_index(parent, last, path))
+    if isinstance(parent, dict) and last in parent:
+        return doc, parent.pop(last)
+    raise JsonPatchError(f"Path not found: {path!r}")
+
+def json_patch(doc, ops):
+    """Apply RFC 6902 operations to a deep copy of `doc`; raises JsonPatchError."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise JsonPatchError(f"Malformed patch operation: {op!r}")
+        kind, path = op["op"], op["path"]
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise JsonPatchError(f"'{kind}' needs a value")
+        if kind == "add":
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif kind == "remove":
+            doc, _ = _remove(doc, path)
+        elif kind == "replace":
+            if _pointer(path):
+                doc, _ = _remove(doc, path)
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif kind in ("move", "copy"):
+            src = op.get("from")
+            if src is None:
+                raise JsonPatchError(f"'{kind}' needs from")
+            if kind == "move":
+                if path.startswith(src + "/"):
+                    raise JsonPatchError("Cannot move a value into one of its children")
+                doc, value = _remove(doc, src)
+            else:
+                value = copy.deepcopy(_resolve(doc, _pointer(src), src))
+            doc = _add(doc, path, value)
+        elif kind == "test":
+            if _resolve(doc, _pointer(path), path) != op["value"]:
+                raise JsonPatchError(f"Test failed at {path!r}")
+        else:
+            raise JsonPatchError(f"Unknown op: {kind!r}")
+    return doc
+
+def apply_patch(doc, patch):
+    """A JSON array is an RFC 6902 patch; an object is an RFC 7386 merge patch."""
+    if isinstance(patch, list):
+        return json_patch(doc, patch)
+    if isinstance(patch, dict):
+        return json_merge_patch(doc, patch)
+    raise JsonPatchError("Patch must be a JSON object (merge patch) or array (JSON patch)")
+
+# ---------- Git Data API (atomic multi-file commits) ----------
+def get_commit(sha):
+    r = api("GET", f"/git/commits/{sha}")
+    r.raise_for_status()
+    return r.json()
+
+def create_tree(base_tree, files):
+    """
+    files: {path: text, JsonBlob or None}. Text (and small JsonBlobs) go inline in the
+    tree, so no per-file blob calls; large JsonBlobs are uploaded first; None deletes.
+    """
+    entries = []
+    for path, body in files.items():
+        entry = {"path": path, "mode": "100644", "type": "blob"}
+        if body is None:
+            entry["sha"] = None
+        elif isinstance(body, JsonBlob):
+            entry.update({"sha": upload_blob(body)} if body.large else {"content": body.text()})
+        else:
+            entry["content"] = body
+        entries.append(entry)
+    r = api("POST", "/git/trees", json={"base_tree": base_tree, "tree": entries})
+    r.raise_for_status()
+    return r.json()
+
+def create_commit(message, tree_sha, parents):
+    r = api("POST", "/git/commits", json={"message": message, "tree": tree_sha, "parents": parents})
+    r.raise_for_status()
+    return r.json()
+
+def update_ref(branch, sha):
+    r = api("PATCH", f"/git/refs/heads/{branch}", json={"sha": sha, "force": False})
+    r.raise_for_status()
+    return r.json()
+
+def create_ref(branch, sha):
+    r = api("POST", "/git/refs", json={"ref": f"refs/heads/{branch}", "sha": sha})
+    r.raise_for_status()
+    return r.json()
+
+def list_tree(ref):
+    """
+    One recursive tree listing → (tree_sha, {path: blob_sha}).
+    Files are None when GitHub truncated the listing (very large trees).
+    """
+    r = api("GET", f"/git/trees/{ref}", params={"recursive": "1"})
+    r.raise_for_status()
+    data = r.json()
+    if data.get("truncated"):
+        return data["sha"], None
+    blobs = [e for e in data.get("tree", []) if e.get("type") == "blob"]
+    BLOB_SIZES.update((e["sha"], e.get("size")) for e in blobs)
+    return data["sha"], {e["path"]: e["sha"] for e in blobs}
+
+def build_commit(files, message, parent, base_tree=None):
+    """Create (but don't publish) a commit on top of `parent` containing `files`."""
+    if base_tree is None:
+        base_tree = get_commit(parent)["tree"]["sha"]
+    tree = create_tree(base_tree, files)
+    return create_commit(message, tree["sha"], [parent])
+
+def commit_json_files(docs, message, branch):
+    """docs: {path: obj}, each serialised with json_text like every other JSON write."""
+    return commit_json_mutations({path: Replace(obj) for path, obj in docs.items()}, message, branch)
+
+def read_blob_json(sha):
+    """
+    Blobs are immutable, so these are served from HTTP_CACHE after the first fetch.
+    Large ones (or ones of unknown size) are streamed as raw bytes and parsed without
+    the base64 envelope; those skip the cache.
+    """
+    raw = {"Accept": "application/vnd.github.raw"}
+    size = BLOB_SIZES.get(sha)
+    if size is not None and size <= LARGE_FILE_BYTES:
+        r = api("GET", f"/git/blobs/{sha}", headers=raw)
+        r.raise_for_status()
+        return json.loads(r.content.decode("utf-8"))
+    import io
+    with api("GET", f"/git/blobs/{sha}", headers=raw, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        return json.load(io.TextIOWrapper(r.raw, encoding="utf-8"))
+
+# ---------- Derived files ----------
+# Files computed from other files rather than posted by hand. When a source is written,
+# each enabled derivation runs on the new source doc and its output goes into the same
+# commit. (source, target, module, function, config section); the module is imported on
+# first use and the derivation is on when the section has `derive: true`.
+DERIVATIONS = [
+    ("site/data/results.json", "site/data/table.json", "standings", "derive_table", "standings"),
+    ("site/data/results.json", "site/data/stats.json", "playerstats", "derive_stats", "player_stats"),
+    ("site/data/results.json", "site/data/archive.json", "archive", "derive_archive", "archive"),
+]
+
+def derivations(paths):
+    """
+    [(source, target, derive)] that apply when `paths` are written, where
+    derive(source_doc, target_doc, previous_source_doc) -> target_doc, or
+    (target_doc, {path: doc}) when it also owns other files (e.g. per-player shards);
+    None for one of those paths deletes it.
+    """
+    import importlib
+    out = []
+    for source, target, module, func, section in DERIVATIONS:
+        settings = cfg().section(section)
+        if source in paths and settings.get("derive"):
+            fn = getattr(importlib.import_module(module), func)
+            out.append((source, target, lambda doc, current, previous, fn=fn, settings=settings:
+                        current if doc is None else fn(doc, current, settings, previous)))
+    return out
+
+# ---------- Conflict-aware writes ----------
+# Concurrent listener runs (and serve-mode workers) race on the same files. Writes are
+# expressed as mutations — fn(current_doc_or_None) -> new_doc — so a stale sha or a
+# non-fast-forward ref update is handled by re-reading and re-applying, not by failing.
+# Within one process, writers to the same path also queue on a per-path lock.
+WRITE_ATTEMPTS = 6
+DELETE = object()        # as a mutation in commit_json_mutations: remove the file
+
+class Replace:
+    """As a mutation in commit_json_mutations: overwrite the file with `doc`, so it isn't read first."""
+    def __init__(self, doc):
+        self.doc = doc
+
+    def __call__(self, _current):
+        return self.doc
+_PATH_LOCKS = {}
+_PATH_LOCKS_GUARD = threading.Lock()
+WRITE_STATS = {"writes": 0, "conflicts": 0, "unchanged": 0}
+
+def _path_lock(path):
+    with _PATH_LOCKS_GUARD:
+        return _PATH_LOCKS.setdefault(path, threading.Lock())
+
+@contextlib.contextmanager
+def path_locks(paths):
+    locks = [_path_lock(p) for p in sorted(set(paths))]   # fixed order: no deadlocks
+    for lock in locks:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def conflict_backoff(attempt):
+    return min(2.0, 0.1 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+def _count(key):
+    with _PATH_LOCKS_GUARD:
+        WRITE_STATS[key] += 1
+
+def write_json_with_retry(path, mutate, message, branch, attempts=WRITE_ATTEMPTS):
+    """
+    Single file via the Contents API: read (sha + doc), mutate, PUT with that sha.
+    Returns the PUT response with "attempts" added, or None if the mutation changed nothing.
+    Sources of derived files go through commit_json_mutations so both land in one commit,
+    and so do documents too large for the Contents API (uploaded as git blobs).
+    """
+    if derivations([path]):
+        return commit_json_mutations({path: mutate}, message, branch, attempts)
+    with path_locks([path]):
+        for attempt in range(attempts):
+            doc, sha = read_json_file(path, branch)
+            body = JsonBlob(mutate(doc))
+            if body.large:
+                break          # too big for an inline Contents API write
+            try:
+                res = write_file_text(path, body.text(), message, branch, sha)
+            except WriteConflict:
+                _count("conflicts")
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(conflict_backoff(attempt))
+                continue
+            if res is None:
+                _count("unchanged")
+                return None
+            _count("writes")
+            res["attempts"] = attempt + 1
+            return res
+    return commit_json_mutations({path: mutate}, message, branch, attempts)
+
+def commit_json_mutations(mutations, message, branch, attempts=WRITE_ATTEMPTS):
+    """
+    Several files in one commit via the Git Data API. Each attempt reads the branch head,
+    applies every mutation to the docs at that head and tries a fast-forward ref update;
+    if another writer got there first, it starts over from the new head.
+    Files derived from the mutated ones (see DERIVATIONS) are recomputed in the same commit.
+    A mutation may return (doc, {other_path: doc}) to write files it names itself, and
+    DELETE in place of a mutation removes that path (if it still exists); Replace(doc)
+    overwrites it. Only the files a mutation or derivation reads are fetched.
+    Returns the commit (with "changed" and "attempts"), or None if nothing changed.
+    """
+    derived = derivations(mutations)
+    targets = [target for _, target, _ in derived]
+    reads = set(targets) | {source for source, _, _ in derived} | {
+        path for path, mutate in mutations.items() if mutate is not DELETE and not isinstance(mutate, Replace)}
+    with path_locks(list(mutations) + targets):
+        for attempt in range(attempts):
+            head = get_branch_sha(branch)
+            if not head:
+                raise RuntimeError(f"Branch not found: {branch}")
+            base_tree, existing = list_tree(head)
+            existing = existing or {}
+            current = {path: read_blob_json(sha) for path, sha in existing.items() if path in reads}
+            docs = {}
+            for path, mutate in mutations.items():
+                doc = DELETE if mutate is DELETE else mutate(current.get(path))
+                doc, extra = doc if isinstance(doc, tuple) else (doc, {})
+                docs[path] = doc
+                docs.update(extra)
+            for source, target, derive in derived:
+                doc = derive(docs[source], docs.get(target, current.get(target)), current.get(source))
+                doc, extra = doc if isinstance(doc, tuple) else (doc, {})
+                if doc is not None:
+                    docs[target] = doc
+                docs.update((path, DELETE if d is None else d) for path, d in extra.items())
+            changed = {}
+            for path, doc in docs.items():
+                if doc is DELETE:
+                    if path in existing:
+                        changed[path] = None
+                    continue
+                body = JsonBlob(doc)
+                if existing.get(path) != body.sha:
+                    changed[path] = body
+            if not changed:
+                _count("unchanged")
+                return None
+            commit = build_commit(changed, message, head, base_tree=base_tree)
+            r = api("PATCH", f"/git/refs/heads/{branch}", json={"sha": commit["sha"], "force": False})
+            if r.ok:
+                _count("writes")
+                commit.update(changed=sorted(changed), attempts=attempt + 1)
+                return commit
+            if not is_conflict(r):
+                r.raise_for_status()
+            _count("conflicts")
+            if attempt < attempts - 1:
+                time.sleep(conflict_backoff(attempt))
+        raise WriteConflict(f"{branch} kept moving; gave up after {attempts} attempts")
+
+def retry_note(res):
+    n = (res or {}).get("attempts", 1)
+    return f" (landed after {n - 1} conflict retr{'y' if n == 2 else 'ies'})" if n > 1 else ""
 
 def open_pr(head_branch, base_branch, title, body=""):
     r = api("POST", "/pulls", json={"title": title, "head": head_branch, "base": base_branch, "body": body})
@@ -199,17 +1230,226 @@ def dispatch_workflow(workflow_filename: str, ref_branch: str):
     r = api("POST", f"/actions/workflows/{workflow_filename}/dispatches", json={"ref": ref_branch})
     return r.status_code in (201, 204), r.status_code
 
+# ---------- Pages deploy coordination ----------
+DEPLOY_WORKFLOW = "site-deploy.yml"
+ACTIVE_RUN_STATES = ("queued", "in_progress", "waiting", "pending", "requested")
+
+def workflow_runs(workflow_filename, branch, per_page=10):
+    r = api("GET", f"/actions/workflows/{workflow_filename}/runs",
+            params={"branch": branch, "per_page": per_page})
+    return r.json().get("workflow_runs", []) if r.status_code == 200 else []
+
+class DeployCoordinator:
+    """
+    Funnels every "please redeploy" through one place so bursts don't queue a deploy each:
+    - a commit touching site/** on a push branch is already deployed by the push trigger,
+      when TOKEN_STARTS_WORKFLOWS (pushes made with GITHUB_TOKEN start nothing);
+    - a queued/running (or successful) run at the current head makes a dispatch redundant;
+    - with `site.deploy_debounce_seconds` > 0 requests inside the window share one dispatch.
+    site-deploy.yml's concurrency group keeps at most one run pending behind the active one.
+    """
+
+    def __init__(self, workflow_filename=DEPLOY_WORKFLOW):
+        self.workflow = workflow_filename
+        self.lock = threading.Lock()
+        self.pending = {}    # branch -> threading.Timer
+        self.stats = {"requested": 0, "push": 0, "coalesced": 0, "dispatched": 0}
+
+    def _bump(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def request(self, branch, pushed_site=False):
+        """Returns (ok, status); status is "push", "coalesced", "debounced" or the dispatch HTTP code."""
+        config = cfg()
+        self._bump("requested")
+        if pushed_site and TOKEN_STARTS_WORKFLOWS and branch in config.deploy_push_branches:
+            self._bump("push")
+            return True, "push"
+        debounce = config.deploy_debounce_seconds
+        if debounce <= 0:
+            return self._dispatch(branch)
+        with self.lock:
+            if branch in self.pending:
+                self.stats["coalesced"] += 1
+                return True, "debounced"
+            timer = threading.Timer(debounce, self._fire, (branch,))
+            timer.daemon = True
+            self.pending[branch] = timer
+        timer.start()
+        return True, "debounced"
+
+    def _fire(self, branch):
+        with self.lock:
+            if self.pending.pop(branch, None) is None:
+                return
+        self._dispatch(branch)
+
+    def flush(self):
+        """Dispatch anything still waiting out its debounce window (end of a one-shot run)."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for branch, timer in pending.items():
+            timer.cancel()
+            self._dispatch(branch)
+
+    def _dispatch(self, branch):
+        head = get_branch_sha(branch)
+        for run in workflow_runs(self.workflow, branch):
+            if run.get("head_sha") != head:
+                continue
+            if run.get("status") in ACTIVE_RUN_STATES or run.get("conclusion") == "success":
+                self._bump("coalesced")
+                return True, "coalesced"
+        self._bump("dispatched")
+        return dispatch_workflow(self.workflow, branch)
+
+DEPLOYS = DeployCoordinator()
+atexit.register(DEPLOYS.flush)
+
+def request_deploy(branch, pushed_site=False):
+    return DEPLOYS.request(branch, pushed_site=pushed_site)
+
+def deploy_note(ok, status):
+    if status == "push":
+        return "✅ deploying via push"
+    if status == "coalesced":
+        return "✅ already queued/deployed"
+    if status == "debounced":
+        return "✅ queued (debounced)"
+    return "✅ sent" if ok else f"❌ ({status})"
+
+def touches_site(paths):
+    return any(p.startswith("site/") for p in paths)
+
+# ---------- Issue index (title -> number) ----------
+class IssueIndex:
+    """
+    Open issues by title, persisted between runs. The first sync pages through every open
+    issue (100 per page, following the Link header); after that one request with
+    `since=<last updated_at seen>` picks up new, edited and closed issues. That URL only
+    changes when something did, so it is usually answered by a free 304 from HTTP_CACHE.
+    """
+    MIN_SYNC_INTERVAL = 10.0     # seconds between syncs within one process
+
+    def __init__(self, path):
+        self.path = path
+        self.issues = None       # number (str) -> {"title", "url"}; open issues only
+        self.titles = {}         # title -> newest open issue number
+        self.since = None        # newest updated_at seen (GitHub's clock, not ours)
+        self.synced_at = 0.0
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def _load(self):
+        if self.issues is not None:
+            return
+        self.issues = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("repo") == f"{GH_OWNER}/{GH_REPO}".lower():
+                self.issues, self.since = data["issues"], data["since"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self._reindex()
+
+    def _reindex(self):
+        self.titles = {}
+        for number in sorted(self.issues, key=int):
+            self.titles[self.issues[number]["title"]] = int(number)
+
+    def save(self):
+        if not self.dirty or self.issues is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"repo": f"{GH_OWNER}/{GH_REPO}".lower(), "since": self.since, "issues": self.issues}, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def _pages(self, params):
+        r = api("GET", "/issues", params=dict(params, per_page=100))
+        while True:
+            r.raise_for_status()
+            yield r.json()
+            url = r.links.get("next", {}).get("url")
+            if not url:
+                return
+            r = request("GET", url)
+
+    def observe(self, issue, listed=False):
+        """
+        Fold one issue into the index. Only issues from a `since` listing move the
+        watermark; one we just created may be newer than changes we haven't listed yet.
+        """
+        if "pull_request" in issue:
+            return
+        key = str(issue["number"])
+        if issue.get("state", "open") == "open":
+            self.issues[key] = self._entry(issue)
+        else:
+            self.issues.pop(key, None)
+        if listed and issue.get("updated_at") and (self.since is None or issue["updated_at"] > self.since):
+            self.since = issue["updated_at"]
+        self.dirty = True
+
+    @staticmethod
+    def _entry(issue):
+        return {"title": issue.get("title", ""), "url": issue.get("html_url")}
+
+    def sync(self, force=False):
+        with self.lock:
+            self._load()
+            if not force and time.monotonic() - self.synced_at < self.MIN_SYNC_INTERVAL:
+                return
+            if self.since is None:
+                # Full listing: built aside and swapped in only once the last page is read,
+                # so a failed page can't leave (and persist) a partial index with a watermark
+                # past issues that were never listed.
+                issues, since = {}, None
+                for page in self._pages({"state": "open"}):
+                    for issue in page:
+                        if "pull_request" not in issue:
+                            issues[str(issue["number"])] = self._entry(issue)
+                            since = max(since or "", issue.get("updated_at") or "") or None
+                self.issues, self.since, self.dirty = issues, since, True
+            else:
+                # Oldest change first: a failed page leaves the watermark at the last issue folded in.
+                params = {"state": "all", "since": self.since, "sort": "updated", "direction": "asc"}
+                for page in self._pages(params):
+                    for issue in page:
+                        self.observe(issue, listed=True)
+            self._reindex()
+            self.synced_at = time.monotonic()
+
+    def find(self, title):
+        self.sync()
+        with self.lock:
+            number = self.titles.get(title)
+            if number is None:
+                return None
+            entry = self.issues[str(number)]
+            return {"number": number, "title": title, "html_url": entry.get("url")}
+
+    def remember(self, issue):
+        with self.lock:
+            self._load()
+            self.observe(issue)
+            self._reindex()
+
+ISSUES = IssueIndex(os.path.join(CACHE_DIR, "issues.json"))
+atexit.register(ISSUES.save)
+
 def find_issue_by_title(title):
-    r = api("GET", f"/issues", params={"state": "open"})
-    if r.status_code == 200:
-        for it in r.json():
-            if it.get("title", "") == title:
-                return it
-    return None
+    """The newest open issue with exactly this title, or None; see IssueIndex."""
+    return ISSUES.find(title)
 
 def create_issue(title, body):
     r = api("POST", "/issues", json={"title": title, "body": body})
     r.raise_for_status()
+    ISSUES.remember(r.json())
     return r.json()
 
 def update_issue_body(number, body):
@@ -221,82 +1461,636 @@ def comment_issue(issue_number, body):
     r.raise_for_status()
 
 def latest_pages_build():
-    r = SESSION.get(f"{API}/repos/{GH_OWNER}/{GH_REPO}/pages/builds/latest")
+    r = api("GET", "/pages/builds/latest")
     return r.json() if r.status_code == 200 else None
 
+# ---------- Status collection (GraphQL + concurrent REST) ----------
+CHECKLIST_TITLE = "Agent: Launch checklist"
+
+def graphql_url():
+    return f"{API}/graphql"
+
+def graphql(query, variables):
+    r = request("POST", graphql_url(), json={"query": query, "variables": variables})
+    r.raise_for_status()
+    data = r.json()
+    if data.get("errors"):
+        raise RuntimeError("GraphQL: " + "; ".join(e.get("message", "?") for e in data["errors"]))
+    return data["data"]
+
+def status_paths():
+    return list(dict.fromkeys(list(cfg().ensure_files) + list(DATA_FILES.values())))
+
+def _status_via_graphql(paths):
+    """Default branch, blob OID/size per path and the checklist issue in a single query."""
+    variables = {"owner": GH_OWNER, "name": GH_REPO,
+                 "issues": f'repo:{GH_OWNER}/{GH_REPO} is:issue is:open in:title "{CHECKLIST_TITLE}"'}
+    params, fields = ["$owner: String!", "$name: String!", "$issues: String!"], []
+    for i, path in enumerate(paths):
+        variables[f"e{i}"] = f"HEAD:{path}"
+        params.append(f"$e{i}: String!")
+        fields.append(f"f{i}: object(expression: $e{i}) {{ ... on Blob {{ oid byteSize }} }}")
+    query = (
+        f"query({', '.join(params)}) {{\n"
+        "  repository(owner: $owner, name: $name) {\n"
+        "    defaultBranchRef { name target { oid } }\n"
+        + "".join(f"    {f}\n" for f in fields) +
+        "  }\n"
+        "  search(query: $issues, type: ISSUE, first: 10) { nodes { ... on Issue { number title state url } } }\n"
+        "}"
+    )
+    data = graphql(query, variables)
+    repo = data["repository"]
+    files = {}
+    for i, path in enumerate(paths):
+        blob = repo.get(f"f{i}")
+        files[path] = {"sha": blob["oid"], "size": blob["byteSize"]} if blob else None
+    checklist = next(({"number": n["number"], "title": n["title"], "html_url": n.get("url")}
+                      for n in (data.get("search") or {}).get("nodes") or []
+                      if n and n.get("title") == CHECKLIST_TITLE), None)
+    return {"default_branch": repo["defaultBranchRef"]["name"],
+            "head": repo["defaultBranchRef"]["target"]["oid"],
+            "files": files, "checklist": checklist, "source": "graphql"}
+
+def _status_via_rest(paths):
+    repo = get_repo()
+    branch = repo.get("default_branch", "main")
+    head = get_branch_sha(branch)
+    _, tree = list_tree(head) if head else (None, {})
+    tree = tree or {}
+    files = {p: ({"sha": tree[p], "size": None} if p in tree else None) for p in paths}
+    return {"default_branch": branch, "head": head, "files": files,
+            "checklist": find_issue_by_title(CHECKLIST_TITLE), "source": "rest"}
+
+def collect_status(include_runs=False):
+    """
+    Everything /status and bootstrap report, without sequential round-trips: one GraphQL
+    query, with the REST-only bits (Pages build, deploy runs) fetched alongside it.
+    Falls back to REST if GraphQL is unavailable.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    paths = status_paths()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        repo_job = pool.submit(_status_via_graphql, paths)
+        pages_job = pool.submit(latest_pages_build)
+        runs_job = pool.submit(workflow_runs, DEPLOY_WORKFLOW,
+                               REPO_META.get("default_branch", "main"), 1) if include_runs else None
+        try:
+            snapshot = repo_job.result()
+        except Exception as e:
+            print("GraphQL status failed, using REST:", e)
+            snapshot = _status_via_rest(paths)
+        snapshot["pages"] = pages_job.result()
+        snapshot["deploy_runs"] = runs_job.result() if runs_job else []
+    remember_repo({"default_branch": snapshot["default_branch"]})
+    return snapshot
+
+def pages_line(pages):
+    return f"- Pages build: {pages.get('status')} at {pages.get('updated_at')}" if pages else "- Pages build: (not available yet)"
+
+# ---------- Outbox (durable, async delivery of outbound events) ----------
+# Events are written to SQLite under CACHE_DIR (kept between runs by actions/cache) before
+# anything is sent, and delivered by daemon worker threads over one pooled session. Each
+# event's id is its Idempotency-Key, so a retry of a delivery that did land (or one cut off
+# when the run ended) can be dropped by the receiver. Whatever is still pending at exit
+# goes out on the next run. Webhook URLs stay in the environment, never in the database.
+OUTBOX_PATH = os.path.join(CACHE_DIR, "outbox.sqlite")
+OUTBOX_TARGETS = {"make": "MAKE_WEBHOOK_URL"}    # target -> env var holding its URL
+OUTBOX_SCHEMA = """CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY, target TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+    delivered REAL, last_error TEXT)"""
+
+class Delivery:
+    """Handle for one queued event; wait() gives (ok, message) once it is delivered or given up on."""
+    def __init__(self, event_id):
+        self.id, self.done, self.ok, self.msg = event_id, threading.Event(), False, "queued"
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            return False, f"queued as {self.id[:8]}, still delivering"
+        return self.ok, self.msg
+
+class Outbox:
+    def __init__(self, path, workers=4, attempts=4, timeout=(5, 20)):
+        self.path, self.workers, self.attempts, self.timeout = path, workers, attempts, timeout
+        self.lock = threading.Lock()
+        self.db = self.queue = self.session = None
+        self.handles = {}                         # event id -> Delivery, while queued or in flight
+        self.latencies = []                       # ms from enqueue to delivery, this process
+        self.counts = {"queued": 0, "delivered": 0, "retries": 0, "dead": 0}
+
+    def _start(self):
+        """Open the database and start the workers on first use (sqlite3 stays unimported otherwise)."""
+        if self.db is not None:
+            return
+        import queue, sqlite3, requests
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(OUTBOX_SCHEMA)
+        self.db.execute("DELETE FROM outbox WHERE status = 'delivered' AND delivered < ?", (time.time() - 7 * 86400,))
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.workers))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=self.workers))
+        self.queue = queue.Queue()
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
+        for event_id, target, payload in self.db.execute(
+                "SELECT id, target, payload FROM outbox WHERE status = 'pending' ORDER BY created").fetchall():
+            self._submit(event_id, target, payload)
+
+    def _submit(self, event_id, target, payload):
+        handle = self.handles[event_id] = Delivery(event_id)
+        self.queue.put((event_id, target, payload))
+        return handle
+
+    def enqueue(self, target, payload: dict):
+        """Persist the event and return its Delivery handle at once (None if the target has no URL)."""
+        if not os.getenv(OUTBOX_TARGETS[target]):
+            return None
+        import uuid
+        event_id, body = uuid.uuid4().hex, json.dumps(payload)
+        with self.lock:
+            self._start()
+            self.db.execute("INSERT INTO outbox (id, target, payload, created) VALUES (?, ?, ?, ?)",
+                            (event_id, target, body, time.time()))
+            self.counts["queued"] += 1
+            return self._submit(event_id, target, body)
+
+    def _work(self):
+        while True:
+            event_id, target, payload = self.queue.get()
+            try:
+                self._deliver(event_id, target, payload)
+            finally:
+                self.queue.task_done()
+
+    def _deliver(self, event_id, target, payload):
+        import requests
+        url, kind = os.getenv(OUTBOX_TARGETS[target], ""), json.loads(payload).get("type", "")
+        for attempt in range(self.attempts):
+            started = time.perf_counter()
+            try:
+                r = self.session.post(url, data=payload, timeout=self.timeout,
+                                      headers={"Content-Type": "application/json", "Idempotency-Key": event_id})
+                status, error = r.status_code, f"HTTP {r.status_code}"
+                TRACER.record(target, f"POST {target}:{kind}", (time.perf_counter() - started) * 1000,
+                              status=status, bytes_out=len(payload), bytes_in=len(r.content))
+            except requests.RequestException as e:
+                status, error = None, type(e).__name__
+            if status and 200 <= status < 300:
+                return self._finish(event_id, "delivered", error, attempt + 1, True)
+            if status and 400 <= status < 500 and status not in (408, 429):
+                return self._finish(event_id, "dead", error, attempt + 1, False)
+            if attempt < self.attempts - 1:
+                with self.lock:
+                    self.counts["retries"] += 1
+                time.sleep(conflict_backoff(attempt))
+        self._finish(event_id, "pending", error, self.attempts, False, note="; will retry next run")
+
+    def _finish(self, event_id, status, msg, attempts, ok, note=""):
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE outbox SET status = ?, attempts = attempts + ?, last_error = ?, delivered = ? "
+                            "WHERE id = ?", (status, attempts, None if ok else msg,
+                                             now if ok else None, event_id))
+            created = self.db.execute("SELECT created FROM outbox WHERE id = ?", (event_id,)).fetchone()[0]
+            if ok:
+                self.counts["delivered"] += 1
+                self.latencies.append((now - created) * 1000)
+            elif status == "dead":
+                self.counts["dead"] += 1
+            handle = self.handles.pop(event_id)
+        handle.ok, handle.msg = ok, msg + note
+        handle.done.set()
+
+    def resume(self):
+        """Start delivering events left pending by earlier runs (no-op without an outbox or a URL)."""
+        if self.db is None and os.path.exists(self.path) and any(map(os.getenv, OUTBOX_TARGETS.values())):
+            with self.lock:
+                self._start()
+
+    def drain(self, timeout=15.0):
+        """Wait (bounded) for queued deliveries; anything unfinished stays pending for the next run."""
+        deadline = time.monotonic() + timeout
+        while self.handles and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return not self.handles
+
+    def stats(self):
+        """Queue depth and delivery latency; reads the database only if it exists."""
+        out = {k: v for k, v in self.counts.items()}
+        if self.db is None and not os.path.exists(self.path):
+            return dict(out, pending=0, failed=0)
+        with self.lock:
+            self._start()
+            rows = dict(self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        out.update(pending=rows.get("pending", 0), failed=rows.get("dead", 0), in_flight=len(self.handles))
+        if self.latencies:
+            out["latency_ms"] = {"p50": round(percentile(self.latencies, 50), 1),
+                                 "p95": round(percentile(self.latencies, 95), 1),
+                                 "max": round(max(self.latencies), 1)}
+        return out
+
+OUTBOX = Outbox(OUTBOX_PATH)
+
 # ---------- Make webhook ----------
 def post_to_make(payload: dict):
-    url = os.getenv("MAKE_WEBHOOK_URL")
-    if not url:
+    """Queue an event for the Make webhook; returns a Delivery to wait() on, or None without a URL."""
+    return OUTBOX.enqueue("make", payload)
+
+def make_result(delivery, timeout):
+    """(ok, message) for a Make delivery, waiting at most `timeout` seconds."""
+    if delivery is None:
         return False, "MAKE_WEBHOOK_URL secret missing"
-    r = requests.post(url, json=payload, timeout=20)
-    return (200 <= r.status_code < 300), f"HTTP {r.status_code}"
+    return delivery.wait(timeout)
 
-def handle_wire_make(issue_number: int):
-    ok, msg = post_to_make({
+def make_ping():
+    return post_to_make({
         "type": "test_ping",
         "from": "GitHubAgent",
         "repo": f"{GH_OWNER}/{GH_REPO}",
         "ts": datetime.datetime.utcnow().isoformat() + "Z"
     })
+
+def handle_wire_make(issue_number: int):
+    delivery = make_ping()
+    ok, msg = make_result(delivery, timeout=10)
+    if not ok and delivery is not None and not delivery.done.is_set():
+        comment_issue(issue_number, f"⏳ Make webhook is slow to answer; the test ping stays in the outbox ({msg})."); return
     comment_issue(
         issue_number,
         f"✅ Make webhook reached successfully ({msg})." if ok
         else f"❌ Could not reach Make webhook ({msg}). Add repo secret MAKE_WEBHOOK_URL."
     )
 
-# ---------- Site ensure / starter files ----------
-def ensure_file(default_branch, rel_path, starter_obj, auto_merge=True):
-    resp = get_contents(rel_path, ref=default_branch)
-    if resp.status_code == 200:
-        return "exists", None
+# ---------- Apps Script batch client ----------
+def apps_script_url():
+    return os.getenv("APPS_WEBAPP_URL") or cfg().section("apps_script").get("webapp_url") or ""
 
-    branch = f"agent/init-{datetime.datetime.utcnow().strftime('%Y%m%d-%H%M')}"
+class SheetBatcher:
+    """
+    Client for the listener's gotm_vote_batch / live_update_batch types. add() queues a
+    row stamped with its own time; a batch goes out once `max_rows` rows are waiting or
+    the oldest has waited `max_wait` seconds, and on close(). Every batch carries an id,
+    so a retry after a timeout can't write its rows twice.
+    """
+    def __init__(self, url, kind="gotm_vote", max_rows=200, max_wait=2.0, attempts=3, sheet_name=None):
+        import requests
+        self.url, self.kind, self.sheet_name = url, kind, sheet_name
+        self.max_rows, self.max_wait, self.attempts = max_rows, max_wait, attempts
+        self.session = requests.Session()          # no GitHub token on the web app
+        self.lock = threading.Lock()
+        self.sending = threading.Lock()            # batches go out one at a time, in order
+        self.rows, self.oldest, self.timer = [], None, None
+        self.stats = {"rows": 0, "batches": 0, "retries": 0, "failed_rows": 0, "max_wait_ms": 0.0}
+
+    def add(self, **row):
+        row.setdefault("ts", datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z")
+        with self.lock:
+            self.rows.append(row)
+            if self.timer is None:
+                self.oldest = time.monotonic()
+                self.timer = threading.Timer(self.max_wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            full = len(self.rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Send whatever is queued; False if a batch was dropped after all retries."""
+        with self.sending:
+            with self.lock:
+                rows, oldest, self.rows = self.rows, self.oldest, []
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            if not rows:
+                return True
+            ok = self._send(rows)
+            with self.lock:
+                waited = round((time.monotonic() - oldest) * 1000, 1)
+                self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited)
+            return ok
+
+    def _send(self, rows):
+        import uuid, requests
+        payload = {"type": f"{self.kind}_batch", "id": uuid.uuid4().hex, "items": rows}
+        if self.sheet_name:
+            payload["sheetName"] = self.sheet_name
+        for attempt in range(self.attempts):
+            started = time.perf_counter()
+            try:
+                r = self.session.post(self.url, json=payload, timeout=30)
+                TRACER.record("apps_script", f"POST apps:{payload['type']}", (time.perf_counter() - started) * 1000,
+                              status=r.status_code, bytes_out=len(r.request.body or b""), bytes_in=len(r.content))
+                if r.ok and (r.json() or {}).get("ok"):
+                    with self.lock:
+                        self.stats["rows"] += len(rows)
+                        self.stats["batches"] += 1
+                    return True
+            except (requests.RequestException, ValueError):
+                pass
+            if attempt < self.attempts - 1:
+                with self.lock:
+                    self.stats["retries"] += 1
+                time.sleep(conflict_backoff(attempt))
+        with self.lock:
+            self.stats["failed_rows"] += len(rows)
+        return False
+
+    def close(self):
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------- Goal of the Month ----------
+@contextlib.contextmanager
+def vote_lines(url):
+    """Text lines of a vote export (CSV or JSONL), streamed so the file never sits in memory."""
+    if not url.startswith(("https://", "http://")):
+        raise ValueError("Vote export must be an http(s) URL (CSV or JSONL)")
+    import io, requests
+    started = time.perf_counter()
+    with requests.get(url, stream=True, timeout=(10, 120)) as r:   # plain requests: no GitHub token
+        r.raise_for_status()
+        r.raw.decode_content = True
+        r.raw.auto_close = False       # TextIOWrapper reads once more after EOF
+        yield io.TextIOWrapper(r.raw, encoding="utf-8-sig", newline="")
+    TRACER.record("votes", "GET votes export", (time.perf_counter() - started) * 1000, status=r.status_code)
+
+def handle_gotm_open(issue_number: int, default_branch: str):
+    import gotm
+    config, now, was = cfg(), datetime.datetime.utcnow(), {}
+    def mutate(doc):
+        was.update(doc or {})
+        if was.get("status") == "open":
+            return doc
+        return gotm.open_round(doc, now, config.gotm_vote_window_days, config.gotm_channels)
     try:
-        create_branch(default_branch, branch)
-    except Exception:
-        pass
+        res = write_json_with_retry(gotm.GOTM_PATH, mutate, "chore(agent): open GOTM voting", default_branch)
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Failed to open GOTM voting: {e}"); return
+    if res is None:
+        comment_issue(issue_number, f"GOTM voting for {was.get('month')} is already open (closes {was.get('closes')})."); return
+    ok, status = request_deploy(default_branch, pushed_site=True)
+    comment_issue(issue_number, f"🗳️ GOTM voting open for {config.gotm_vote_window_days} days "
+                                f"(channels: {', '.join(config.gotm_channels) or 'any'}). Deploy: {deploy_note(ok, status)}")
+
+def handle_gotm_close(cmd: str, issue_number: int, default_branch: str):
+    """/gotm close [export-url]: stream the vote export, tally it and publish the result to gotm.json."""
+    import gotm
+    config, now = cfg(), datetime.datetime.utcnow()
+    doc, _ = read_json_file(gotm.GOTM_PATH, default_branch)
+    if not doc or doc.get("status") != "open":
+        comment_issue(issue_number, "❌ No GOTM round is open — start one with `/gotm open`."); return
+    words = cmd.split()
+    url = words[2] if len(words) > 2 else config.section("gotm").get("votes_url")
+    if not url:
+        comment_issue(issue_number, "❌ No vote export: set `gotm.votes_url` in agent/config.yml "
+                                    "or use `/gotm close <csv-or-jsonl-url>`."); return
+    try:
+        with vote_lines(url) as lines:
+            result = gotm.tally(gotm.read_rows(lines), doc["opened"],
+                                doc.get("window_days") or config.gotm_vote_window_days,
+                                doc.get("channels") or config.gotm_channels)
+        write_json_with_retry(gotm.GOTM_PATH, lambda current: gotm.close_round(current or doc, result, now),
+                              "chore(agent): close GOTM voting", default_branch)
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Failed to close GOTM voting: {e}"); return
+    ok, status = request_deploy(default_branch, pushed_site=True)
+    t = result["tally"]
+    out = [f"🏆 GOTM {doc.get('month')}"]
+    out += [f"{i}. {r['player']} — {r['votes']}" for i, r in enumerate(result["results"][:3], 1)] or ["No valid votes."]
+    out.append(f"\nCounted {t['counted']} of {t['rows']} rows: {t['duplicates']} duplicate, "
+               f"{t['outside_window']} outside the window, {t['other_channel']} other channel, {t['invalid']} invalid.")
+    out.append(f"Deploy: {deploy_note(ok, status)}")
+    comment_issue(issue_number, "\n".join(out))
+
+# ---------- Live match events ----------
+LIVE_COMMAND = re.compile(r"^/live\b")
+
+def live_config():
+    settings = cfg().section("live")
+    return dict(settings, team=settings.get("team") or cfg().section("standings").get("team"))
+
+def live_events(block):
+    """Events from one /live block: the short form (`/live goal 34 Smith`) or JSON (one event or a list)."""
+    import livefeed
+    rest = block.strip()[len("/live"):].strip()
+    if not rest.startswith(("{", "[", "```")):
+        return [livefeed.parse_event(rest.splitlines()[0] if rest else "")]
+    obj, err = extract_json_after_command(block)
+    if err:
+        raise ValueError(err)
+    events = obj if isinstance(obj, list) else [obj]
+    if not events:
+        raise ValueError("No events in the JSON list")
+    return [livefeed.clean_event(e) for e in events]
+
+def compact_live(head, branch):
+    """
+    Fold the head's segments into one file (or, after full time, the match archive) and
+    delete them, in one commit. Returns (mode, commit) or (None, None) when not needed.
+    """
+    import livefeed
+    mode = livefeed.needs_compaction(head, live_config())
+    if mode is None:
+        return None, None
+    _, existing = list_tree(get_branch_sha(branch))
+    existing = existing or {}
+    present = [s for s in head["segments"] if f"site/data/{s['path']}" in existing]
+    docs = [read_blob_json(existing[f"site/data/{s['path']}"]) for s in present]
+    writes, deletes = livefeed.compact(dict(head, segments=present), docs, final=mode == "final")
+    if not writes:
+        return None, None
+    mutations = dict(writes, **{path: DELETE for path in deletes})
+    label = "archive" if mode == "final" else "compact"
+    return mode, commit_json_mutations(mutations, f"chore(agent): {label} live events of {head['match']['id']}", branch)
+
+def handle_live(blocks, issue_number: int):
+    """One or more /live commands from a comment: all their events go into one segment and one commit."""
+    import livefeed
+    default_branch = repo_default_branch()
+    try:
+        events = [e for block in blocks for e in live_events(block)]
+    except ValueError as e:
+        comment_issue(issue_number, f"❌ {e}"); return
+    config = live_config()
+    notes = []
+    try:
+        if events[0]["kind"] == "kickoff":
+            # A finished match whose archiving failed is archived before the next one starts.
+            mode, _ = compact_live(read_json_file(livefeed.LIVE_PATH, default_branch)[0] or {}, default_branch)
+            if mode:
+                notes.append("archived the previous match")
+        out = {}
+
+        def mutate(head):
+            out["head"], path, segment = livefeed.append(head, events, config)
+            out["path"] = path
+            return (out["head"], {path: segment}) if path else out["head"]
+        commit = commit_json_mutations({livefeed.LIVE_PATH: mutate},
+                                       f"chore(agent): live {', '.join(e['kind'] for e in events)}", default_branch)
+    except ValueError as e:
+        comment_issue(issue_number, f"❌ {e}"); return
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Failed to post live events: {e}"); return
+    if commit is None:
+        comment_issue(issue_number, "✅ `live.json` already up to date; nothing committed."); return
+
+    head = out["head"]
+    try:
+        mode, compacted = compact_live(head, default_branch)
+        if compacted:
+            notes.append(f"archived to `{livefeed.ARCHIVE_DIR}/{head['match']['id']}.json`"
+                         if mode == "final" else f"merged {len(head['segments'])} segments")
+    except Exception as e:
+        notes.append(f"compaction failed, retried later: {e}")
+    ok, status = request_deploy(default_branch, pushed_site=True)
+    where = f" → `{out['path']}` (seq {head['seq']})" if out["path"] else ""
+    extra = f" ({'; '.join(notes)})" if notes else ""
+    comment_issue(issue_number, f"✅ {head.get('text', '')}{where}{retry_note(commit)}{extra}. "
+                                f"Deploy: {deploy_note(ok, status)}")
+
+# ---------- Match archive queries ----------
+QUERY_USAGE = "Use `/query h2h <team>`, `/query form [n] [competition]` or `/query biggest [wins|defeats] [n]`"
+
+def load_archive(default_branch):
+    """archive.json, or one built on the spot from results.json when it isn't derived."""
+    import archive
+    doc, _ = read_json_file("site/data/archive.json", default_branch)
+    if doc and doc.get("columns"):
+        return doc
+    results, _ = read_json_file(DATA_FILES["results"], default_branch)
+    return archive.build(results or {}, cfg().section("archive"))
+
+def run_query(words, doc):
+    """(query name, result) for `/query …` words after the command; ValueError on bad input."""
+    import archive
+    from playerstats import slugify
+    if not words:
+        raise ValueError(QUERY_USAGE)
+    kind, args = words[0].lower(), words[1:]
+    if kind == "h2h":
+        if not args:
+            raise ValueError("Which team? `/query h2h Borough`")
+        result = archive.h2h(doc, " ".join(args))
+        return f"h2h-{slugify(result['opp'])}", result
+    n = next((int(a) for a in args if a.isdigit()), None)
+    rest = [a for a in args if not a.isdigit()]
+    if kind == "form":
+        return "form", archive.form(doc, n or 5, " ".join(rest) or None)
+    if kind == "biggest":
+        which = rest[0].lower() if rest else "wins"
+        return f"biggest-{which}", archive.biggest(doc, which, n or 5)
+    raise ValueError(QUERY_USAGE)
+
+def render_query(name, result):
+    def line(m):
+        venue = "H" if m["home"] else "A"
+        return f"- {m['date']} {m['result']} {m['score']} vs {m['opp']} ({venue}, {m['competition']})"
+    if name.startswith("h2h-"):
+        r = result
+        return "\n".join([f"**Record vs {r['opp']}**: P{r['p']} W{r['w']} D{r['d']} L{r['l']}, "
+                          f"goals {r['gf']}–{r['ga']}", "", "Last meetings:"] + [line(m) for m in r["last"]])
+    if name == "form":
+        return "\n".join([f"**Form** (newest first): {result['form'] or '—'}", ""] + [line(m) for m in result["matches"]])
+    return "\n".join([f"**Biggest {result['kind']}**", ""] + [line(m) for m in result["matches"]])
+
+def handle_query(cmd: str, issue_number: int, default_branch: str):
+    """/query … [publish]: answered from archive.json; `publish` also writes site/data/queries/<name>.json."""
+    words = cmd.split()[1:]
+    publish = bool(words) and words[-1].lower() == "publish"
+    try:
+        name, result = run_query(words[:-1] if publish else words, load_archive(default_branch))
+    except ValueError as e:
+        comment_issue(issue_number, f"❌ {e}"); return
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Query failed: {e}"); return
+    out = render_query(name, result)
+    if publish:
+        path = f"site/data/queries/{name}.json"
+        try:
+            res = write_json_with_retry(path, lambda _doc: dict(result, query=" ".join(words[:-1])),
+                                        f"chore(agent): publish {name} query", default_branch)
+            ok, status = request_deploy(default_branch, pushed_site=res is not None)
+            out += f"\n\nPublished `{path}`. Deploy: {deploy_note(ok, status)}" if res else \
+                   f"\n\n`{path}` already up to date."
+        except Exception as e:
+            out += f"\n\n❌ Failed to publish `{path}`: {e}"
+    comment_issue(issue_number, out)
 
-    put_contents(rel_path, json.dumps(starter_obj, indent=2).encode("utf-8"),
-                 f"chore(agent): add starter {rel_path}", branch)
-    pr = open_pr(branch, default_branch, f"Agent: add starter {os.path.basename(rel_path)}",
-                 f"Adds minimal {rel_path} so the site widget renders.")
+# ---------- Site ensure / starter files ----------
+def starter_doc(path):
+    starter = {"updated": datetime.datetime.utcnow().isoformat() + "Z"}
+    if path.endswith("table.json"):
+        starter["rows"] = [{
+            "team": "Syston Town Tigers",
+            "p": 0, "w": 0, "d": 0, "l": 0, "gf": 0, "ga": 0, "gd": 0, "pts": 0
+        }]
+    if path.endswith("live.json"):
+        starter["text"] = "Waiting for next match…"
+    if path.endswith("fixtures.json"):
+        starter["fixtures"] = []   # [{"date":"2025-09-12","opp":"Borough","home":true,"ko":"14:00"}]
+    if path.endswith("results.json"):
+        starter["results"] = []    # [{"date":"2025-09-09","opp":"Borough","score":"2-1","scorers":["Smith 34","Jones 78"]}]
+    if path.endswith("stats.json"):
+        starter["stats"] = {}      # {"top_scorer":{"name":"-","goals":0}, "clean_sheets":0, ...}
+    return starter
+
+def add_starters(default_branch, head, base_tree, paths, auto_merge=True):
+    """All missing starters in one branch, one commit and one PR."""
+    files = {p: json.dumps(starter_doc(p), indent=2) for p in paths}
+    names = ", ".join(os.path.basename(p) for p in paths)
+    commit = build_commit(files, f"chore(agent): add starter {names}", head, base_tree=base_tree)
+    # Seconds + commit sha keep branch names unique even for same-minute runs.
+    branch = f"agent/init-{datetime.datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit['sha'][:7]}"
+    create_ref(branch, commit["sha"])
+    pr = open_pr(branch, default_branch, f"Agent: add starter {names}",
+                 "Adds minimal site data so the site widgets render:\n" +
+                 "\n".join(f"- `{p}`" for p in paths))
     pr_url = pr.get("html_url")
     if auto_merge:
         merged, _ = merge_pr(pr.get("number"))
         return ("merged" if merged else "pr_opened"), pr_url
     return "pr_opened", pr_url
 
-def ensure_site(default_branch):
-    """Ensure core site data files exist (configurable via agent/config.yml)."""
-    load_cfg()
-    # extend ensure_files with new data files
-    want = CFG.get("site", {}).get("ensure_files", [
-        "site/data/table.json",
-        "site/data/live.json",
-        "site/data/fixtures.json",
-        "site/data/results.json",
-        "site/data/stats.json"
-    ])
-    results = []
-    for path in want:
-        starter = {"updated": datetime.datetime.utcnow().isoformat() + "Z"}
-        if path.endswith("table.json"):
-            starter["rows"] = [{
-                "team": "Syston Town Tigers",
-                "p": 0, "w": 0, "d": 0, "l": 0, "gf": 0, "ga": 0, "gd": 0, "pts": 0
-            }]
-        if path.endswith("live.json"):
-            starter["text"] = "Waiting for next match…"
-        if path.endswith("fixtures.json"):
-            starter["fixtures"] = []   # [{"date":"2025-09-12","opp":"Borough","home":true,"ko":"14:00"}]
-        if path.endswith("results.json"):
-            starter["results"] = []    # [{"date":"2025-09-09","opp":"Borough","score":"2-1","scorers":["Smith 34","Jones 78"]}]
-        if path.endswith("stats.json"):
-            starter["stats"] = {}      # {"top_scorer":{"name":"-","goals":0}, "clean_sheets":0, ...}
-        state, pr_url = ensure_file(default_branch, path, starter, auto_merge=True)
-        results.append((path, state, pr_url))
-    return results
+def ensure_paths():
+    """ensure_files plus what the deploy's data build shards; never the build's own outputs."""
+    import sitebuild
+    build = cfg().section("site").get("build")
+    paths = list(cfg().ensure_files) + sitebuild.sources(build)
+    return [p for p in dict.fromkeys(paths) if not sitebuild.is_output(p)]
+
+def ensure_site(default_branch, known=None):
+    """
+    Ensure core site data files exist (configurable via agent/config.yml).
+    Existence comes from one recursive tree listing; anything missing lands in a
+    single PR, so the call count doesn't grow with the number of files.
+    `known` ({path: blob-or-None}, e.g. from collect_status) skips the listing when
+    it already shows every file present.
+    """
+    want = ensure_paths()
+    if known is not None and all(known.get(p) for p in want):
+        return [(p, "exists", None) for p in want]
+    head = get_branch_sha(default_branch)
+    if not head:
+        raise RuntimeError(f"Base branch not found: {default_branch}")
+    base_tree, tree = list_tree(head)
+    if tree is None:   # truncated listing: fall back to per-file checks
+        tree = {p: True for p in want if get_contents(p, ref=head).status_code == 200}
+    missing = [p for p in want if p not in tree]
+    if not missing:
+        return [(p, "exists", None) for p in want]
+    state, pr_url = add_starters(default_branch, head, base_tree, missing)
+    return [(p, state, pr_url) if p in missing else (p, "exists", None) for p in want]
 
 # ---------- Repo writers for setup ----------
 def repo_write_text(path, text, message, branch):
@@ -330,18 +2124,18 @@ def extract_json_after_command(raw: str):
     if "```" in s:
         parts = s.split("```", 2)
         if len(parts) >= 3:
-            first = parts[1].strip().lower()
-            payload = parts[2] if first.startswith("json") else parts[1]
-            if "```" in payload:
-                payload = payload.split("```", 1)[0]
+            payload = parts[1].lstrip()
+            if payload.lower().startswith("json"):   # ```json language tag
+                payload = payload[4:]
             try:
                 return json.loads(payload), None
             except Exception as e:
                 return None, f"Invalid JSON in code block: {e}"
 
-    # Inline JSON on same line
-    start = s.find("{")
-    end = s.rfind("}")
+    # Inline JSON on same line (an object, or an array for JSON patches)
+    starts = [i for i in (s.find("{"), s.find("[")) if i != -1]
+    start = min(starts) if starts else -1
+    end = s.rfind("}" if start != -1 and s[start] == "{" else "]")
     if start != -1 and end != -1 and end > start:
         try:
             return json.loads(s[start:end+1]), None
@@ -352,18 +2146,13 @@ def extract_json_after_command(raw: str):
 
 # ---------- Help text ----------
 def render_help():
-    load_cfg()
-    tz = CFG.get("timezone", "Europe/London")
-    files = CFG.get("site", {}).get("ensure_files", [
-        "site/data/table.json",
-        "site/data/live.json",
-        "site/data/fixtures.json",
-        "site/data/results.json",
-        "site/data/stats.json"
-    ])
-    gotm = CFG.get("gotm", {}) or {}
-    window = gotm.get("vote_window_days", 7)
-    channels = ", ".join(gotm.get("channels", [])) or "—"
+    config = cfg()
+    tz = config.timezone
+    files = ensure_paths()
+    window = config.gotm_vote_window_days
+    channels = ", ".join(config.gotm_channels) or "—"
+    derived = lambda section: ("derived from results.json on every results write"
+                               if config.section(section).get("derive") else "posted by hand")
     return (
         "Agent commands\n"
         "- `/help` — show this help\n"
@@ -372,25 +2161,223 @@ def render_help():
         "- `/wire make` — send a test_ping to your Make webhook\n"
         "- `/setup apps` — add Apps Script listener files to repo\n"
         "- `/setup make` — add Make.com blueprint JSONs to repo\n"
-        "- `/update live` … JSON\n"
+        "- `/live kickoff Borough [home|away]`, `/live goal 34 Smith`, `/live card 60 Jones red`, "
+        "`/live sub 70 Brown for Smith`, `/live ht`, `/live ft`, `/live note …` — append match events "
+        "(add `them` for the opposition; several `/live` lines in one comment make one update)\n"
+        "- `/update live` … JSON (replaces `live.json` outright)\n"
         "- `/update table` … JSON\n"
         "- `/update fixtures` … JSON\n"
         "- `/update results` … JSON\n"
         "- `/update stats` … JSON\n"
-        "- `/gotm open` — (placeholder) open Goal of the Month voting\n"
-        "- `/gotm close` — (placeholder) close voting & compute winner\n\n"
+        "- `/update batch` … JSON keyed by file (`{\"table\": …, \"results\": …}`) — one commit\n"
+        "- `/patch <file>` … JSON object (merge patch) or array (JSON patch, e.g. `[{\"op\":\"add\",\"path\":\"/results/-\",\"value\":{…}}]`)\n"
+        "- Several `/update` / `/patch` commands in one comment (each on its own line) are applied as one commit\n"
+        "- `/query h2h <team>` / `/query form [n] [competition]` / `/query biggest [wins|defeats] [n]` — "
+        "answers from the match archive; add `publish` to write it to `site/data/queries/`\n"
+        "- `/gotm open` — open Goal of the Month voting (`site/data/gotm.json`)\n"
+        "- `/gotm close [export-url]` — tally the vote export (CSV/JSONL; default `gotm.votes_url`) & publish the winner\n\n"
         "Current config\n"
         f"- timezone: `{tz}`\n"
         f"- ensure_files: `{', '.join(files)}`\n"
         f"- GOTM window: `{window}` days\n"
         f"- GOTM channels: `{channels}`\n"
+        f"- table.json: {derived('standings')}\n"
+        f"- stats.json: {derived('player_stats')}\n"
+        f"- archive.json / records.json: {derived('archive')}\n"
+        f"- site data build: {build_note()}\n"
     )
 
+def build_note():
+    import sitebuild
+    opts = sitebuild.options(cfg().section("site").get("build"))
+    if not opts["build"]:
+        return "off (pages fetch the whole data files)"
+    extra = "" if opts["host"] != "static" else ", gzip/brotli copies" if opts["brotli"] else ", gzip copies"
+    return ("on deploy: hashed shards (results by season, fixtures by month) + `data/manifest.json`"
+            f" for {opts['host']}{extra}")
+
 # ---------- Command handling ----------
+DATA_FILES = {
+    "live":     "site/data/live.json",
+    "table":    "site/data/table.json",
+    "fixtures": "site/data/fixtures.json",
+    "results":  "site/data/results.json",
+    "stats":    "site/data/stats.json",
+}
+
+def handle_update_batch(cmd: str, issue_number: int, default_branch: str):
+    """/update batch { "table": {...}, "results": {...} } → one commit for all files."""
+    obj, err = extract_json_after_command(cmd)
+    if err:
+        comment_issue(issue_number, f"❌ {err}"); return
+    if not isinstance(obj, dict) or not obj:
+        comment_issue(issue_number, "❌ Batch payload must be a JSON object keyed by file: "
+                                    f"{', '.join(DATA_FILES)}"); return
+    unknown = [k for k in obj if k not in DATA_FILES]
+    if unknown:
+        comment_issue(issue_number, f"❌ Unknown file(s) in batch: {', '.join(unknown)}. "
+                                    f"Use: {', '.join(DATA_FILES)}"); return
+    docs = {DATA_FILES[k]: v for k, v in obj.items()}
+    try:
+        commit = commit_json_files(docs, f"chore(agent): update {', '.join(obj)} via issue command", default_branch)
+        if commit is None:
+            comment_issue(issue_number, "✅ No changes — files already up to date; nothing committed."); return
+        ok, status = request_deploy(default_branch, pushed_site=touches_site(commit["changed"]))
+        comment_issue(issue_number, "✅ Updated " + ", ".join(f"`{p}`" for p in commit["changed"]) +
+                      f" in one commit{retry_note(commit)}. Deploy: {deploy_note(ok, status)}")
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Failed to update batch: {e}")
+
+def handle_patch(cmd: str, issue_number: int, default_branch: str, path: str):
+    """/patch <file> with a merge-patch object or a JSON-patch array, applied to the current file."""
+    patch, err = extract_json_after_command(cmd)
+    if err:
+        comment_issue(issue_number, f"❌ {err}"); return
+    try:
+        # Re-applied to the fresh document if another run wrote the file first.
+        res = write_json_with_retry(path, lambda doc: apply_patch(doc if doc is not None else {}, patch),
+                                    f"chore(agent): patch {os.path.basename(path)} via issue command",
+                                    default_branch)
+        if res is None:
+            comment_issue(issue_number, f"✅ Patch leaves `{path}` unchanged; nothing committed."); return
+        ok, status = request_deploy(default_branch, pushed_site=True)
+        comment_issue(issue_number, f"✅ Patched `{path}`{retry_note(res)}. Deploy: {deploy_note(ok, status)}")
+    except JsonPatchError as e:
+        comment_issue(issue_number, f"❌ Patch does not apply to {path}: {e}")
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Failed to patch {path}: {e}")
+
+# ---------- Command scripts (several commands in one comment) ----------
+WRITE_COMMAND = re.compile(r"^/(update|patch)\s+([a-z_]+)")
+PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+def split_commands(text):
+    """
+    Split a comment into command blocks: each starts at a line beginning with "/"
+    (outside a code fence) and runs until the next one, so JSON bodies — inline or
+    fenced — stay with their command. Text before the first command is ignored.
+    """
+    blocks, current, fenced = [], None, False
+    for line in (text or "").splitlines():
+        stripped = line.strip()
+        if not fenced and stripped.startswith("/"):
+            if current is not None:
+                blocks.append("\n".join(current).strip())
+            current = [stripped]
+            continue
+        if stripped.startswith("```") and stripped.count("```") % 2 == 1:
+            fenced = not fenced
+        if current is not None:
+            current.append(line)
+    if current is not None:
+        blocks.append("\n".join(current).strip())
+    return blocks
+
+def is_write_command(block):
+    return bool(WRITE_COMMAND.match(block.strip().lower()))
+
+def validate_patch(patch):
+    if isinstance(patch, dict):
+        return
+    if not isinstance(patch, list):
+        raise ValueError("Patch must be a JSON object (merge patch) or array (JSON patch)")
+    for op in patch:
+        if not isinstance(op, dict) or op.get("op") not in PATCH_OPS or not isinstance(op.get("path"), str):
+            raise ValueError(f"Malformed patch operation: {json.dumps(op)[:80]}")
+
+def plan_write(block):
+    """
+    Parse and validate one /update or /patch block without touching the repo.
+    Returns [(path, mutate)]; raises ValueError with a user-facing message.
+    """
+    verb, name = WRITE_COMMAND.match(block.strip().lower()).groups()
+    obj, err = extract_json_after_command(block)
+    if err:
+        raise ValueError(err)
+    if verb == "update" and name == "batch":
+        if not isinstance(obj, dict) or not obj:
+            raise ValueError(f"Batch payload must be a JSON object keyed by file: {', '.join(DATA_FILES)}")
+        unknown = [k for k in obj if k not in DATA_FILES]
+        if unknown:
+            raise ValueError(f"Unknown file(s) in batch: {', '.join(unknown)}")
+        return [(DATA_FILES[k], lambda _doc, v=v: v) for k, v in obj.items()]
+    if name not in DATA_FILES:
+        raise ValueError(f"Unknown file `{name}`. Use: {', '.join(DATA_FILES)}")
+    if verb == "update":
+        return [(DATA_FILES[name], lambda _doc: obj)]
+    validate_patch(obj)
+    return [(DATA_FILES[name], lambda doc: apply_patch(doc if doc is not None else {}, obj))]
+
+def _chain(prev, mutate, label):
+    def run(doc):
+        if prev is not None:
+            doc = prev(doc)
+        try:
+            return mutate(doc)
+        except JsonPatchError as e:
+            raise JsonPatchError(f"{label}: {e}")
+    return run
+
+def handle_script(blocks, issue_number: int):
+    """
+    One or more command blocks from a single comment. If they are all /update or /patch,
+    they are validated together, applied as one commit and answered with one comment;
+    otherwise each runs through handle_command in order.
+    """
+    if len(blocks) > 1 and all(is_write_command(b) for b in blocks):
+        with TRACER.command(f"script ({len(blocks)} writes)"):
+            handle_write_script(blocks, issue_number)
+        return
+    if len(blocks) > 1 and all(LIVE_COMMAND.match(b.lower()) for b in blocks):
+        with TRACER.command(f"script ({len(blocks)} live events)"):
+            handle_live(blocks, issue_number)
+        return
+    for block in blocks:
+        # Only writes and /live take a body; other commands are just their first line.
+        takes_body = is_write_command(block) or LIVE_COMMAND.match(block.lower())
+        handle_command(block if takes_body else block.splitlines()[0], issue_number)
+
+def handle_write_script(blocks, issue_number: int):
+    default_branch = repo_default_branch()
+    labels = [b.splitlines()[0].split("{", 1)[0].split("[", 1)[0].strip() for b in blocks]
+    plans, errors = [], []
+    for i, (label, block) in enumerate(zip(labels, blocks), 1):
+        try:
+            plans.append((label, plan_write(block)))
+        except ValueError as e:
+            errors.append(f"{i}. `{label}` — {e}")
+    if errors:
+        comment_issue(issue_number, "❌ Nothing applied — fix these and resend the whole comment:\n" +
+                      "\n".join(errors)); return
+
+    mutations = {}
+    for label, steps in plans:
+        for path, mutate in steps:
+            mutations[path] = _chain(mutations.get(path), mutate, label)
+    try:
+        commit = commit_json_mutations(mutations, f"chore(agent): apply {len(blocks)} commands via issue comment",
+                                       default_branch)
+    except JsonPatchError as e:
+        comment_issue(issue_number, f"❌ Nothing applied — a patch does not apply: {e}"); return
+    except Exception as e:
+        comment_issue(issue_number, f"❌ Nothing applied: {e}"); return
+
+    out = [f"Applied {len(blocks)} commands"]
+    out += [f"{i}. ✅ `{label}`" for i, label in enumerate(labels, 1)]
+    if commit is None:
+        out.append("\nNo file changed; nothing committed.")
+    else:
+        ok, status = request_deploy(default_branch, pushed_site=touches_site(commit["changed"]))
+        out.append("\nOne commit: " + ", ".join(f"`{p}`" for p in commit["changed"]) + retry_note(commit))
+        out.append(f"Deploy: {deploy_note(ok, status)}")
+    comment_issue(issue_number, "\n".join(out))
+
 def handle_command(cmd: str, issue_number: int):
-    repo = get_repo()
-    default_branch = repo.get("default_branch", "main")
-    load_cfg()
+    with TRACER.command(command_name(cmd)):
+        _handle_command(cmd, issue_number)
+
+def _handle_command(cmd: str, issue_number: int):
+    default_branch = repo_default_branch()
 
     c = (cmd or "").strip().lower()
 
@@ -398,12 +2385,24 @@ def handle_command(cmd: str, issue_number: int):
         comment_issue(issue_number, render_help()); return
 
     if c in ("/status", "status"):
-        pages = latest_pages_build()
+        snap = collect_status(include_runs=True)
         msg = [
             f"Agent status for {GH_OWNER}/{GH_REPO}",
-            f"- Default branch: {default_branch}",
-            f"- Pages build: {pages.get('status')} at {pages.get('updated_at')}" if pages else "- Pages build: (not available yet)"
+            f"- Default branch: {snap['default_branch']} @ `{(snap['head'] or '')[:7]}`",
+            pages_line(snap["pages"]),
         ]
+        for run in snap["deploy_runs"][:1]:
+            msg.append(f"- Last deploy: {run.get('status')} {run.get('conclusion') or ''} ({run.get('event')})".rstrip())
+        if snap["checklist"]:
+            msg.append(f"- Launch checklist: #{snap['checklist']['number']}")
+        outbox = OUTBOX.stats()
+        if outbox["pending"] or outbox["failed"]:
+            msg.append(f"- Make outbox: {outbox['pending']} pending, {outbox['failed']} failed")
+        msg.append("")
+        msg.append("Site data")
+        for path, blob in snap["files"].items():
+            size = f" ({blob['size']} bytes)" if blob and blob.get("size") is not None else ""
+            msg.append(f"- {'✅' if blob else '❌'} `{path}`{size}")
         comment_issue(issue_number, "\n".join(msg)); return
 
     if c in ("/ensure", "/ensure site"):
@@ -416,34 +2415,39 @@ def handle_command(cmd: str, issue_number: int):
                 out.append(f"✅ {path} added & merged")
             else:
                 out.append(f"🆕 {path} added — PR: {pr}")
-        ok, code = dispatch_workflow("site-deploy.yml", default_branch)
-        out.append(f"\nDeploy trigger: {'✅ sent' if ok else f'❌ ({code})'}")
+        merged = any(state == "merged" for _, state, _ in res)
+        ok, status = request_deploy(default_branch, pushed_site=merged)
+        out.append(f"\nDeploy trigger: {deploy_note(ok, status)}")
         comment_issue(issue_number, "\n".join(out)); return
 
     if c in ("/wire make", "/test make"):
         handle_wire_make(issue_number); return
 
     # ---- Update JSON files ----
-    path_map = {
-        "/update live":      "site/data/live.json",
-        "/update table":     "site/data/table.json",
-        "/update fixtures":  "site/data/fixtures.json",
-        "/update results":   "site/data/results.json",
-        "/update stats":     "site/data/stats.json",
-    }
-    for key, path in path_map.items():
-        if c.startswith(key):
+    if c.startswith("/update batch"):
+        handle_update_batch(cmd, issue_number, default_branch); return
+
+    for name, path in DATA_FILES.items():
+        if c.startswith(f"/update {name}"):
             obj, err = extract_json_after_command(cmd)
             if err:
                 comment_issue(issue_number, f"❌ {err}"); return
             try:
-                update_file_json(path, obj, f"chore(agent): update {os.path.basename(path)} via issue command", default_branch)
-                dispatch_workflow("site-deploy.yml", default_branch)
-                comment_issue(issue_number, f"✅ Updated `{path}` and triggered deploy.")
+                res = write_json_with_retry(path, lambda _doc: obj,
+                                            f"chore(agent): update {os.path.basename(path)} via issue command",
+                                            default_branch)
+                if res is None:
+                    comment_issue(issue_number, f"✅ `{path}` already up to date; nothing committed."); return
+                ok, status = request_deploy(default_branch, pushed_site=True)
+                comment_issue(issue_number, f"✅ Updated `{path}`{retry_note(res)}. Deploy: {deploy_note(ok, status)}")
             except Exception as e:
                 comment_issue(issue_number, f"❌ Failed to update {path}: {e}")
             return
 
+    for name, path in DATA_FILES.items():
+        if c.startswith(f"/patch {name}"):
+            handle_patch(cmd, issue_number, default_branch, path); return
+
     # ---- Setup commands ----
     if c.startswith("/setup apps"):
         try:
@@ -478,38 +2482,35 @@ def handle_command(cmd: str, issue_number: int):
             comment_issue(issue_number, f"❌ Failed to write Make blueprints: {e}")
         return
 
+    if c.startswith("/query"):
+        handle_query(cmd.strip(), issue_number, default_branch); return
+
+    if LIVE_COMMAND.match(c):
+        handle_live([cmd.strip()], issue_number); return
+
     if c.startswith("/gotm open"):
-        window = CFG.get("gotm", {}).get("vote_window_days", 7)
-        comment_issue(issue_number, f"GOTM: will open voting for this month (window {window} days). Wire Make/Apps Script to execute."); return
+        handle_gotm_open(issue_number, default_branch); return
 
     if c.startswith("/gotm close"):
-        comment_issue(issue_number, "GOTM: will close voting and compute winner. Wire Make/Apps Script to execute."); return
+        handle_gotm_close(cmd.strip(), issue_number, default_branch); return
 
     comment_issue(issue_number, "Unknown command. Try `/help`.")
 
 # ---------- Bootstrap ----------
 def bootstrap():
-    repo = get_repo()
-    default_branch = repo.get("default_branch", "main")
-    load_cfg()
+    snap = collect_status()
+    default_branch = snap["default_branch"]
 
-    ensured = ensure_site(default_branch)
-    deploy_ok, deploy_code = dispatch_workflow("site-deploy.yml", default_branch)
-
-    make_ok, make_msg = post_to_make({
-        "type": "test_ping",
-        "from": "GitHubAgent",
-        "repo": f"{GH_OWNER}/{GH_REPO}",
-        "ts": datetime.datetime.utcnow().isoformat() + "Z"
-    })
-
-    pages = latest_pages_build()
-    pages_line = f"- Pages build: {pages.get('status')} at {pages.get('updated_at')}" if pages else "- Pages build: (not available yet)"
+    ping = make_ping()     # delivered in the background while the site is checked
+    ensured = ensure_site(default_branch, known=snap["files"])
+    deploy_ok, deploy_status = request_deploy(
+        default_branch, pushed_site=any(state == "merged" for _, state, _ in ensured))
+    make_ok, make_msg = make_result(ping, timeout=5)
 
     lines = []
     lines.append("## Launch checklist")
     lines.append(f"- Repo: {GH_OWNER}/{GH_REPO}  |  Default branch: {default_branch}")
-    lines.append(pages_line)
+    lines.append(pages_line(snap["pages"]))
     lines.append("")
     lines.append("### Site data")
     for path, state, pr in ensured:
@@ -521,13 +2522,15 @@ def bootstrap():
             lines.append(f"- 🆕 {path} — PR: {pr}")
     lines.append("")
     lines.append("### Pages deploy")
-    lines.append(f"- Trigger sent: {'✅' if deploy_ok else f'❌ ({deploy_code})'}")
+    lines.append(f"- Trigger: {deploy_note(deploy_ok, deploy_status)}")
     lines.append("")
     lines.append("### Make webhook")
     lines.append(f"- {'✅ Reachable' if make_ok else '❌ Not reachable'} ({make_msg})")
 
-    title = "Agent: Launch checklist"
-    existing = find_issue_by_title(title)
+    title = CHECKLIST_TITLE
+    # The GraphQL search is eventually consistent: a checklist created moments ago may not
+    # show up there yet, so confirm a miss against the issue index.
+    existing = snap["checklist"] or find_issue_by_title(title)
     body = "\n".join(lines)
     if existing:
         update_issue_body(existing["number"], body)
@@ -535,6 +2538,178 @@ def bootstrap():
     else:
         create_issue(title, body)
 
+# ---------- Events ----------
+# Same triggers as .github/workflows/agent-listener.yml; a repo webhook sends every action
+# (edited/deleted comments, closed/assigned issues …), which must not re-run commands.
+EVENT_ACTIONS = {"issue_comment": ("created",), "issues": ("opened", "edited", "labeled")}
+
+def handle_event(event, commands_only=False):
+    """
+    Run the command(s) carried by an issue_comment / issues payload.
+    commands_only skips text that isn't a slash command (serve mode also receives
+    the agent's own reply comments).
+    """
+    kind = "issue_comment" if "comment" in event else "issues" if "issue" in event else None
+    if kind is None or event.get("action") not in EVENT_ACTIONS[kind]:
+        return False
+    remember_repo(event.get("repository"))
+    if kind == "issue_comment":
+        text = (event["comment"].get("body") or "").strip()
+    else:                    # issues opened/edited/labeled
+        text = event["issue"].get("body") or ""
+    issue_number = event["issue"]["number"]
+
+    blocks = split_commands(text)
+    if not blocks:
+        if commands_only:
+            return False
+        # No slash command: same single-command handling as before ("help", "Unknown command").
+        handle_command(text if "comment" in event else (text.splitlines() or [""])[0], issue_number)
+        return True
+    handle_script(blocks, issue_number)
+    return True
+
+# ---------- Webhook server (--mode serve) ----------
+def verify_signature(secret: str, body: bytes, signature: str):
+    """GitHub's X-Hub-Signature-256: "sha256=" + HMAC-SHA256(secret, raw body)."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+class WebhookWorker:
+    """
+    Bounded queue of webhook deliveries drained by a few worker threads. Session,
+    config and HTTP cache stay warm for the life of the process.
+    """
+
+    EVENTS = ("issue_comment", "issues")
+
+    def __init__(self, secret, workers=2, queue_size=100):
+        import queue
+        self.secret = secret
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.recent = OrderedDict()      # delivery id -> None, for dropping redeliveries
+        self.stats = {"accepted": 0, "rejected": 0, "ignored": 0, "handled": 0, "failed": 0}
+        self.threads = [threading.Thread(target=self._work, daemon=True, name=f"agent-worker-{i}")
+                        for i in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def _bump(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def deliver(self, headers, body: bytes):
+        """One HTTP delivery → (status, message). Headers is any case-insensitive mapping."""
+        if not verify_signature(self.secret, body, headers.get("X-Hub-Signature-256", "")):
+            self._bump("rejected")
+            return 401, "bad signature"
+        event_name = headers.get("X-GitHub-Event", "")
+        if event_name == "ping":
+            return 200, "pong"
+        if event_name not in self.EVENTS:
+            self._bump("ignored")
+            return 202, f"ignored event {event_name}"
+        try:
+            event = json.loads(body.decode("utf-8"))
+        except ValueError:
+            return 400, "invalid JSON"
+        delivery = headers.get("X-GitHub-Delivery", "")
+        # The id is recorded only once the event is queued, so a redelivery of a
+        # rejected (503) delivery still gets through.
+        with self.lock:
+            if delivery and delivery in self.recent:
+                self.stats["ignored"] += 1
+                return 202, "duplicate delivery"
+            try:
+                self.queue.put_nowait((event_name, event))
+            except Exception:
+                self.stats["rejected"] += 1
+                return 503, "queue full"
+            if delivery:
+                self.recent[delivery] = None
+                if len(self.recent) > 1000:
+                    self.recent.popitem(last=False)
+            self.stats["accepted"] += 1
+        return 202, "queued"
+
+    def _work(self):
+        while True:
+            event_name, event = self.queue.get()
+            try:
+                if handle_event(event, commands_only=True):
+                    self._bump("handled")
+                else:
+                    self._bump("ignored")
+            except Exception as e:
+                self._bump("failed")
+                print(f"Agent error handling {event_name}:", e)
+            finally:
+                self.queue.task_done()
+                # A failed save/flush must not take the worker thread down with it.
+                for flush in (HTTP_CACHE.save, TRACER.flush):
+                    try:
+                        flush()
+                    except Exception as e:
+                        print(f"Agent error in {flush.__qualname__}:", e)
+
+    def health(self):
+        with self.lock:
+            return {**self.stats, "queued": self.queue.qsize(), "budget": SCHEDULER.budget_report()}
+
+def make_webhook_server(worker, host="127.0.0.1", port=8080):
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, payload):
+            out = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            if self.path.rstrip("/") in ("", "/healthz"):
+                self._reply(200, worker.health())
+            else:
+                self._reply(404, {"message": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > 25 * 1024 * 1024:     # GitHub caps payloads at 25 MB
+                self._reply(413, {"message": "payload too large"}); return
+            status, msg = worker.deliver(self.headers, self.rfile.read(length))
+            self._reply(status, {"message": msg})
+
+        def log_message(self, fmt, *args):
+            print("serve:", fmt % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve():
+    secret = os.getenv("AGENT_WEBHOOK_SECRET", "")
+    if not secret:
+        raise RuntimeError("AGENT_WEBHOOK_SECRET is required for --mode serve")
+    serve_cfg = cfg().section("serve")
+    host = serve_cfg.get("host", "127.0.0.1")
+    port = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else int(serve_cfg.get("port", 8080))
+    worker = WebhookWorker(secret, workers=int(serve_cfg.get("workers", 2)),
+                           queue_size=int(serve_cfg.get("queue_size", 100)))
+    server = make_webhook_server(worker, host, port)
+    OUTBOX.resume()
+    print(f"Agent listening for GitHub webhooks on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
 # ---------- Entrypoint ----------
 def main():
     mode = (sys.argv[sys.argv.index("--mode")+1] if "--mode" in sys.argv else "").strip()
@@ -545,34 +2720,54 @@ def main():
             print("No event payload found."); return
         with open(event_path, "r", encoding="utf-8") as f:
             event = json.load(f)
+        handle_event(event)
+        return
 
-        if "comment" in event:   # issue_comment
-            body = (event["comment"].get("body") or "").strip()
-            issue_number = event["issue"]["number"]
-            handle_command(body, issue_number); return
-
-        if "issue" in event:     # issues opened/edited
-            first_line = ((event["issue"].get("body") or "").splitlines() or [""])[0]
-            handle_command(first_line, event["issue"]["number"]); return
+    if mode == "serve":
+        serve(); return
 
-        return
+    if mode == "report":
+        print(TRACER.summary_markdown() or "No trace recorded yet."); return
 
     if mode == "bootstrap":
-        bootstrap(); return
+        with TRACER.command("bootstrap"):
+            bootstrap()
+        return
 
     # default: scheduled run (site checks)
-    repo = get_repo()
-    default_branch = repo.get("default_branch", "main")
+    default_branch = repo_default_branch()
     results = ensure_site(default_branch)
     for path, state, pr in results:
         print(path, state, pr or "")
     pages = latest_pages_build()
     print("Pages:", (pages or {}).get("status"))
 
+def run_main():
+    if "--profile" not in sys.argv:
+        return main()
+    import cProfile
+    i = sys.argv.index("--profile")
+    out = sys.argv[i + 1] if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith("--") else "agent-profile.prof"
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(main)
+    finally:
+        profiler.dump_stats(out)
+        print("cProfile written to", out)
+
 if __name__ == "__main__":
     try:
-        load_cfg()
-        main()
+        run_main()
     except Exception as e:
         print("Agent error:", e)
         sys.exit(1)
+    finally:
+        print("API budget:", json.dumps(SCHEDULER.budget_report()))
+        if "--mode" not in sys.argv or sys.argv[sys.argv.index("--mode") + 1] != "report":
+            DEPLOYS.flush()
+            OUTBOX.resume()
+            if OUTBOX.db is not None:
+                OUTBOX.drain()
+                print("Outbox:", json.dumps(OUTBOX.stats()))
+            TRACER.write_step_summary()    # before flush(): the HTTP table is of unflushed spans
+            TRACER.flush()
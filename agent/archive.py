@@ -0,0 +1,195 @@
+# agent/archive.py
+"""
+Match archive derived from our results in results.json, for questions like "record vs
+Borough", "last 5 form" and "biggest wins" across every season.
+
+archive.json is column-oriented: one array per column, rows in date order, with
+opponents, seasons and competitions listed once and referred to by position.
+
+    "columns": {"date": ["2015-08-01", …], "opp": [3, …], "season": [0, …],
+                "competition": [0, …], "home": [1, …], "gf": [2, …], "ga": [1, …]},
+    "index":   {"opp": [[row, …] per opponent], "season": [[row, …] per season],
+                "competition": [[row, …] per competition],
+                "wins": [rows by margin, biggest first], "defeats": […]}
+
+Queries (h2h, form, biggest) read the columns through those indexes, so none of them
+scans the whole history. records.json holds the same answers precomputed for the site
+(form, biggest wins/defeats, a head-to-head line per opponent).
+
+Appended results that keep the date order are folded in (same marker scheme as
+standings.py); anything else rebuilds the archive.
+"""
+import datetime
+
+from standings import LISTS, appended_from, parse_date, parse_score, season_of, tail_digest
+
+RECORDS_PATH = "site/data/records.json"
+COLUMNS = ("date", "opp", "season", "competition", "home", "gf", "ga")
+DEFAULTS = {"competition": "League", "season_start_month": 8, "form": 5, "biggest": 5}
+
+def options(config=None):
+    opts = dict(DEFAULTS)
+    opts.update({k: v for k, v in (config or {}).items() if v is not None})
+    return opts
+
+class Archive:
+    """Mutable view of an archive.json document."""
+    def __init__(self, doc=None):
+        doc = doc or {}
+        self.opponents = list(doc.get("opponents") or [])
+        self.seasons = list(doc.get("seasons") or [])
+        self.competitions = list(doc.get("competitions") or [])
+        cols = doc.get("columns") or {}
+        self.cols = {c: list(cols.get(c) or []) for c in COLUMNS}
+        index = doc.get("index") or {}
+        self.by_opp = [list(rows) for rows in index.get("opp") or []]
+        self.by_season = [list(rows) for rows in index.get("season") or []]
+        self.by_competition = [list(rows) for rows in index.get("competition") or []]
+        if len(self.by_competition) < len(self.competitions):
+            # Archives written before the competition index: rebuild it from the column once.
+            self.by_competition = [[] for _ in self.competitions]
+            for row, c in enumerate(self.cols["competition"]):
+                self.by_competition[c].append(row)
+        self.ids = {id(values): {v: i for i, v in enumerate(values)}
+                    for values in (self.opponents, self.seasons, self.competitions)}
+
+    def __len__(self):
+        return len(self.cols["date"])
+
+    def _id(self, values, value, index=None):
+        ids = self.ids[id(values)]
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+            if index is not None:
+                index.append([])
+        return ids[value]
+
+    def add(self, record, opts):
+        """Append one of our results; False if it can't be archived (no date, opponent or score)."""
+        date, opp, score = parse_date(record.get("date")), record.get("opp"), parse_score(record.get("score"))
+        if not date or not opp or not score:
+            return False
+        row = len(self)
+        o = self._id(self.opponents, str(opp), self.by_opp)
+        s = self._id(self.seasons, season_of(date, opts["season_start_month"]), self.by_season)
+        c = self._id(self.competitions, str(record.get("competition") or opts["competition"]),
+                     self.by_competition)
+        for col, value in zip(COLUMNS, (date, o, s, c, int(bool(record.get("home", True))), *score)):
+            self.cols[col].append(value)
+        self.by_opp[o].append(row)
+        self.by_season[s].append(row)
+        self.by_competition[c].append(row)
+        return True
+
+    def margins(self, sign):
+        """Row ids of wins (sign 1) or defeats (-1), biggest margin first, then most goals, then newest."""
+        gf, ga = self.cols["gf"], self.cols["ga"]
+        rows = [i for i in range(len(self)) if (gf[i] - ga[i]) * sign > 0]
+        return sorted(rows, key=lambda i: (-abs(gf[i] - ga[i]), -(gf[i] if sign > 0 else ga[i]), -i))
+
+    def doc(self):
+        return {"opponents": self.opponents, "seasons": self.seasons, "competitions": self.competitions,
+                "columns": self.cols,
+                "index": {"opp": self.by_opp, "season": self.by_season, "competition": self.by_competition,
+                          "wins": self.margins(1), "defeats": self.margins(-1)}}
+
+def outcome(gf, ga):
+    return "W" if gf > ga else "D" if gf == ga else "L"
+
+# ---------- Queries (on the archive.json document) ----------
+def match(archive, i):
+    c = archive["columns"]
+    return {"date": c["date"][i], "opp": archive["opponents"][c["opp"][i]],
+            "season": archive["seasons"][c["season"][i]],
+            "competition": archive["competitions"][c["competition"][i]], "home": bool(c["home"][i]),
+            "score": f"{c['gf'][i]}-{c['ga'][i]}", "result": outcome(c["gf"][i], c["ga"][i])}
+
+def _lookup(names, name, what):
+    """Position of `name` in `names`: exact (any case), else the only one containing it."""
+    folded = [n.casefold() for n in names]
+    want = name.strip().casefold()
+    if want in folded:
+        return folded.index(want)
+    found = [i for i, n in enumerate(folded) if want in n]
+    if len(found) == 1:
+        return found[0]
+    if not found:
+        raise ValueError(f"No {what} matching `{name}` in the archive")
+    raise ValueError(f"`{name}` matches {', '.join(names[i] for i in found[:5])}; be more specific")
+
+def h2h(archive, team, last=5):
+    return _record(archive, _lookup(archive["opponents"], team, "opponent"), last)
+
+def _record(archive, o, last):
+    rows = archive["index"]["opp"][o]
+    gf, ga = archive["columns"]["gf"], archive["columns"]["ga"]
+    res = [outcome(gf[i], ga[i]) for i in rows]
+    return {"opp": archive["opponents"][o], "p": len(rows), "w": res.count("W"), "d": res.count("D"),
+            "l": res.count("L"), "gf": sum(gf[i] for i in rows), "ga": sum(ga[i] for i in rows),
+            "last": [match(archive, i) for i in rows[::-1][:last]]}
+
+def form(archive, n=5, competition=None):
+    """The last `n` results (newest first), optionally in one competition."""
+    newest_first = range(len(archive["columns"]["date"]) - 1, -1, -1)
+    if competition is not None:
+        c = _lookup(archive["competitions"], competition, "competition")
+        by_competition = archive["index"].get("competition")
+        newest_first = (by_competition[c][::-1] if by_competition is not None else
+                        [i for i in newest_first if archive["columns"]["competition"][i] == c])
+    rows = [match(archive, i) for i in newest_first[:n]]
+    return {"form": "".join(r["result"] for r in rows), "matches": rows}
+
+def biggest(archive, kind="wins", n=5):
+    if kind not in ("wins", "defeats"):
+        raise ValueError("Use `biggest wins` or `biggest defeats`")
+    return {"kind": kind, "matches": [match(archive, i) for i in archive["index"][kind][:n]]}
+
+def records(archive, opts):
+    """records.json: the site's precomputed answers."""
+    table = []
+    for o, rows in enumerate(archive["index"]["opp"]):
+        if rows:
+            line = _record(archive, o, 1)
+            table.append(dict(line, last=line["last"][0]))
+    table.sort(key=lambda r: (-r["p"], r["opp"].casefold()))
+    return {"form": form(archive, int(opts["form"])),
+            "biggest_wins": biggest(archive, "wins", int(opts["biggest"]))["matches"],
+            "biggest_defeats": biggest(archive, "defeats", int(opts["biggest"]))["matches"],
+            "h2h": table}
+
+# ---------- Derivation ----------
+def build(results, config=None):
+    """An archive.json document from a results.json document, ignoring any previous one."""
+    return derive_archive(results, None, config)[0]
+
+def derive_archive(results, archive=None, config=None, previous=None):
+    """
+    (archive.json document, {records.json path: doc}) for `results`. Returns `archive`
+    unchanged (and no records) when no result of ours was added.
+    """
+    opts = options(config)
+    marker = (archive or {}).get("derived_from") or {}
+    lists = [(results or {}).get(k) or [] for k in LISTS]
+    rules = f"{opts['competition']}|{opts['season_start_month']}"
+    seen = appended_from(lists, previous, marker) if marker.get("rules") == rules else None
+    if seen is not None and seen[0] == len(lists[0]):
+        if seen[1] == len(lists[1]):
+            return archive, {}
+        return dict(archive, derived_from=dict(marker, league=len(lists[1]), tail=tail_digest(lists))), {}
+    new = lists[0][seen[0]:] if seen is not None else lists[0]
+    by_date = lambda r: parse_date(r.get("date")) or ""
+    dates = sorted(map(by_date, new))
+    last = (archive or {}).get("columns", {}).get("date") or [""]
+    if seen is None or (dates and dates[0] < last[-1]):
+        # First build, or a result dated before the newest archived one: rebuild in date order.
+        arch, new = Archive(), sorted(lists[0], key=by_date)
+    else:
+        arch, new = Archive(archive), sorted(new, key=by_date)
+    for record in new:
+        arch.add(record, opts)
+
+    doc = dict(arch.doc(), updated=datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+               derived_from={"source": "site/data/results.json", "rules": rules,
+                             "results": len(lists[0]), "league": len(lists[1]), "tail": tail_digest(lists)})
+    return doc, {RECORDS_PATH: dict(records(doc, opts), updated=doc["updated"])}
@@ -0,0 +1,774 @@
+# agent/bench.py
+"""
+Round-trip benchmark for agent commands, run against agent/fakehub.py.
+
+    python agent/bench.py                      # table of requests / bytes / wall time per command
+    python agent/bench.py --latency 0.05       # simulate 50 ms per GitHub round-trip
+    python agent/bench.py --save bench.json    # record a baseline
+    python agent/bench.py --compare bench.json # exit 1 if any command needs more requests than the baseline
+    python agent/bench.py --startup            # cold `import agent` time; exit 1 if requests/yaml load eagerly
+    python agent/bench.py --concurrency 20     # 20 racing /patch results writers; exit 1 if any write is lost
+    python agent/bench.py --standings 10       # derive table.json over 10 synthetic seasons; exit 1 if incremental != full
+    python agent/bench.py --playerstats 10     # the same for stats.json and the player shards
+    python agent/bench.py --archive 10         # the same for archive.json (h2h / form / biggest queries)
+    python agent/bench.py --gotm 2000000       # tally 2M synthetic GOTM votes in memory and spilled; exit 1 if they differ
+    python agent/bench.py --votes 2000 --latency 0.05  # per-vote web app calls vs SheetBatcher; exit 1 if rows are lost
+    python agent/bench.py --large 8            # peak client memory writing/reading an 8 MB JSON file, inline vs streamed blobs;
+                                               # exit 1 if the streamed path peaks higher or the file doesn't round-trip
+    python agent/bench.py --issues 3000        # checklist lookup among 3000 open issues: cold, warm, after changes;
+                                               # exit 1 if any lookup is wrong
+    python agent/bench.py --sitebuild 10       # hashed site data build over 10 seasons, then one more result: what a
+                                               # returning visitor refetches; exit 1 if more than one results shard changes
+    python agent/bench.py --serve              # post the recorded payloads in agent/payloads/ signed to --mode serve's
+                                               # server; exit 1 if any status or side effect is wrong
+    python agent/bench.py --outbox 200 --latency 0.05  # blocking Make posts vs the outbox, with an outage between runs;
+                                                       # exit 1 if an event is lost or delivered twice
+"""
+import base64, datetime, json, os, random, subprocess, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fakehub import FakeGitHub
+
+CONTROL_ISSUE = 1
+TOKEN = "bench-token"    # the hub treats it as the Actions GITHUB_TOKEN: its pushes start no runs
+CASES = []
+
+def case(name):
+    def register(fn):
+        CASES.append((name, fn))
+        return fn
+    return register
+
+def seed_files():
+    return {
+        "README.md": "# bench repo\n",
+        "site/index.html": "<!doctype html>\n",
+        "agent/config.yml": "timezone: Europe/London\n",
+    }
+
+@case("/ensure site (fresh)")
+def _ensure_fresh(agent, hub):
+    agent.handle_command("/ensure site", CONTROL_ISSUE)
+
+@case("/ensure site (all present)")
+def _ensure_present(agent, hub):
+    agent.handle_command("/ensure site", CONTROL_ISSUE)
+
+@case("/help")
+def _help(agent, hub):
+    agent.handle_command("/help", CONTROL_ISSUE)
+
+@case("/status")
+def _status(agent, hub):
+    agent.handle_command("/status", CONTROL_ISSUE)
+
+@case("/update live")
+def _update_live(agent, hub):
+    agent.handle_command('/update live {"updated": "2025-09-09T15:00:00Z", "text": "KO: Tigers 0-0 Borough"}',
+                         CONTROL_ISSUE)
+
+@case("/update live (unchanged)")
+def _update_live_noop(agent, hub):
+    agent.handle_command('/update live {"updated": "2025-09-09T15:00:00Z", "text": "KO: Tigers 0-0 Borough"}',
+                         CONTROL_ISSUE)
+
+@case("/live kickoff")
+def _live_kickoff(agent, hub):
+    agent.handle_command("/live kickoff Borough home", CONTROL_ISSUE)
+
+@case("/live goal (one segment)")
+def _live_goal(agent, hub):
+    agent.handle_command("/live goal 34 Smith", CONTROL_ISSUE)
+
+@case("/live ft (archive)")
+def _live_ft(agent, hub):
+    agent.handle_event({"action": "created", "comment": {"body": "/live goal 78 Jones\n/live ft"},
+                        "issue": {"number": CONTROL_ISSUE}})
+
+@case("/update batch (4 files)")
+def _update_batch(agent, hub):
+    payload = {
+        "live": {"updated": "2025-09-09T16:50:00Z", "text": "FT: Tigers 2-1 Borough"},
+        "results": {"results": [{"date": "2025-09-09", "opp": "Borough", "home": True,
+                                 "score": "2-1", "scorers": ["Smith 34", "Jones 78"]}]},
+        "fixtures": {"fixtures": [{"date": "2025-09-16", "opp": "Rovers", "home": False, "ko": "14:00"}]},
+        "stats": {"stats": {"top_scorer": {"name": "Smith", "goals": 1}}},
+    }
+    agent.handle_command("/update batch " + json.dumps(payload), CONTROL_ISSUE)
+
+@case("/patch results (append)")
+def _patch_results(agent, hub):
+    op = [{"op": "add", "path": "/results/-",
+           "value": {"date": "2025-09-16", "opp": "Rovers", "home": False, "score": "1-1", "scorers": ["Smith 12"]}}]
+    agent.handle_command("/patch results " + json.dumps(op), CONTROL_ISSUE)
+
+@case("/query h2h")
+def _query_h2h(agent, hub):
+    agent.handle_command("/query h2h borough", CONTROL_ISSUE)
+
+@case("/query form (publish)")
+def _query_form(agent, hub):
+    agent.handle_command("/query form 5 publish", CONTROL_ISSUE)
+
+@case("comment script (3 commands)")
+def _comment_script(agent, hub):
+    body = "\n".join([
+        '/update live {"updated": "2025-09-16T16:50:00Z", "text": "FT: Rovers 1-1 Tigers"}',
+        '/patch results [{"op": "replace", "path": "/results/1/score", "value": "1-2"}]',
+        '/patch stats {"stats": {"top_scorer": {"name": "Smith", "goals": 3}}}',
+    ])
+    agent.handle_event({"action": "created", "comment": {"body": body}, "issue": {"number": CONTROL_ISSUE}})
+
+@case("/gotm open")
+def _gotm_open(agent, hub):
+    agent.handle_command("/gotm open", CONTROL_ISSUE)
+
+@case("/gotm close (20k votes)")
+def _gotm_close(agent, hub):
+    opened = hub.json_file("site/data/gotm.json")["opened"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "votes.csv")
+        write_votes(path, 20_000, opened)
+        with open(path, "rb") as f:
+            hub.exports["votes.csv"] = f.read()
+    agent.handle_command("/gotm close " + hub.export_url("votes.csv"), CONTROL_ISSUE)
+
+@case("bootstrap")
+def _bootstrap(agent, hub):
+    agent.bootstrap()
+
+def load_agent(hub, cache_dir):
+    os.environ.update({
+        "AGENT_API_URL": hub.url,
+        "GITHUB_REPOSITORY": f"{hub.owner}/{hub.repo}",
+        "AGENT_GH_TOKEN": TOKEN,
+        "MAKE_WEBHOOK_URL": hub.make_url,
+        "AGENT_CACHE_DIR": cache_dir,
+    })
+    import agent
+    agent.load_cfg()
+    return agent
+
+def run(latency=0.0):
+    hub = FakeGitHub(files=seed_files(), latency=latency, owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            agent = load_agent(hub, cache_dir)
+            results = []
+            for name, fn in CASES:
+                hub.reset_log()
+                started = time.perf_counter()
+                fn(agent, hub)
+                wall = (time.perf_counter() - started) * 1000
+                results.append({"command": name, **hub.summary(), "wall_ms": round(wall, 1)})
+            return results
+    finally:
+        hub.stop()
+
+def render(results):
+    head = f"{'command':<28} {'reqs':>5} {'304':>4} {'KB out':>8} {'KB in':>8} {'wall ms':>9}"
+    lines = [head, "-" * len(head)]
+    for r in results:
+        lines.append(f"{r['command']:<28} {r['requests']:>5} {r['not_modified']:>4} "
+                     f"{r['bytes_in'] / 1024:>8.1f} {r['bytes_out'] / 1024:>8.1f} {r['wall_ms']:>9.1f}")
+    return "\n".join(lines)
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["command"]: r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["command"])
+        if base and r["requests"] > base["requests"]:
+            regressions.append(f"{r['command']}: {base['requests']} → {r['requests']} requests")
+    return regressions
+
+STARTUP_PROBE = (
+    "import sys, time; t = time.perf_counter(); import agent; ms = (time.perf_counter() - t) * 1000; "
+    "print(ms, ','.join(m for m in ('requests', 'yaml') if m in sys.modules))"
+)
+
+def startup(runs=10):
+    """Median / min wall time of a cold `import agent` in a fresh interpreter."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, heavy = [], ""
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        heavy = out[1] if len(out) > 1 else ""
+    times.sort()
+    return {"runs": runs, "median_ms": round(times[len(times) // 2], 1),
+            "min_ms": round(times[0], 1), "eager_imports": heavy}
+
+def _append_result_cmd(i):
+    op = [{"op": "add", "path": "/results/-",
+           "value": {"date": "2025-10-01", "opp": f"Team {i}", "home": True, "score": "1-0", "scorers": []}}]
+    return "/patch results " + json.dumps(op)
+
+def concurrency(writers=20, latency=0.0):
+    """
+    N writers appending to results.json at once, two ways:
+    - "processes": separate `--mode listen` runs, like concurrent Actions jobs (optimistic retries);
+    - "threads": one serve-mode process (per-file lock, no conflicts expected).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = {}
+    for mode in ("processes", "threads"):
+        hub = FakeGitHub(files={**seed_files(), "site/data/results.json": '{"results": []}'},
+                         latency=latency, owner="bench", repo="repo", github_token=TOKEN)
+        hub.start()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                started = time.perf_counter()
+                if mode == "processes":
+                    procs = []
+                    for i in range(writers):
+                        event_path = os.path.join(tmp, f"event-{i}.json")
+                        with open(event_path, "w", encoding="utf-8") as f:
+                            json.dump({"action": "created", "comment": {"body": _append_result_cmd(i)},
+                                       "issue": {"number": CONTROL_ISSUE},
+                                       "repository": {"full_name": "bench/repo", "default_branch": "main"}}, f)
+                        env = {**os.environ, "AGENT_API_URL": hub.url, "GITHUB_REPOSITORY": "bench/repo",
+                               "AGENT_GH_TOKEN": TOKEN, "GITHUB_EVENT_PATH": event_path,
+                               "AGENT_CACHE_DIR": os.path.join(tmp, f"cache-{i}")}
+                        procs.append(subprocess.Popen([sys.executable, os.path.join(here, "agent.py"), "--mode", "listen"],
+                                                      env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                    for p in procs:
+                        p.wait()
+                else:
+                    agent = load_agent(hub, tmp)
+                    threads = [threading.Thread(target=agent.handle_command, args=(_append_result_cmd(i), CONTROL_ISSUE))
+                               for i in range(writers)]
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                wall = time.perf_counter() - started
+            landed = len(hub.json_file("site/data/results.json")["results"])
+            out[mode] = {"writers": writers, "landed": landed,
+                         "conflicts": sum(1 for e in hub.log if e["status"] in (409, 422)),
+                         "requests": len(hub.log), "wall_s": round(wall, 2),
+                         "writes_per_s": round(landed / wall, 1)}
+        finally:
+            hub.stop()
+    return out
+
+# Scorer strings are "Name 12", so squad names can't contain digits.
+SQUAD = ["Smith", "Jones", "Patel", "Khan", "Lee", "Ali", "Brown", "Taylor", "Wilson", "Evans", "Davies", "Hughes",
+         "Walker", "Wright", "Green", "Hall", "Wood", "Clarke", "Hill", "Ward", "Moore", "King", "Baker", "Cox", "Reid"]
+
+def own_result(rnd, date, opp, home, gf, ga, competition=None):
+    minutes = sorted(rnd.randint(1, 94) for _ in range(gf))
+    record = {"date": date, "opp": opp, "home": home, "score": f"{gf}-{ga}",
+              "scorers": [f"{rnd.choice(SQUAD[:12])} {m if m <= 90 else f'90+{m - 90}'}" for m in minutes]}
+    if competition:
+        record["competition"] = competition
+    if ga == 0:
+        record["keeper"] = SQUAD[0]
+    return record
+
+def synthetic_results(seasons=5, teams=20, team="Syston Town Tigers", seed=1):
+    """
+    Double round robins (circle method), one round a week from August; our matches
+    (with scorers, plus a few cup ties) go in "results", the rest in "league".
+    """
+    rnd = random.Random(seed)
+    names = [team] + [f"Club {i}" for i in range(1, teams)]
+    doc = {"results": [], "league": []}
+    for s in range(seasons):
+        start = datetime.date(2015 + s, 8, 1)
+        order = names[:]
+        rounds = []
+        for _ in range(teams - 1):
+            rounds.append([(order[i], order[-1 - i]) for i in range(teams // 2)])
+            order.insert(1, order.pop())
+        rounds += [[(a, h) for h, a in r] for r in rounds]
+        for week, fixtures in enumerate(rounds):
+            date = (start + datetime.timedelta(days=7 * week)).isoformat()
+            for home, away in fixtures:
+                hg, ag = rnd.choice((0, 0, 1, 1, 1, 2, 2, 3, 4)), rnd.choice((0, 0, 1, 1, 2, 2, 3))
+                if team == home:
+                    doc["results"].append(own_result(rnd, date, away, True, hg, ag))
+                elif team == away:
+                    doc["results"].append(own_result(rnd, date, home, False, ag, hg))
+                else:
+                    doc["league"].append({"date": date, "home": home, "away": away, "score": f"{hg}-{ag}"})
+            if week % 12 == 5:
+                cup = (start + datetime.timedelta(days=7 * week + 3)).isoformat()
+                doc["results"].append(own_result(rnd, cup, f"Cup Club {week}", True,
+                                                 rnd.randint(0, 4), rnd.randint(0, 3), "County Cup"))
+    return doc
+
+DERIVED_BENCHES = {
+    # flag: (module, function, config, list the appended record goes to, compared keys)
+    "--standings": ("standings", "derive_table", {"tiebreaks": ["pts", "gd", "gf", "h2h", "team"]},
+                    "league", ("rows",)),
+    "--playerstats": ("playerstats", "derive_stats", {}, "results", ("rows", "team", "players")),
+    "--archive": ("archive", "derive_archive", {}, "results", ("columns", "index")),
+}
+
+def derived_bench(flag, seasons=5):
+    """Full derivation over the whole history vs folding in one appended result."""
+    import importlib
+    module, func, config, appended, keys = DERIVED_BENCHES[flag]
+    fn = getattr(importlib.import_module(module), func)
+    derive = lambda *a: (lambda out: out[0] if isinstance(out, tuple) else out)(fn(*a))
+    results = synthetic_results(seasons)
+    previous = dict(results, **{appended: results[appended][:-1]})
+    before = derive(previous, None, config)
+
+    def timed(call, runs=20):
+        best = float("inf")
+        for _ in range(runs):
+            t = time.perf_counter()
+            out = call()
+            best = min(best, time.perf_counter() - t)
+        return out, round(best * 1000, 2)
+
+    full, full_ms = timed(lambda: derive(results, None, config))
+    inc, inc_ms = timed(lambda: derive(results, before, config, previous))
+    noop, noop_ms = timed(lambda: derive(results, full, config, results))
+    return {"derive": f"{module}.{func}", "seasons": seasons,
+            "records": len(results["results"]) + len(results["league"]),
+            "full_ms": full_ms, "incremental_ms": inc_ms, "unchanged_ms": noop_ms,
+            "incremental_matches_full": all(inc[k] == full[k] for k in keys) and noop is full}
+
+def write_site_data(data_dir, results, fixtures, previous=None):
+    """
+    results.json, fixtures.json and everything derived from them, as the agent commits
+    them: with `previous` (the results.json on disk) derived files are updated in place,
+    so only the player shards a new result touches are rewritten.
+    """
+    import archive, playerstats, standings
+
+    def current(name):
+        if previous is None:
+            return None
+        with open(os.path.join(data_dir, name + ".json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    files = {"results": results, "fixtures": fixtures, "live": {"text": "Waiting for next match…"},
+             "table": standings.derive_table(results, current("table"), None, previous)}
+    files["stats"], players = playerstats.derive_stats(results, current("stats"), None, previous)
+    files["archive"], records = archive.derive_archive(results, current("archive"), None, previous)
+    for path, doc in list(players.items()) + list(records.items()):
+        files[path[len("site/data/"):-len(".json")]] = doc
+    for name, doc in files.items():
+        path = os.path.join(data_dir, name + ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, ensure_ascii=False)
+
+def sitebuild_bench(seasons=10):
+    """Build, add one result, build again: the bytes a visitor with a warm cache refetches."""
+    import sitebuild
+    results = synthetic_results(seasons)
+    last = datetime.date.fromisoformat(max(r["date"] for r in results["results"]))
+    fixtures = {"fixtures": [{"date": (last + datetime.timedelta(days=7 * (w + 1))).isoformat(),
+                              "opp": f"Club {w % 19 + 1}", "home": w % 2 == 0, "ko": "15:00"} for w in range(38)]}
+    with tempfile.TemporaryDirectory() as site:
+        data_dir = os.path.join(site, "data")
+        write_site_data(data_dir, results, fixtures)
+        started = time.perf_counter()
+        before, stats = sitebuild.build(site, {"host": "static"})    # static: also time the .gz copies
+        build_ms = round((time.perf_counter() - started) * 1000, 1)
+        previous, results = results, dict(results, results=results["results"] + [
+            {"date": fixtures["fixtures"][0]["date"], "opp": fixtures["fixtures"][0]["opp"], "home": True,
+             "score": "3-1", "scorers": ["Smith 12", "Smith 50", "Jones 77"]}])
+        write_site_data(data_dir, results, fixtures, previous)
+        changed_sources = sum(os.path.getsize(os.path.join(data_dir, n + ".json"))
+                              for n in ("results", "table", "stats", "archive", "records"))
+        after, _ = sitebuild.build(site, {"host": "static"})
+
+        def urls(m):
+            return {u for u in m["files"].values()} | {u for parts in m["shards"].values() for u in parts.values()}
+
+        def size(url, ext=""):
+            path = os.path.join(site, url + ext)
+            return os.path.getsize(path if os.path.exists(path) else os.path.join(site, url))
+        fetch = sorted(urls(after) - urls(before)) + ["data/manifest.json"]
+        shards_changed = [k for k, u in after["shards"]["results"].items() if before["shards"]["results"].get(k) != u]
+        return {"seasons": seasons, "build_ms": build_ms, **stats,
+                "results_shards": len(after["shards"]["results"]), "results_shards_changed": shards_changed,
+                "fixtures_unchanged": after["shards"]["fixtures"] == before["shards"]["fixtures"],
+                "refetched_files": len(fetch),
+                "refetch_kb": round(sum(size(u) for u in fetch) / 1024, 1),
+                "refetch_gzip_kb": round(sum(size(u, ".gz") for u in fetch) / 1024, 1),
+                "whole_files_kb": round(changed_sources / 1024, 1)}
+
+NOMINEES = ["Smith v Borough", "Jones v Rovers", "Patel v Town", "Khan v United", "Lee v Athletic", "Ali v City"]
+
+def write_votes(path, rows, opened, seed=1):
+    """GOTM_Votes-style CSV: ~half the voters vote more than once, some late or on other channels."""
+    import csv
+    rnd = random.Random(seed)
+    start = datetime.datetime.fromisoformat(opened.rstrip("Z"))
+    channels = ["website", "instagram", "twitter", "website", "instagram", "tiktok"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "player", "source", "meta", "voter"])
+        for _ in range(rows):
+            ts = start + datetime.timedelta(seconds=rnd.randint(-3600, 8 * 86400))
+            w.writerow([ts.isoformat(timespec="milliseconds") + "Z", rnd.choice(NOMINEES), rnd.choice(channels),
+                        "", f"v{rnd.randint(1, max(1, rows // 2))}"])
+
+# Peak RSS is read inside the child, which runs before the in-memory tally: Linux carries
+# the high-water mark across fork/exec, so a child of a large parent reports the parent's.
+SPILL_PROBE = (
+    "import contextlib, io, resource, sys, gotm; out = io.StringIO()\n"
+    "with contextlib.redirect_stdout(out): gotm.main([sys.argv[1], '--opened', sys.argv[2], "
+    "'--channels', 'website,instagram,twitter', '--max-keys', '100000'])\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024); print(out.getvalue())"
+)
+
+def gotm_bench(rows=1_000_000):
+    """Tally a synthetic export in memory and with a forced spill (in a child, for peak RSS)."""
+    import gotm
+    here = os.path.dirname(os.path.abspath(__file__))
+    opened = "2025-09-01T00:00:00Z"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "votes.csv")
+        write_votes(path, rows, opened)
+        size_mb = os.path.getsize(path) / 2 ** 20
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", SPILL_PROBE, path, opened], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.split("\n", 1)
+        spill_wall = time.perf_counter() - started
+        spilled = json.loads(out[1])
+        started = time.perf_counter()
+        with gotm.open_lines(path) as f:
+            memory = gotm.tally(gotm.read_rows(f), opened, 7, ["website", "instagram", "twitter"])
+        wall = time.perf_counter() - started
+    return {"rows": rows, "file_mb": round(size_mb, 1), "wall_s": round(wall, 2),
+            "rows_per_s": int(rows / wall), "spilled_wall_s": round(spill_wall, 2),
+            "spilled_peak_rss_mb": round(float(out[0]), 1),
+            "tally": memory["tally"], "winner": memory["results"][0] if memory["results"] else None,
+            "spilled_matches_memory": spilled["results"] == memory["results"]
+                                      and spilled["tally"] == memory["tally"]}
+
+def votes_bench(votes=2000, latency=0.0):
+    """The same votes sent to the Apps Script stand-in one request each, then through SheetBatcher."""
+    import requests
+    hub = FakeGitHub(files=seed_files(), latency=latency, owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            agent = load_agent(hub, cache_dir)
+            rnd = random.Random(1)
+            rows = [{"player": rnd.choice(NOMINEES), "source": "website", "voter": f"v{i}"} for i in range(votes)]
+            out = {}
+            session = requests.Session()
+            started = time.perf_counter()
+            for row in rows:
+                session.post(hub.apps_script_url, json={"type": "gotm_vote", **row}, timeout=30).raise_for_status()
+            out["single"] = {"requests": votes, "wall_s": round(time.perf_counter() - started, 2)}
+
+            hub.sheets.clear()
+            hub.apps_fail_next = 2             # two failed calls, retried without losing rows
+            hub.reset_log()
+            started = time.perf_counter()
+            with agent.SheetBatcher(hub.apps_script_url, max_rows=200, max_wait=0.5) as batcher:
+                for row in rows:
+                    batcher.add(**row)
+            out["batched"] = {"requests": len(hub.log), "wall_s": round(time.perf_counter() - started, 2),
+                              **batcher.stats, "rows_in_sheet": len(hub.sheets.get("GOTM_Votes", []))}
+            return out
+    finally:
+        hub.stop()
+
+def _hub_process(conn):
+    hub = FakeGitHub(files=seed_files(), owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    conn.send((hub.url, hub.make_url))
+    conn.recv()
+    hub.stop()
+
+def large_bench(mb=8):
+    """
+    Peak memory (tracemalloc) for writing and reading an `mb` MB JSON file through the
+    inline Contents API vs streamed git blobs. The hub runs in a child process so only
+    the agent's allocations are counted.
+    """
+    import multiprocessing, tracemalloc, types
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_hub_process, args=(child,), daemon=True)
+    proc.start()
+    try:
+        url, make_url = parent.recv()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            agent = load_agent(types.SimpleNamespace(url=url, make_url=make_url, owner="bench", repo="repo", github_token=TOKEN),
+                               cache_dir)
+            doc = synthetic_results(seasons=max(1, round(mb * 1_000_000 / 45_000)))
+            size = len(agent.json_text(doc).encode("utf-8"))
+            tracemalloc.start()
+
+            def peak(fn):
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                out = fn()      # (wall time under tracemalloc says little, so it isn't reported)
+                return out, {"peak_mb": round((tracemalloc.get_traced_memory()[1] - base) / 1e6, 1)}
+
+            def legacy_read(path):
+                sha = agent.get_contents(path, ref="main").json()["sha"]
+                r = agent.api("GET", f"/git/blobs/{sha}")
+                return json.loads(base64.b64decode(r.json()["content"]).decode("utf-8"))
+
+            out = {"file_mb": round(size / 1e6, 1)}
+            _, out["inline_write"] = peak(lambda: agent.write_file_text(
+                "site/data/archive-inline.json", agent.json_text(doc), "bench: inline", "main"))
+            _, out["blob_write"] = peak(lambda: agent.write_json_with_retry(
+                "site/data/archive.json", lambda _doc: doc, "bench: blob", "main"))
+            meta = agent.get_contents("site/data/archive.json", ref="main").json()
+            out["contents_api_inlines"] = bool(meta.get("content"))
+            _, out["base64_read"] = peak(lambda: legacy_read("site/data/archive-inline.json"))
+            read, out["stream_read"] = peak(lambda: agent.read_json_file("site/data/archive.json", "main")[0])
+            tracemalloc.stop()
+            out["blob_uploads"] = sum(1 for s in agent.TRACER.spans if s["name"] == "POST /git/blobs")
+            out["round_trip"] = read == doc
+            return out
+    finally:
+        parent.send("stop")
+        proc.join(5)
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+WEBHOOK_SECRET = "bench-secret"
+
+def recorded(name):
+    """(event name, raw body) of agent/payloads/<event>.<action>.json."""
+    with open(os.path.join(PAYLOADS, name + ".json"), "rb") as f:
+        return name.split(".")[0], f.read()
+
+def signed(event, body, delivery, secret=WEBHOOK_SECRET):
+    import hashlib, hmac
+    return {"X-GitHub-Event": event, "X-GitHub-Delivery": delivery, "Content-Type": "application/json",
+            "X-Hub-Signature-256": "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()}
+
+def serve_bench():
+    """
+    Recorded webhook payloads posted over HTTP to make_webhook_server: signatures,
+    duplicates, ignored actions, bad JSON and a full queue. Each check compares the
+    HTTP status (and message) and what the worker then did on the fake hub.
+    """
+    import contextlib, io, urllib.error, urllib.request
+    hub = FakeGitHub(files=seed_files(), owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    checks = []
+    try:
+        # The server logs each request to stdout; keep the JSON report clean.
+        with tempfile.TemporaryDirectory() as cache_dir, contextlib.redirect_stdout(io.StringIO()):
+            agent = load_agent(hub, cache_dir)
+            worker = agent.WebhookWorker(WEBHOOK_SECRET, workers=2, queue_size=10)
+            server = agent.make_webhook_server(worker, "127.0.0.1", 0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+            def post(headers, body):
+                req = urllib.request.Request(url, data=body, headers=headers, method="POST")
+                try:
+                    with urllib.request.urlopen(req, timeout=10) as r:
+                        status, payload = r.status, json.load(r)
+                except urllib.error.HTTPError as e:
+                    status, payload = e.code, json.load(e)
+                worker.queue.join()
+                return status, payload["message"]
+
+            def check(name, got, want, comments=0):
+                before = check.comments
+                check.comments = len(hub.comments)
+                ok = got == want and check.comments - before == comments
+                checks.append({"check": name, "got": list(got), "want": list(want),
+                               "comments": check.comments - before, "ok": ok})
+            check.comments = len(hub.comments)
+
+            event, body = recorded("ping")
+            check("ping", post(signed(event, body, "d-ping"), body), (200, "pong"))
+            event, body = recorded("issue_comment.created")
+            check("bad signature", post(signed(event, body, "d-1", secret="wrong"), body), (401, "bad signature"))
+            unsigned = {k: v for k, v in signed(event, body, "d-1").items() if k != "X-Hub-Signature-256"}
+            check("unsigned", post(unsigned, body), (401, "bad signature"))
+            check("comment created", post(signed(event, body, "d-1"), body), (202, "queued"), comments=1)
+            check("redelivery", post(signed(event, body, "d-1"), body), (202, "duplicate delivery"))
+            for n, name in enumerate(("issue_comment.edited", "issue_comment.deleted", "issues.closed")):
+                event, body = recorded(name)
+                check(f"{name} (ignored)", post(signed(event, body, f"d-{n + 2}"), body), (202, "queued"))
+            event, body = recorded("issues.opened")
+            check("issue opened", post(signed(event, body, "d-5"), body), (202, "queued"), comments=1)
+            check("invalid JSON", post(signed(event, b"{", "d-6"), b"{"), (400, "invalid JSON"))
+            check("redelivery after 400", post(signed(event, body, "d-6"), body), (202, "queued"), comments=1)
+            server.shutdown()
+            server.server_close()
+
+            # No workers: the queue stays full until drained by hand.
+            stuck = agent.WebhookWorker(WEBHOOK_SECRET, workers=0, queue_size=1)
+            event, body = recorded("issue_comment.created")
+            check("queue: first", stuck.deliver(signed(event, body, "q-1"), body), (202, "queued"))
+            check("queue: full", stuck.deliver(signed(event, body, "q-2"), body), (503, "queue full"))
+            check("queue: still full", stuck.deliver(signed(event, body, "q-2"), body), (503, "queue full"))
+            stuck.queue.get_nowait()
+            check("queue: redelivery", stuck.deliver(signed(event, body, "q-2"), body), (202, "queued"))
+            return {"checks": checks, "worker": {k: v for k, v in worker.health().items() if k != "budget"},
+                    "ok": all(c["ok"] for c in checks)}
+    finally:
+        hub.stop()
+
+def issues_bench(issues=3000, latency=0.0):
+    """find_issue_by_title for the checklist, the oldest of `issues` open issues."""
+    hub = FakeGitHub(files=seed_files(), latency=latency, owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            agent = load_agent(hub, cache_dir)
+            hub.route("POST", "/repos/bench/repo/issues", {}, {"title": agent.CHECKLIST_TITLE, "body": ""}, {})
+            for i in range(issues - 1):
+                hub.route("POST", "/repos/bench/repo/issues", {}, {"title": f"Fan mail {i}", "body": ""}, {})
+            for n, issue in hub.issues.items():     # spread over the past weeks, oldest first
+                issue["updated_at"] = (datetime.datetime.utcnow() - datetime.timedelta(minutes=10 * (issues - n) + 1)
+                                       ).strftime("%Y-%m-%dT%H:%M:%SZ")
+            first_page = {i["title"] for i in hub.route("GET", "/repos/bench/repo/issues", {}, None, {})[1]}
+            out = {"first_page_only_finds_it": agent.CHECKLIST_TITLE in first_page}
+
+            def lookup(label, expect, force=True):
+                hub.reset_log()
+                started = time.perf_counter()
+                agent.ISSUES.sync(force=force)
+                found = agent.find_issue_by_title(agent.CHECKLIST_TITLE)
+                out[label] = {"requests": len(hub.log), "304": sum(e["status"] == 304 for e in hub.log),
+                              "ms": round((time.perf_counter() - started) * 1000, 1),
+                              "correct": (found or {}).get("number") == expect}
+
+            lookup("cold", 1)
+            lookup("warm", 1)
+            agent.ISSUES.save()
+            agent.ISSUES.issues = None          # as a new run would: reload from disk, then `since`
+            lookup("next_run", 1)
+            time.sleep(1.1)                     # updated_at has one-second resolution
+            hub.route("PATCH", "/repos/bench/repo/issues/1", {}, {"state": "closed"}, {})
+            lookup("after_close", None)
+            created = agent.create_issue(agent.CHECKLIST_TITLE, "")
+            lookup("after_create", created["number"])
+            out["ok"] = all(v["correct"] for v in out.values() if isinstance(v, dict))
+            return out
+    finally:
+        hub.stop()
+
+def outbox_bench(events=200, latency=0.0):
+    """Caller-side time for `events` Make posts sent inline vs queued, then an outage spanning two runs."""
+    import requests
+    hub = FakeGitHub(files=seed_files(), latency=latency, owner="bench", repo="repo", github_token=TOKEN)
+    hub.start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            agent = load_agent(hub, cache_dir)
+            payloads = [{"type": "live_update", "seq": i} for i in range(events)]
+            out = {}
+            started = time.perf_counter()
+            for payload in payloads:
+                requests.post(hub.make_url, json=payload, timeout=20)
+            out["inline"] = {"caller_s": round(time.perf_counter() - started, 3)}
+
+            hub.make_events.clear()
+            path = os.path.join(cache_dir, "bench-outbox.sqlite")
+            outbox = agent.Outbox(path)
+            hub.make_fail_next = 3             # a short blip, absorbed by retries
+            started = time.perf_counter()
+            handles = [outbox.enqueue("make", p) for p in payloads]
+            caller = time.perf_counter() - started
+            outbox.drain(timeout=120)
+            out["outbox"] = {"caller_s": round(caller, 3), "drained_s": round(time.perf_counter() - started, 3),
+                             "delivered": sum(h.wait(0)[0] for h in handles), **outbox.stats()}
+
+            # Make down for the whole of one run: events stay pending and the next run sends them.
+            hub.make_events.clear()
+            down = agent.Outbox(os.path.join(cache_dir, "bench-outage.sqlite"), attempts=2)
+            hub.make_fail_next = 10 ** 6
+            for p in payloads[:20]:
+                down.enqueue("make", p)
+            down.drain(timeout=60)
+            first_run = down.stats()
+            hub.make_fail_next = 0
+            after = agent.Outbox(down.path)
+            after.resume()
+            after.drain(timeout=60)
+            seqs = [e["seq"] for e in hub.make_events]
+            out["outage"] = {"first_run": first_run, "next_run": after.stats(),
+                             "delivered_once": sorted(seqs) == list(range(20)),
+                             "duplicates_dropped": hub.make_duplicates}
+            return out
+    finally:
+        hub.stop()
+
+def main(argv):
+    def opt(flag, default=None):
+        """The value after `flag`; `default` if the flag is absent or given bare (`--standings`)."""
+        i = argv.index(flag) + 1 if flag in argv else len(argv)
+        return argv[i] if i < len(argv) and not argv[i].startswith("--") else default
+
+    if "--startup" in argv:
+        result = startup(int(opt("--runs", 10)))
+        print(json.dumps(result))
+        return 1 if result["eager_imports"] else 0
+
+    if "--concurrency" in argv:
+        result = concurrency(int(opt("--concurrency", 20)), latency=float(opt("--latency", 0)))
+        print(json.dumps(result, indent=2))
+        return 0 if all(r["landed"] == r["writers"] for r in result.values()) else 1
+
+    if "--gotm" in argv:
+        result = gotm_bench(int(opt("--gotm", 1_000_000)))
+        print(json.dumps(result, indent=2))
+        return 0 if result["spilled_matches_memory"] else 1
+
+    if "--votes" in argv:
+        result = votes_bench(int(opt("--votes", 2000)), latency=float(opt("--latency", 0)))
+        print(json.dumps(result, indent=2))
+        return 0 if result["batched"]["rows_in_sheet"] == int(opt("--votes", 2000)) else 1
+
+    if "--large" in argv:
+        result = large_bench(float(opt("--large", 8)))
+        print(json.dumps(result, indent=2))
+        return 0 if result["round_trip"] and result["blob_write"]["peak_mb"] < result["inline_write"]["peak_mb"] \
+            and result["stream_read"]["peak_mb"] <= result["base64_read"]["peak_mb"] else 1
+
+    if "--issues" in argv:
+        result = issues_bench(int(opt("--issues", 3000)), latency=float(opt("--latency", 0)))
+        print(json.dumps(result, indent=2))
+        return 0 if result["ok"] else 1
+
+    if "--serve" in argv:
+        result = serve_bench()
+        print(json.dumps(result, indent=2))
+        return 0 if result["ok"] else 1
+
+    if "--sitebuild" in argv:
+        result = sitebuild_bench(int(opt("--sitebuild", 10)))
+        print(json.dumps(result, indent=2))
+        return 0 if len(result["results_shards_changed"]) == 1 and result["fixtures_unchanged"] else 1
+
+    if "--outbox" in argv:
+        result = outbox_bench(int(opt("--outbox", 200)), latency=float(opt("--latency", 0)))
+        print(json.dumps(result, indent=2))
+        return 0 if result["outbox"]["delivered"] == int(opt("--outbox", 200)) \
+            and result["outage"]["delivered_once"] else 1
+
+    for flag in DERIVED_BENCHES:
+        if flag in argv:
+            result = derived_bench(flag, int(opt(flag, 5)))
+            print(json.dumps(result, indent=2))
+            return 0 if result["incremental_matches_full"] else 1
+
+    results = run(latency=float(opt("--latency", 0)))
+    print(json.dumps(results, indent=2) if "--json" in argv else render(results))
+    if opt("--save"):
+        with open(opt("--save"), "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if opt("--compare"):
+        regressions = compare(results, opt("--compare"))
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
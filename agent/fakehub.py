@@ -0,0 +1,536 @@
+# agent/fakehub.py
+"""
+In-process stand-in for the parts of api.github.com (and the Make webhook) that
+agent.py talks to. Point the agent at it with AGENT_API_URL=<FakeGitHub.start()>.
+
+Everything lives in memory: blobs, flat trees, commits, refs, pulls, issues,
+comments, workflow runs (a site/ push starts one, except when made with
+`github_token`, the Actions GITHUB_TOKEN stand-in), Pages builds, Make deliveries, published exports
+(e.g. the GOTM_Votes sheet as CSV, served from `exports`) and the Apps Script
+listener web app (rows land in `sheets`). Every request is
+recorded in `log` (method, path, status, bytes in/out, ms) for the benchmarks.
+"""
+import base64, hashlib, json, re, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def blob_sha(data: bytes):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class FakeGitHub:
+    INLINE_LIMIT = 1_000_000    # Contents API stops inlining content above 1 MB
+
+    def __init__(self, files=None, default_branch="main", latency=0.0, owner="fake", repo="repo",
+                 github_token=None):
+        self.owner, self.repo = owner, repo
+        self.github_token = github_token    # pushes made with it start no workflow runs, as on GitHub
+        self.default_branch = default_branch
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.blobs = {}          # sha -> bytes
+        self.trees = {}          # sha -> {path: blob_sha}
+        self.commits = {}        # sha -> {"tree", "parents", "message"}
+        self.refs = {}           # branch -> commit sha
+        self.pulls = {}          # number -> {...}
+        self.issues = {}         # number -> {...}
+        self.comments = []       # (issue_number, body)
+        self.runs = []           # workflow runs, oldest first
+        self.make_events = []
+        self.make_keys = set()   # Idempotency-Key values already accepted
+        self.make_duplicates = 0
+        self.make_fail_next = 0  # answer the next N webhook posts with a 503
+        self.exports = {}        # name -> bytes, served at export_url(name)
+        self.sheets = {}         # Apps Script stand-in: sheet name -> rows
+        self.apps_batches = set()
+        self.apps_fail_next = 0  # answer the next N web app calls with a 500
+        self.log = []
+        self.next_number = 1
+        self.server = None
+        tree = self._store_tree({p: self._store_blob(b if isinstance(b, bytes) else b.encode("utf-8"))
+                                 for p, b in (files or {}).items()})
+        self.refs[default_branch] = self._store_commit(tree, [], "initial commit")
+
+    # ---------- object store ----------
+    def _store_blob(self, data):
+        sha = blob_sha(data)
+        self.blobs[sha] = data
+        return sha
+
+    def _store_tree(self, entries):
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _store_commit(self, tree, parents, message):
+        sha = hashlib.sha1(json.dumps([tree, parents, message, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": list(parents), "message": message}
+        return sha
+
+    def _ancestors(self, sha):
+        seen, stack = set(), [sha]
+        while stack:
+            s = stack.pop()
+            if s in seen or s not in self.commits:
+                continue
+            seen.add(s)
+            stack.extend(self.commits[s]["parents"])
+        return seen
+
+    def _resolve_tree(self, ref):
+        """Branch name, commit sha or tree sha → tree sha."""
+        if ref in self.refs:
+            ref = self.refs[ref]
+        if ref in self.commits:
+            return self.commits[ref]["tree"]
+        if ref in self.trees:
+            return ref
+        raise HttpError(404, "Not Found")
+
+    def _advance(self, branch, files, message, headers=None):
+        """Commit {path: bytes|None} on top of `branch` (the Contents API path)."""
+        head = self.refs[branch]
+        entries = dict(self.trees[self.commits[head]["tree"]])
+        for path, data in files.items():
+            if data is None:
+                entries.pop(path, None)
+            else:
+                entries[path] = self._store_blob(data)
+        sha = self._store_commit(self._store_tree(entries), [head], message)
+        self._set_ref(branch, sha, changed=list(files), headers=headers)
+        return sha
+
+    def _set_ref(self, branch, sha, changed=None, headers=None):
+        old = self.refs.get(branch)
+        self.refs[branch] = sha
+        if branch != self.default_branch or old is None:
+            return
+        auth = (headers or {}).get("Authorization") or ""
+        if self.github_token and auth.split(" ")[-1] == self.github_token:
+            return    # GitHub starts no workflows from pushes made with GITHUB_TOKEN
+        if changed is None:
+            a, b = self.trees[self.commits[old]["tree"]], self.trees[self.commits[sha]["tree"]]
+            changed = [p for p in set(a) | set(b) if a.get(p) != b.get(p)]
+        if any(p.startswith("site/") for p in changed):    # site-deploy.yml push filter
+            self._add_run("push", sha)
+
+    def _add_run(self, event, sha):
+        self.runs.append({"id": len(self.runs) + 1, "event": event, "head_sha": sha,
+                          "head_branch": self.default_branch, "status": "queued",
+                          "conclusion": None, "created_at": _now()})
+
+    def complete_runs(self, conclusion="success"):
+        with self.lock:
+            for run in self.runs:
+                if run["status"] != "completed":
+                    run.update(status="completed", conclusion=conclusion)
+
+    # ---------- introspection helpers ----------
+    def file(self, path, branch=None):
+        with self.lock:
+            tree = self.trees[self._resolve_tree(branch or self.default_branch)]
+            return self.blobs[tree[path]] if path in tree else None
+
+    def json_file(self, path, branch=None):
+        data = self.file(path, branch)
+        return None if data is None else json.loads(data.decode("utf-8"))
+
+    def reset_log(self):
+        with self.lock:
+            self.log = []
+
+    def summary(self):
+        with self.lock:
+            return {
+                "requests": len(self.log),
+                "not_modified": sum(1 for e in self.log if e["status"] == 304),
+                "bytes_in": sum(e["bytes_in"] for e in self.log),
+                "bytes_out": sum(e["bytes_out"] for e in self.log),
+            }
+
+    # ---------- server ----------
+    def start(self, host="127.0.0.1", port=0):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            def do_GET(self): hub._serve(self)
+            def do_POST(self): hub._serve(self)
+            def do_PUT(self): hub._serve(self)
+            def do_PATCH(self): hub._serve(self)
+            def do_DELETE(self): hub._serve(self)
+            def log_message(self, *args): pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def make_url(self):
+        return f"{self.url}/make/hook"
+
+    def export_url(self, name):
+        return f"{self.url}/exports/{name}"
+
+    @property
+    def apps_script_url(self):
+        return f"{self.url}/macros/s/fake/exec"
+
+    def _serve(self, h):
+        started = time.perf_counter()
+        length = int(h.headers.get("Content-Length") or 0)
+        raw = h.rfile.read(length) if length else b""
+        parts = urlsplit(h.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if self.latency:
+            time.sleep(self.latency)
+        headers = {}
+        try:
+            body = json.loads(raw) if raw and "json" in (h.headers.get("Content-Type") or "json") else raw
+            with self.lock:
+                status, payload, headers = self.route(h.command, parts.path, query, body, h.headers)
+        except HttpError as e:
+            status, payload = e.status, {"message": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {"message": f"Bad request: {e}"}
+
+        if isinstance(payload, (bytes, str)):
+            out = payload.encode("utf-8") if isinstance(payload, str) else payload
+            ctype = "application/octet-stream"
+        else:
+            out = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            ctype = "application/json"
+        if h.command == "GET" and status == 200:
+            etag = '"%s"' % hashlib.sha1(out).hexdigest()
+            headers["ETag"] = etag
+            if h.headers.get("If-None-Match") == etag:
+                status, out = 304, b""
+        h.send_response(status)
+        h.send_header("Content-Type", ctype)
+        h.send_header("Content-Length", str(len(out)))
+        h.send_header("X-RateLimit-Limit", "5000")
+        h.send_header("X-RateLimit-Remaining", str(max(0, 5000 - len(self.log))))
+        h.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        for k, v in headers.items():
+            h.send_header(k, v)
+        h.end_headers()
+        h.wfile.write(out)
+        with self.lock:
+            self.log.append({"method": h.command, "path": parts.path, "status": status,
+                             "bytes_in": len(raw), "bytes_out": len(out),
+                             "ms": round((time.perf_counter() - started) * 1000, 2)})
+
+    # ---------- routing ----------
+    def route(self, method, path, query, body, headers):
+        if path.startswith("/make/"):
+            if self.make_fail_next:
+                self.make_fail_next -= 1
+                raise HttpError(503, "Service Unavailable")
+            key = headers.get("Idempotency-Key")
+            if key in self.make_keys:
+                self.make_duplicates += 1
+                return 200, "Accepted", {}
+            if key:
+                self.make_keys.add(key)
+            self.make_events.append(body)
+            return 200, "Accepted", {}
+        if path.startswith("/macros/") and method == "POST":
+            return self._apps_script(body)
+        if path.startswith("/exports/") and method == "GET":
+            name = path[len("/exports/"):]
+            if name not in self.exports:
+                raise HttpError(404, "Not Found")
+            return 200, self.exports[name], {}
+        if path == "/graphql" and method == "POST":
+            return 200, self._graphql(body), {}
+        prefix = f"/repos/{self.owner}/{self.repo}"
+        m = re.match(r"^/repos/[^/]+/[^/]+", path)
+        if not m:
+            raise HttpError(404, "Not Found")
+        rest = path[m.end():] or "/"
+        for pattern, verb, fn in self.ROUTES:
+            if verb != method:
+                continue
+            mm = re.fullmatch(pattern, rest)
+            if mm:
+                out = fn(self, *mm.groups(), query=query, body=body, headers=headers)
+                return out if len(out) == 3 else (*out, {})
+        raise HttpError(404, f"Not Found: {method} {prefix}{rest}")
+
+    def _apps_script(self, body):
+        """
+        Mirrors doPost in agent.APPS_SCRIPT_CODE_GS (appendRow per call, setValues per batch).
+        Runs under the hub lock, like the script's check-write-mark of a batch id.
+        """
+        if self.apps_fail_next:
+            self.apps_fail_next -= 1
+            raise HttpError(500, "Service unavailable")
+        kind, now = (body.get("type") or "").lower(), _now()
+        if kind == "test_ping":
+            return 200, {"ok": True, "ts": now}, {}
+        vote = lambda it: [it.get("ts") or now, it.get("player") or "", it.get("source") or "",
+                           json.dumps(it["meta"]) if it.get("meta") else "", it.get("voter") or ""]
+        live = lambda it: [it.get("ts") or now, it.get("text") or ""]
+        if kind in ("gotm_vote", "live_update"):
+            sheet, row = ("GOTM_Votes", vote) if kind == "gotm_vote" else ("LiveLog", live)
+            self.sheets.setdefault(body.get("sheetName") or sheet, []).append(row(dict(body, ts=None)))
+            return 200, {"ok": True, "wrote": True}, {}
+        if kind in ("gotm_vote_batch", "live_update_batch"):
+            if body.get("id") in self.apps_batches:
+                return 200, {"ok": True, "wrote": 0, "duplicate": True}, {}
+            sheet, row = ("GOTM_Votes", vote) if kind == "gotm_vote_batch" else ("LiveLog", live)
+            rows = [row(it) for it in body.get("items") or []]
+            self.sheets.setdefault(body.get("sheetName") or sheet, []).extend(rows)
+            if body.get("id"):
+                self.apps_batches.add(body["id"])
+            return 200, {"ok": True, "wrote": len(rows)}, {}
+        return 200, {"ok": False, "msg": "unknown type"}, {}
+
+    def _repo(self, query, body, headers):
+        return 200, {"full_name": f"{self.owner}/{self.repo}", "default_branch": self.default_branch}
+
+    def _get_ref(self, branch, query, body, headers):
+        if branch not in self.refs:
+            raise HttpError(404, "Not Found")
+        return 200, {"ref": f"refs/heads/{branch}", "object": {"sha": self.refs[branch], "type": "commit"}}
+
+    def _create_ref(self, query, body, headers):
+        branch = body["ref"].split("refs/heads/", 1)[1]
+        if branch in self.refs:
+            raise HttpError(422, "Reference already exists")
+        if body["sha"] not in self.commits:
+            raise HttpError(422, "Object does not exist")
+        self._set_ref(branch, body["sha"], headers=headers)
+        return 201, {"ref": body["ref"], "object": {"sha": body["sha"], "type": "commit"}}
+
+    def _update_ref(self, branch, query, body, headers):
+        if branch not in self.refs:
+            raise HttpError(422, "Reference does not exist")
+        if not body.get("force") and self.refs[branch] not in self._ancestors(body["sha"]):
+            raise HttpError(422, "Update is not a fast forward")
+        self._set_ref(branch, body["sha"], headers=headers)
+        return 200, {"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"], "type": "commit"}}
+
+    def _commit_json(self, sha):
+        c = self.commits[sha]
+        return {"sha": sha, "tree": {"sha": c["tree"]}, "message": c["message"],
+                "parents": [{"sha": p} for p in c["parents"]]}
+
+    def _get_commit(self, sha, query, body, headers):
+        if sha not in self.commits:
+            raise HttpError(404, "Not Found")
+        return 200, self._commit_json(sha)
+
+    def _create_commit(self, query, body, headers):
+        if body["tree"] not in self.trees or any(p not in self.commits for p in body.get("parents", [])):
+            raise HttpError(422, "Object does not exist")
+        return 201, self._commit_json(self._store_commit(body["tree"], body.get("parents", []), body["message"]))
+
+    def _get_tree(self, ref, query, body, headers):
+        sha = self._resolve_tree(ref)
+        tree = [{"path": p, "mode": "100644", "type": "blob", "sha": b, "size": len(self.blobs[b])}
+                for p, b in sorted(self.trees[sha].items())]
+        return 200, {"sha": sha, "tree": tree, "truncated": False}
+
+    def _create_tree(self, query, body, headers):
+        entries = dict(self.trees[body["base_tree"]]) if body.get("base_tree") else {}
+        for e in body["tree"]:
+            if "content" in e:
+                entries[e["path"]] = self._store_blob(e["content"].encode("utf-8"))
+            elif e.get("sha") is None:
+                entries.pop(e["path"], None)
+            elif e["sha"] in self.blobs:
+                entries[e["path"]] = e["sha"]
+            else:
+                raise HttpError(422, f"Blob not found: {e['sha']}")
+        return 201, {"sha": self._store_tree(entries)}
+
+    def _create_blob(self, query, body, headers):
+        content = body["content"]
+        data = base64.b64decode(content) if body.get("encoding") == "base64" else content.encode("utf-8")
+        return 201, {"sha": self._store_blob(data)}
+
+    def _get_blob(self, sha, query, body, headers):
+        if sha not in self.blobs:
+            raise HttpError(404, "Not Found")
+        data = self.blobs[sha]
+        if "raw" in (headers.get("Accept") or ""):
+            return 200, data
+        return 200, {"sha": sha, "size": len(data), "encoding": "base64",
+                     "content": base64.b64encode(data).decode("ascii")}
+
+    def _get_contents(self, path, query, body, headers):
+        tree = self.trees[self._resolve_tree(query.get("ref") or self.default_branch)]
+        if path not in tree:
+            raise HttpError(404, "Not Found")
+        data = self.blobs[tree[path]]
+        if "raw" in (headers.get("Accept") or ""):
+            return 200, data
+        big = len(data) > self.INLINE_LIMIT
+        return 200, {"type": "file", "path": path, "sha": tree[path], "size": len(data),
+                     "encoding": "none" if big else "base64",
+                     "content": "" if big else base64.b64encode(data).decode("ascii")}
+
+    def _put_contents(self, path, query, body, headers):
+        branch = body.get("branch") or self.default_branch
+        if branch not in self.refs:
+            raise HttpError(404, "Branch not found")
+        current = self.trees[self.commits[self.refs[branch]]["tree"]].get(path)
+        if current and not body.get("sha"):
+            raise HttpError(422, '"sha" wasn\'t supplied.')
+        if current and body["sha"] != current:
+            raise HttpError(409, f"{path} does not match {body['sha']}")
+        commit = self._advance(branch, {path: base64.b64decode(body["content"])}, body["message"], headers)
+        sha = self.trees[self.commits[commit]["tree"]][path]
+        return (200 if current else 201), {"content": {"path": path, "sha": sha}, "commit": {"sha": commit}}
+
+    def _open_pull(self, query, body, headers):
+        if body["head"] not in self.refs or body["base"] not in self.refs:
+            raise HttpError(422, "Validation Failed")
+        n = self.next_number; self.next_number += 1
+        self.pulls[n] = {"number": n, "title": body["title"], "head": body["head"], "base": body["base"],
+                         "state": "open", "html_url": f"https://github.com/{self.owner}/{self.repo}/pull/{n}"}
+        return 201, self.pulls[n]
+
+    def _merge_pull(self, number, query, body, headers):
+        pr = self.pulls.get(int(number))
+        if not pr or pr["state"] != "open":
+            raise HttpError(405, "Pull Request is not mergeable")
+        head, base = self.refs[pr["head"]], self.refs[pr["base"]]
+        base_chain = self._ancestors(base)
+        fork = next((s for s in self._first_parents(head) if s in base_chain), None)
+        before = self.trees[self.commits[fork]["tree"]] if fork else {}
+        after = self.trees[self.commits[head]["tree"]]
+        entries = dict(self.trees[self.commits[base]["tree"]])
+        for p in set(before) | set(after):
+            if before.get(p) != after.get(p):
+                if p in after:
+                    entries[p] = after[p]
+                else:
+                    entries.pop(p, None)
+        sha = self._store_commit(self._store_tree(entries), [base], body.get("commit_title") or pr["title"])
+        self._set_ref(pr["base"], sha, headers=headers)
+        pr["state"] = "closed"
+        return 200, {"merged": True, "sha": sha}
+
+    def _first_parents(self, sha):
+        while sha:
+            yield sha
+            parents = self.commits[sha]["parents"]
+            sha = parents[0] if parents else None
+
+    def _list_issues(self, query, body, headers):
+        """state, since, sort (created|updated), direction, per_page and page, with a Link header."""
+        state, since = query.get("state", "open"), query.get("since")
+        key = (lambda i: (i["updated_at"], i["number"])) if query.get("sort") == "updated" else (lambda i: i["number"])
+        items = sorted((i for i in self.issues.values()
+                        if (state == "all" or i["state"] == state) and (not since or i["updated_at"] >= since)),
+                       key=key, reverse=query.get("direction", "desc") == "desc")
+        per_page, page = min(int(query.get("per_page", 30)), 100), int(query.get("page", 1))
+        links = {}
+        if page * per_page < len(items):
+            rest = urlencode({**{k: v for k, v in query.items() if k != "page"}, "page": page + 1})
+            links["Link"] = f'<{self.url}/repos/{self.owner}/{self.repo}/issues?{rest}>; rel="next"'
+        return 200, items[(page - 1) * per_page:page * per_page], links
+
+    def _create_issue(self, query, body, headers):
+        n = self.next_number; self.next_number += 1
+        self.issues[n] = {"number": n, "title": body["title"], "body": body.get("body", ""),
+                          "state": "open", "updated_at": _now(),
+                          "html_url": f"https://github.com/{self.owner}/{self.repo}/issues/{n}"}
+        return 201, self.issues[n]
+
+    def _update_issue(self, number, query, body, headers):
+        issue = self.issues.get(int(number))
+        if not issue:
+            raise HttpError(404, "Not Found")
+        issue.update({k: v for k, v in body.items() if k in ("title", "body", "state")})
+        issue["updated_at"] = _now()
+        return 200, issue
+
+    def _comment(self, number, query, body, headers):
+        self.comments.append((int(number), body["body"]))
+        return 201, {"id": len(self.comments), "body": body["body"]}
+
+    def _dispatch(self, workflow, query, body, headers):
+        branch = body["ref"]
+        if branch not in self.refs:
+            raise HttpError(422, "No ref found")
+        self._add_run("workflow_dispatch", self.refs[branch])
+        return 204, None
+
+    def _list_runs(self, workflow, query, body, headers):
+        runs = [r for r in reversed(self.runs)
+                if not query.get("branch") or r["head_branch"] == query["branch"]]
+        return 200, {"total_count": len(runs), "workflow_runs": runs[:int(query.get("per_page", 30))]}
+
+    def _graphql(self, body):
+        """
+        Understands the shape of agent.collect_status(): repository.defaultBranchRef,
+        blob lookups aliased fN with `expression: $eN`, and an issue title search.
+        """
+        variables = body.get("variables") or {}
+        repo = {"defaultBranchRef": {"name": self.default_branch,
+                                     "target": {"oid": self.refs[self.default_branch]}}}
+        for name, expr in variables.items():
+            if not re.fullmatch(r"e\d+", name):
+                continue
+            ref, _, path = expr.partition(":")
+            tree = self.trees[self._resolve_tree(self.default_branch if ref == "HEAD" else ref)]
+            sha = tree.get(path)
+            repo["f" + name[1:]] = {"oid": sha, "byteSize": len(self.blobs[sha])} if sha else None
+        data = {"repository": repo}
+        if "issues" in variables:
+            m = re.search(r'in:title "([^"]*)"', variables["issues"])
+            words = m.group(1) if m else ""
+            data["search"] = {"nodes": [
+                {"number": i["number"], "title": i["title"], "state": "OPEN", "url": i["html_url"]}
+                for i in self.issues.values() if i["state"] == "open" and words in i["title"]]}
+        return {"data": data}
+
+    def _pages_build(self, query, body, headers):
+        return 200, {"status": "built", "updated_at": _now()}
+
+    ROUTES = [
+        (r"/", "GET", _repo),
+        (r"/git/ref/heads/(.+)", "GET", _get_ref),
+        (r"/git/refs", "POST", _create_ref),
+        (r"/git/refs/heads/(.+)", "PATCH", _update_ref),
+        (r"/git/commits/([0-9a-f]+)", "GET", _get_commit),
+        (r"/git/commits", "POST", _create_commit),
+        (r"/git/trees/(.+)", "GET", _get_tree),
+        (r"/git/trees", "POST", _create_tree),
+        (r"/git/blobs/([0-9a-f]+)", "GET", _get_blob),
+        (r"/git/blobs", "POST", _create_blob),
+        (r"/contents/(.+)", "GET", _get_contents),
+        (r"/contents/(.+)", "PUT", _put_contents),
+        (r"/pulls", "POST", _open_pull),
+        (r"/pulls/(\d+)/merge", "PUT", _merge_pull),
+        (r"/issues", "GET", _list_issues),
+        (r"/issues", "POST", _create_issue),
+        (r"/issues/(\d+)", "PATCH", _update_issue),
+        (r"/issues/(\d+)/comments", "POST", _comment),
+        (r"/actions/workflows/([^/]+)/dispatches", "POST", _dispatch),
+        (r"/actions/workflows/([^/]+)/runs", "GET", _list_runs),
+        (r"/pages/builds/latest", "GET", _pages_build),
+    ]
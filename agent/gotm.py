@@ -0,0 +1,243 @@
+# agent/gotm.py
+"""
+Goal of the Month: round state in site/data/gotm.json and a streaming tally of
+the vote export (the GOTM_Votes sheet as CSV, or JSONL with the same fields).
+
+    python agent/gotm.py votes.csv --opened 2025-09-01T00:00:00Z [--days 7] [--channels website,instagram]
+
+Rows are read one at a time. Each (voter, source) pair counts once — its first
+vote inside the window — so someone may vote once per channel. Seen pairs are
+kept as 64-bit hashes in a set until there are `max_keys` of them; past that the
+set and every later vote spill into hash-partitioned temp files that are
+deduplicated one partition at a time, so memory stays bounded however viral the
+vote gets. Timestamps are compared as ISO strings (UTC), not parsed.
+"""
+import csv, datetime, itertools, json, os, struct, sys, tempfile
+
+GOTM_PATH = "site/data/gotm.json"
+RECORD = struct.Struct("<QIH")     # voter key, player id, channel id
+COUNTED = 0xFFFFFFFF               # player id of keys counted before a spill
+FIELDS = {
+    "timestamp": ("timestamp", "ts", "time", "date"),
+    "player": ("player", "nominee", "goal"),
+    "source": ("source", "channel"),
+    "voter": ("voter", "voter_id", "user", "handle"),
+    "meta": ("meta", "json"),
+}
+SHEET_COLUMNS = ("timestamp", "player", "source", "meta", "voter")   # GOTM_Votes layout without a header
+
+def iso(dt):
+    return dt.replace(microsecond=0, tzinfo=None).isoformat() + "Z"
+
+def norm_ts(value):
+    """"2025-09-09T15:00:00.000Z" / "2025-09-09 15:00:00" → "2025-09-09T15:00:00"."""
+    s = str(value or "").strip()
+    if len(s) >= 19:
+        return s[:10] + "T" + s[11:19]
+    if len(s) == 10:
+        return s + "T00:00:00"
+    return None
+
+def window(opened, days):
+    start = datetime.datetime.fromisoformat(norm_ts(opened))
+    return norm_ts(opened), (start + datetime.timedelta(days=days)).isoformat()
+
+def _voter_from_meta(meta):
+    if not meta or "voter" not in meta:
+        return None
+    try:
+        return (json.loads(meta) or {}).get("voter")
+    except (ValueError, AttributeError):
+        return None
+
+def read_rows(lines):
+    """(timestamp, player, source, voter) per vote from CSV or JSONL lines; None for unreadable rows."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    lines = itertools.chain([first], lines)
+    if first.lstrip().startswith("{"):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                v = json.loads(line)
+                meta = v.get("meta")
+                yield (v.get("timestamp") or v.get("ts"), v.get("player"), v.get("source"),
+                       v.get("voter") or (meta.get("voter") if isinstance(meta, dict) else None))
+            except (ValueError, AttributeError):
+                yield None
+        return
+    reader = csv.reader(lines)
+    first_row = next(reader)
+    head = [h.strip().lower() for h in first_row]
+    if "player" in head:
+        cols = {f: next((head.index(a) for a in aliases if a in head), None) for f, aliases in FIELDS.items()}
+        rows = reader
+    else:
+        cols = {f: SHEET_COLUMNS.index(f) for f in FIELDS}
+        rows = itertools.chain([first_row], reader)
+    t, p, s, v, m = (cols[f] for f in ("timestamp", "player", "source", "voter", "meta"))
+    if t is None or p is None:
+        for _ in rows:
+            yield None
+        return
+    need = max(t, p)
+    s, v, m = (sys.maxsize if i is None else i for i in (s, v, m))   # missing column: never < len(row)
+    for row in rows:
+        n = len(row)
+        if n <= need:
+            yield None
+            continue
+        voter = row[v] if v < n else None
+        if not voter and m < n:
+            voter = _voter_from_meta(row[m])
+        yield row[t], row[p], row[s] if s < n else "", voter
+
+class Tally:
+    """Counts first votes per (voter, channel) key with bounded memory (see module docstring)."""
+    def __init__(self, max_keys=1_000_000, partitions=64, tmpdir=None):
+        self.max_keys, self.partitions, self.tmpdir = max_keys, partitions, tmpdir
+        self.seen, self.parts, self.spill_dir = set(), None, None
+        self.counts = {}           # (player id, channel id) -> votes
+        self.duplicates = 0
+
+    def add(self, key, pid, cid):
+        if self.parts is not None:
+            self.parts[key % self.partitions].write(RECORD.pack(key, pid, cid))
+            return
+        if key in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add(key)
+        self.counts[pid, cid] = self.counts.get((pid, cid), 0) + 1
+        if len(self.seen) > self.max_keys:
+            self._spill()
+
+    def count(self, pid, cid):
+        """A vote that can't be deduplicated (no voter id)."""
+        self.counts[pid, cid] = self.counts.get((pid, cid), 0) + 1
+
+    def _spill(self):
+        self.spill_dir = tempfile.TemporaryDirectory(prefix="gotm-", dir=self.tmpdir)
+        self.parts = [open(os.path.join(self.spill_dir.name, f"{i}.bin"), "wb", buffering=1 << 16)
+                      for i in range(self.partitions)]
+        for key in self.seen:
+            self.parts[key % self.partitions].write(RECORD.pack(key, COUNTED, 0))
+        self.seen = None
+
+    def finish(self):
+        if self.parts is None:
+            return self.counts
+        try:
+            for f in self.parts:
+                f.close()
+            for f in self.parts:
+                seen = set()
+                with open(f.name, "rb") as part:
+                    data = part.read()
+                for key, pid, cid in RECORD.iter_unpack(data):
+                    if key in seen:
+                        self.duplicates += pid != COUNTED
+                        continue
+                    seen.add(key)
+                    if pid != COUNTED:
+                        self.counts[pid, cid] = self.counts.get((pid, cid), 0) + 1
+        finally:
+            self.spill_dir.cleanup()
+            self.parts = None
+        return self.counts
+
+def tally(rows, opened, days, channels=(), max_keys=1_000_000):
+    """Tally `rows` (from read_rows) for a round opened at `opened` lasting `days` days."""
+    start, end = window(opened, days)
+    allowed = {c.strip().lower() for c in channels if c}
+    names, folded_ids, sources = [], {}, []
+    pids, cids = {}, {}        # raw player / source text -> id; cids maps other channels to None
+    rows_seen = invalid = outside = other = anonymous = 0
+    t = Tally(max_keys=max_keys)
+    add, count = t.add, t.count
+    for row in rows:
+        rows_seen += 1
+        if row is None or not row[1]:
+            invalid += 1
+            continue
+        ts, player, source, voter = row
+        ts = ts[:19] if isinstance(ts, str) and len(ts) >= 19 and ts[10] == "T" else norm_ts(ts)
+        if ts is None:
+            invalid += 1
+            continue
+        if not start <= ts < end:
+            outside += 1
+            continue
+        if source not in cids:
+            clean = (source or "").strip().lower()
+            if allowed and clean not in allowed:
+                cids[source] = None
+            else:
+                if clean not in sources:
+                    sources.append(clean)
+                cids[source] = sources.index(clean)
+        cid = cids[source]
+        if cid is None:
+            other += 1
+            continue
+        pid = pids.get(player)
+        if pid is None:
+            name = str(player).strip()
+            pid = pids[player] = folded_ids.setdefault(name.casefold(), len(names))
+            if pid == len(names):
+                names.append(name)
+        if voter:
+            add(hash((str(voter).strip().lower(), cid)) & 0xFFFFFFFFFFFFFFFF, pid, cid)
+        else:
+            anonymous += 1
+            count(pid, cid)
+    stats = {"rows": rows_seen, "invalid": invalid, "outside_window": outside,
+             "other_channel": other, "anonymous": anonymous}
+    counts = t.finish()
+
+    results = {}
+    for (pid, cid), n in counts.items():
+        r = results.setdefault(pid, {"player": names[pid], "votes": 0, "channels": {}})
+        r["votes"] += n
+        r["channels"][sources[cid]] = n
+    ranked = sorted(results.values(), key=lambda r: (-r["votes"], r["player"].casefold()))
+    stats.update(duplicates=t.duplicates, counted=sum(r["votes"] for r in ranked))
+    return {"window": {"opened": start + "Z", "closes": end + "Z"}, "results": ranked, "tally": stats}
+
+def open_round(doc, now, days, channels):
+    """gotm.json after `/gotm open`; a closed round moves into history."""
+    doc = dict(doc or {})
+    history = list(doc.pop("history", []))
+    if doc.get("status") == "closed":
+        history.insert(0, {k: doc.get(k) for k in ("month", "opened", "closed", "winner")})
+    return {"status": "open", "month": now.strftime("%Y-%m"), "opened": iso(now),
+            "closes": iso(now + datetime.timedelta(days=days)), "window_days": days,
+            "channels": list(channels), "history": history}
+
+def close_round(doc, result, now):
+    ranked = result["results"]
+    winner = {"player": ranked[0]["player"], "votes": ranked[0]["votes"]} if ranked else None
+    return dict(doc, status="closed", closed=iso(now), winner=winner,
+                results=ranked, tally=result["tally"])
+
+def open_lines(path):
+    return open(path, "r", encoding="utf-8", newline="")
+
+def main(argv):
+    def opt(flag, default=None):
+        return argv[argv.index(flag) + 1] if flag in argv else default
+    if not argv or argv[0].startswith("--"):
+        print(__doc__.strip().splitlines()[3].strip())
+        return 2
+    channels = [c for c in (opt("--channels") or "").split(",") if c]
+    with open_lines(argv[0]) as f:
+        result = tally(read_rows(f), opt("--opened", "1970-01-01T00:00:00Z"), float(opt("--days", 7)),
+                       channels, max_keys=int(opt("--max-keys", 1_000_000)))
+    print(json.dumps(result, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,266 @@
+# agent/livefeed.py
+"""
+Live match events as an append-only stream.
+
+Each `/live …` command appends its events as one small, immutable segment file:
+
+    site/data/live/<match>/000007-000008.json   {"match": …, "from": 7, "to": 8, "events": [{"seq": 7, …}, …]}
+
+and rewrites site/data/live.json, the head document: match, status, score, goals,
+the last few events, the latest sequence number and the list of segments. The site
+polls the head and fetches only the segments past the last sequence it has seen.
+
+Event kinds: kickoff, goal, card, sub, ht, ft, note.
+
+    /live kickoff Borough [home|away]     a new match (after HT: the second half)
+    /live goal 34 Smith [pen]             ours; `/live goal 50 them [name]` for theirs, `og` for an own goal
+    /live card 60 Jones [yellow|red] [them]
+    /live sub 70 Brown for Smith [them]
+    /live ht | /live ft
+    /live note Team news: …               also fine before kickoff (it just sets the text)
+    /live {"kind": "goal", "minute": 34, "player": "Smith"}   or a JSON list of events
+
+Segments are compacted: every `compact_segments` segments are merged into one, and at
+full time all of them go into site/data/matches/<match>.json and are deleted.
+"""
+import datetime, re
+
+from playerstats import slugify
+
+LIVE_PATH = "site/data/live.json"
+SEGMENT_DIR = "site/data/live"
+ARCHIVE_DIR = "site/data/matches"
+KINDS = ("kickoff", "goal", "card", "sub", "ht", "ft", "note")
+ALIASES = {"ko": "kickoff", "halftime": "ht", "fulltime": "ft", "yellow": "card", "red": "card"}
+DEFAULTS = {"team": "Syston Town Tigers", "recent": 5, "compact_segments": 10}
+MINUTE = re.compile(r"^(\d{1,3})(?:\+(\d{1,2}))?['’]?$")
+THEM = {"them", "opp", "opponent", "away-side"}
+
+def options(config=None):
+    opts = dict(DEFAULTS)
+    opts.update({k: v for k, v in (config or {}).items() if v is not None})
+    return opts
+
+def now_iso():
+    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+def data_path(path):
+    """Repo path → the path the site fetches it by (relative to site/data/)."""
+    return path[len("site/data/"):]
+
+# ---------- Parsing ----------
+def parse_event(text):
+    """`goal 34 Smith pen` → {"kind": "goal", "minute": "34", "player": "Smith", "penalty": True}."""
+    words = text.split()
+    if not words:
+        raise ValueError(f"Missing event. Use one of: {', '.join(KINDS)}")
+    kind = ALIASES.get(words[0].lower(), words[0].lower())
+    if kind not in KINDS:
+        raise ValueError(f"Unknown event `{words[0]}`. Use one of: {', '.join(KINDS)}")
+    event, rest = {"kind": kind}, words[1:]
+    if kind == "note":
+        event["text"] = " ".join(rest)
+        if not event["text"]:
+            raise ValueError("`/live note` needs some text")
+        return event
+    if words[0].lower() in ("yellow", "red"):
+        event["card"] = words[0].lower()
+    if rest and MINUTE.match(rest[0]):
+        m = MINUTE.match(rest.pop(0))
+        event["minute"] = m.group(1) + (f"+{m.group(2)}" if m.group(2) else "")
+    flags = {w.lower() for w in rest}
+    if kind == "kickoff":
+        event["home"] = "away" not in flags
+        opp = " ".join(w for w in rest if w.lower() not in ("home", "away"))
+        if opp:
+            event["opp"] = opp
+        return event
+    if flags & THEM:
+        event["team"] = "them"
+        rest = [w for w in rest if w.lower() not in THEM]
+    if kind == "goal":
+        if "pen" in flags:
+            event["penalty"] = True
+        if "og" in flags:
+            event["own_goal"] = True
+        rest = [w for w in rest if w.lower() not in ("pen", "og")]
+    if kind == "card":
+        for colour in ("yellow", "red"):
+            if colour in flags:
+                event["card"] = colour
+        event.setdefault("card", "yellow")
+        rest = [w for w in rest if w.lower() not in ("yellow", "red")]
+    if kind == "sub":
+        lower = [w.lower() for w in rest]
+        if "for" in lower:
+            i = lower.index("for")
+            event["on"], event["off"] = " ".join(rest[:i]), " ".join(rest[i + 1:])
+            rest = []
+    if rest:
+        event["player"] = " ".join(rest)
+    return event
+
+def clean_event(event):
+    """A JSON event from a comment: known kind, string values only where expected."""
+    if not isinstance(event, dict) or event.get("kind") not in KINDS:
+        raise ValueError(f"Each event needs a \"kind\": one of {', '.join(KINDS)}")
+    event = {k: v for k, v in event.items() if k not in ("seq", "ts")}
+    if "minute" in event:
+        event["minute"] = str(event["minute"])
+    return event
+
+# ---------- Head document ----------
+def minute_label(event):
+    return f"{event['minute']}’" if event.get("minute") else ""
+
+def describe(event, team):
+    """One line per event, for the head's text and the site's feed."""
+    who = event.get("player") or ("They" if event.get("team") == "them" else team)
+    at = f" ({minute_label(event)})" if event.get("minute") else ""
+    kind = event["kind"]
+    if kind == "goal":
+        if event.get("team") == "them":
+            return f"Goal for {event.get('opp') or 'them'}{': ' + event['player'] if event.get('player') else ''}{at}"
+        extra = " (pen)" if event.get("penalty") else " (og)" if event.get("own_goal") else ""
+        return f"GOAL! {who}{extra}{at}"
+    if kind == "card":
+        return f"{event.get('card', 'yellow').title()} card: {who}{at}"
+    if kind == "sub":
+        return f"Sub: {event.get('on', '?')} on for {event.get('off', '?')}{at}"
+    if kind == "kickoff":
+        return f"Kick-off{at}"
+    if kind == "ht":
+        return "Half-time"
+    if kind == "ft":
+        return "Full-time"
+    return event.get("text", "")
+
+def scoreline(head, team):
+    match, score = head["match"], head["score"]
+    home, away = (team, match["opp"]) if match.get("home", True) else (match["opp"], team)
+    a, b = score if match.get("home", True) else score[::-1]
+    return f"{home} {a}–{b} {away}"
+
+def head_text(head, team, last):
+    if not head.get("match"):
+        return last
+    label = {"ht": "HT", "ft": "FT"}.get(head["status"]) or minute_label(head) or "LIVE"
+    text = f"{label}: {scoreline(head, team)}"
+    if head["status"] == "ft":
+        scorers = [f"{g['player']} {minute_label(g)}".strip() for g in head.get("goals", [])
+                   if g.get("team") != "them" and g.get("player")]
+        return text + (f". Scorers: {', '.join(scorers)}." if scorers else ".")
+    return f"{text} — {last}" if last else text
+
+def _match_id(opp, date):
+    return f"{date}-{slugify(opp)}"
+
+def append(head, events, config=None, now=None):
+    """
+    (new head, segment path, segment doc) for `events` appended to `head` (live.json as it
+    is now). Sequence numbers continue from the head's. Raises ValueError for events that
+    don't fit the match state. A pre-match note gives (head, None, None): text only.
+    """
+    opts = options(config)
+    team, now = opts["team"], now or now_iso()
+    head = dict(head or {})
+    if head.get("match") is None or head.get("status") == "ft":
+        if events[0]["kind"] == "note" and len(events) == 1:
+            return dict(head, updated=now, text=events[0]["text"]), None, None
+        if events[0]["kind"] != "kickoff":
+            raise ValueError("No match in progress; start one with `/live kickoff <opponent> [home|away]`")
+    seq = int(head.get("seq") or 0)
+    stamped = []
+    for event in events:
+        kind = event["kind"]
+        status, match = head.get("status"), head.get("match")
+        if kind == "kickoff" and (match is None or status == "ft"):
+            if not event.get("opp"):
+                raise ValueError("Kick-off needs the opponent: `/live kickoff Borough [home|away]`")
+            match = {"id": _match_id(event["opp"], now[:10]), "opp": event["opp"],
+                     "home": event.get("home", True), "kickoff": now}
+            head = {"match": match, "status": "live", "score": [0, 0], "goals": [], "seq": 0,
+                    "segments": [], "recent": []}
+            seq = 0
+        elif kind == "kickoff":
+            if status != "ht":
+                raise ValueError(f"A match is already in progress (vs {match['opp']}); post `/live ft` first")
+            head["status"] = "live"
+        elif status == "ft":
+            raise ValueError("The match is over; start the next one with `/live kickoff <opponent>`")
+        elif kind == "ht":
+            head["status"] = "ht"
+            head.pop("minute", None)
+        elif kind == "ft":
+            head["status"] = "ft"
+        elif kind == "goal":
+            # An own goal by their player counts for us, so "team" says who benefits.
+            side = 1 if event.get("team") == "them" else 0
+            head["score"] = [n + (i == side) for i, n in enumerate(head["score"])]
+            head["goals"] = head["goals"] + [{k: event[k] for k in ("player", "minute", "team", "penalty", "own_goal")
+                                             if k in event}]
+        seq += 1
+        stamped.append(dict(event, seq=seq, ts=now, text=describe(dict(event, opp=head["match"]["opp"]), team)))
+        if event.get("minute"):
+            head["minute"] = event["minute"]
+
+    match_id = head["match"]["id"]
+    first = stamped[0]["seq"]
+    path = f"{SEGMENT_DIR}/{match_id}/{first:06d}-{seq:06d}.json"
+    segment = {"match": match_id, "from": first, "to": seq, "events": stamped}
+    head.update(
+        updated=now, seq=seq,
+        segments=list(head.get("segments") or []) + [{"from": first, "to": seq, "path": data_path(path)}],
+        recent=(list(head.get("recent") or []) + stamped)[-int(opts["recent"]):],
+    )
+    head["text"] = head_text(head, team, stamped[-1]["text"])
+    return head, path, segment
+
+# ---------- Compaction ----------
+def needs_compaction(head, config=None):
+    """"final" (a finished match still has segments), "merge" (too many segments) or None."""
+    segments = (head or {}).get("segments") or []
+    if segments and head.get("status") == "ft":
+        return "final"
+    if len(segments) >= max(2, int(options(config)["compact_segments"])):
+        return "merge"
+    return None
+
+def compact(head, segment_docs, final):
+    """
+    Plan for folding the head's segments (`segment_docs`, as read) into one file:
+    ({path: fn(current_doc) -> doc}, [paths to delete]). The head mutation only drops the
+    segments that were read, so events appended meanwhile stay where they are.
+    """
+    events = sorted((e for doc in segment_docs for e in doc.get("events") or []), key=lambda e: e["seq"])
+    if not events:
+        return {}, []
+    paths = {s["path"] for s in head["segments"]}
+    match = head["match"]
+    first, last = events[0]["seq"], events[-1]["seq"]
+    if final:
+        target = f"{ARCHIVE_DIR}/{match['id']}.json"
+
+        def write(doc):
+            # A later compaction of the same match (events after FT) merges by seq.
+            merged = {e["seq"]: e for e in (doc or {}).get("events") or []}
+            merged.update((e["seq"], e) for e in events)
+            return {"match": match, "score": head["score"], "goals": head.get("goals", []),
+                    "status": head.get("status"), "events": [merged[k] for k in sorted(merged)]}
+        entry = None
+    else:
+        target = f"{SEGMENT_DIR}/{match['id']}/{first:06d}-{last:06d}.json"
+        write = lambda _doc: {"match": match["id"], "from": first, "to": last, "events": events}
+        entry = {"from": first, "to": last, "path": data_path(target)}
+
+    def rewrite_head(doc):
+        doc = dict(doc or {})
+        if (doc.get("match") or {}).get("id") != match["id"]:
+            return doc
+        kept = [s for s in doc.get("segments") or [] if s["path"] not in paths]
+        doc["segments"] = ([entry] if entry else []) + kept
+        if final:
+            doc["archive"] = data_path(target)
+        return doc
+    deletes = [f"site/data/{p}" for p in paths if f"site/data/{p}" != target]
+    return {target: write, LIVE_PATH: rewrite_head}, deletes
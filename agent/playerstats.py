@@ -0,0 +1,228 @@
+# agent/playerstats.py
+"""
+Player statistics derived from the `scorers` of our results in results.json.
+
+stats.json keeps the aggregates in an indexed, column-oriented form: players,
+seasons and competitions are listed once and every row refers to them by position.
+
+    "columns": ["player", "season", "competition", "goals", "braces", "hat_tricks",
+                "first_scorer", "clean_sheets", "minutes"],
+    "rows":    [[0, 0, 0, 7, 1, 0, 3, 0, [1, 0, 2, 1, 0, 3, 0, 0]], …]   # minutes: one count per bucket
+
+plus team rows (played, goals for/against, clean sheets) per season and competition
+and the old hand-posted `stats` summary for the current season. Each player also
+gets site/data/players/<slug>.json for the site to fetch on demand.
+
+Scorer entries look like "Smith 34", "Smith 45+2", "Smith 12, 67", "Smith 30 pen",
+"Smith x2" or {"name": "Smith", "minute": 34}; "OG"/"own goal" entries aren't
+credited to anyone. A result's "keeper" is credited with its clean sheet.
+Aggregates are sums, so appended results are folded in (same marker scheme as
+standings.py); anything else rebuilds from the full history.
+"""
+import datetime, re
+
+from standings import LISTS, appended_from, parse_score, season_of, tail_digest
+
+SHARD_DIR = "site/data/players"
+COLUMNS = ["player", "season", "competition", "goals", "braces", "hat_tricks",
+           "first_scorer", "clean_sheets", "minutes"]
+TEAM_COLUMNS = ["season", "competition", "played", "goals_for", "goals_against", "clean_sheets"]
+BUCKETS = ["1-15", "16-30", "31-45", "46-60", "61-75", "76-90", "91+", "?"]
+DEFAULTS = {"competition": "League", "season_start_month": 8}
+OWN_GOAL = re.compile(r"^\s*(o\.?\s?g\.?|own goal)\b", re.I)
+MINUTE = re.compile(r"(\d{1,3})(?:\s*\+\s*(\d{1,2}))?\s*['’]?")
+TIMES = re.compile(r"(?:\b[x×]\s*(\d)\b|\((\d)\))", re.I)
+# "(pen)", "(p)", "(p.)" or a bare "pen"; a bare "P" is an initial ("P Jones 12"), not a penalty.
+PENALTY = re.compile(r"\((?:pen|p)\.?\)|\bpen\b\.?", re.I)
+
+def options(config=None):
+    opts = dict(DEFAULTS)
+    opts.update({k: v for k, v in (config or {}).items() if v is not None})
+    return opts
+
+def bucket(minute):
+    if minute is None:
+        return len(BUCKETS) - 1
+    if minute > 90:
+        return 6
+    return max(0, min(5, (minute - 1) // 15))
+
+def parse_scorer(entry):
+    """(name, [minute or None per goal]) or None. Stoppage time counts as the base minute."""
+    if isinstance(entry, dict):
+        name = str(entry.get("name") or entry.get("player") or "").strip()
+        minutes = entry.get("minutes") or ([entry["minute"]] if entry.get("minute") is not None else [])
+        minutes = [int(str(m).split("+")[0]) for m in minutes if str(m).split("+")[0].isdigit()]
+        goals = minutes or [None] * int(entry.get("goals") or 1)
+        return (name, goals) if name and not OWN_GOAL.match(name) else None
+    text = str(entry or "").strip()
+    if not text or OWN_GOAL.match(text):
+        return None
+    times = TIMES.search(text)
+    if times:
+        text = (text[:times.start()] + text[times.end():]).strip()
+    text = PENALTY.sub("", text)
+    first_digit = re.search(r"\d", text)
+    name = (text[:first_digit.start()] if first_digit else text).strip(" ,;-–(")
+    if not name:
+        return None
+    minutes = [int(m.group(1)) for m in MINUTE.finditer(text[first_digit.start():])] if first_digit else []
+    if not minutes:
+        minutes = [None] * int((times.group(1) or times.group(2)) if times else 1)
+    return name, minutes
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "player"
+
+class Index:
+    """Mutable view of a stats.json document; rows are keyed by (player, season, competition)."""
+    def __init__(self, doc=None):
+        doc = doc or {}
+        self.players = [dict(p) for p in doc.get("players") or []]
+        self.seasons = list(doc.get("seasons") or [])
+        self.competitions = list(doc.get("competitions") or [])
+        self.rows = {tuple(r[:3]): list(r[3:8]) + [list(r[8])] for r in doc.get("rows") or []}
+        self.team = {tuple(r[:2]): list(r[2:]) for r in doc.get("team") or []}
+        self._player_ids = {p["name"]: i for i, p in enumerate(self.players)}
+        self._slugs = {p["slug"] for p in self.players}
+        self.touched = set()
+
+    def _id(self, values, value):
+        if value not in values:
+            values.append(value)
+        return values.index(value)
+
+    def player(self, name):
+        pid = self._player_ids.get(name)
+        if pid is None:
+            slug, n = slugify(name), 2
+            while slug in self._slugs:
+                slug, n = f"{slugify(name)}-{n}", n + 1
+            self._slugs.add(slug)
+            pid = self._player_ids[name] = len(self.players)
+            self.players.append({"name": name, "slug": slug})
+        self.touched.add(pid)
+        return pid
+
+    def row(self, name, season, competition):
+        key = (self.player(name), self._id(self.seasons, season), self._id(self.competitions, competition))
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = [0, 0, 0, 0, 0, [0] * len(BUCKETS)]
+        return row
+
+    def add(self, record, opts):
+        """Fold one of our results into the aggregates."""
+        season = season_of(record.get("date"), opts["season_start_month"])
+        if season is None:
+            return
+        competition = str(record.get("competition") or opts["competition"])
+        score = parse_score(record.get("score"))
+        if score:
+            team = self.team.setdefault((self._id(self.seasons, season),
+                                         self._id(self.competitions, competition)), [0, 0, 0, 0])
+            team[0] += 1
+            team[1] += score[0]
+            team[2] += score[1]
+            if score[1] == 0:
+                team[3] += 1
+                if record.get("keeper"):
+                    self.row(str(record["keeper"]), season, competition)[4] += 1
+
+        # One entry per goal ("Smith 12", "Smith 67") and "Smith 12, 67" both make a brace.
+        goals = {}
+        for parsed in map(parse_scorer, record.get("scorers") or []):
+            if parsed:
+                goals.setdefault(parsed[0], []).extend(parsed[1])
+        timed = [(m, name) for name, minutes in goals.items() for m in minutes if m is not None]
+        first = min(timed)[1] if timed else next(iter(goals), None)
+        for name, minutes in goals.items():
+            row = self.row(name, season, competition)
+            row[0] += len(minutes)
+            row[1] += len(minutes) == 2
+            row[2] += len(minutes) >= 3
+            for m in minutes:
+                row[5][bucket(m)] += 1
+        if first is not None:
+            self.row(first, season, competition)[3] += 1
+
+    def by_player(self, pids):
+        """{pid: [(season, competition, row)]} for `pids`, in one pass over the rows."""
+        out = {pid: [] for pid in pids}
+        for (p, s, c), row in self.rows.items():
+            if p in out:
+                out[p].append((self.seasons[s], self.competitions[c], row))
+        return out
+
+def shard(player, rows, updated):
+    seasons, career = [], {k: 0 for k in COLUMNS[3:8]}
+    for season, competition, row in sorted(rows, key=lambda r: r[:2]):
+        entry = {"season": season, "competition": competition, **dict(zip(COLUMNS[3:8], row[:5])),
+                 "minutes": {b: n for b, n in zip(BUCKETS, row[5]) if n}}
+        seasons.append(entry)
+        for k, v in zip(COLUMNS[3:8], row[:5]):
+            career[k] += v
+    return {"updated": updated, "name": player["name"], "slug": player["slug"],
+            "career": career, "seasons": seasons}
+
+def summary(index, season):
+    """The hand-posted `stats` block, now computed for the current season."""
+    if season not in index.seasons:
+        return {}
+    s = index.seasons.index(season)
+    totals = {}
+    for (p, ps, _c), row in index.rows.items():
+        if ps == s:
+            totals[p] = totals.get(p, 0) + row[0]
+    top = max(totals.items(), key=lambda kv: (kv[1], -kv[0]), default=None)
+    clean = sum(t[3] for (ts, _c), t in index.team.items() if ts == s)
+    return {"top_scorer": {"name": index.players[top[0]]["name"], "goals": top[1]} if top and top[1] else None,
+            "clean_sheets": clean}
+
+def derive_stats(results, stats=None, config=None, previous=None):
+    """
+    (stats.json document, {shard path: player doc}) for `results`; only the players
+    touched by new results get a fresh shard, and a rebuild maps the shards of players
+    no longer in the results to None (delete). Returns `stats` unchanged (and no shards)
+    when there is nothing new.
+    """
+    opts = options(config)
+    marker = (stats or {}).get("derived_from") or {}
+    lists = [(results or {}).get(k) or [] for k in LISTS]
+    rules = f"{opts['competition']}|{opts['season_start_month']}"
+    seen = appended_from(lists, previous, marker) if marker.get("rules") == rules else None
+    if seen is not None and seen[0] == len(lists[0]):
+        if seen[1] == len(lists[1]):
+            return stats, {}
+        return dict(stats, derived_from=dict(marker, league=len(lists[1]), tail=tail_digest(lists))), {}
+    if seen is None:
+        index, new = Index(), lists[0]
+    else:
+        index, new = Index(stats), lists[0][seen[0]:]
+    for record in new:
+        index.add(record, opts)
+
+    updated = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    season = max(index.seasons, default=None)
+    doc = {
+        "updated": updated,
+        "season": season,
+        "stats": summary(index, season),
+        "players": index.players,
+        "seasons": index.seasons,
+        "competitions": index.competitions,
+        "buckets": BUCKETS,
+        "columns": COLUMNS,
+        "rows": [list(k) + row for k, row in sorted(index.rows.items())],
+        "team_columns": TEAM_COLUMNS,
+        "team": [list(k) + row for k, row in sorted(index.team.items())],
+        "derived_from": {"source": "site/data/results.json", "rules": rules,
+                         "results": len(lists[0]), "league": len(lists[1]), "tail": tail_digest(lists)},
+    }
+    shards = {f"{SHARD_DIR}/{index.players[pid]['slug']}.json": shard(index.players[pid], rows, updated)
+              for pid, rows in index.by_player(index.touched).items()}
+    if seen is None:
+        kept = {p["slug"] for p in index.players}
+        shards.update((f"{SHARD_DIR}/{p['slug']}.json", None) for p in (stats or {}).get("players") or []
+                      if p.get("slug") and p["slug"] not in kept)
+    return doc, shards
@@ -0,0 +1,192 @@
+# agent/sitebuild.py
+"""
+Site data build: content-hashed copies of site/data for the deployed site.
+
+    python agent/sitebuild.py site [--config agent/config.yml] [--host github-pages|static] [--no-brotli]
+
+Run by site-deploy.yml on the checkout before it is uploaded. Every data file is
+minified and written as site/data/v/<name>.<hash>.json; fixtures.json and
+results.json are also split into shards (fixtures by month, results by season) so
+a new result only changes the current season's shard. site/data/manifest.json maps
+logical names to those paths:
+
+    {"built": "…", "files": {"table": "data/v/table.3f9c0e12ab.json", "players/smith": …},
+     "shards": {"results": {"2024-25": "data/v/results/2024-25.81d0….json", …}, "fixtures": {"2025-09": …}},
+     "meta": {"results": {"updated": "…"}}}
+
+Hashed files never change, so clients can cache them forever and refetch only the
+manifest and the shards whose names changed; results.html reads just the shards it
+shows. For `host: static` (any host but GitHub Pages) each output also gets a .gz
+copy (and .br when the brotli module is installed) and site/_headers marks data/v/
+immutable. GitHub Pages compresses on the fly, sets its own cache headers and would
+never serve either, so `host: github-pages` skips them.
+The original files stay where they are for clients that don't read the manifest.
+live.json and the live segments are left out: they are polled, not cached.
+"""
+import datetime, gzip, hashlib, json, os, shutil, sys
+
+from standings import parse_date, season_of
+
+MANIFEST = "manifest.json"
+OUT_DIR = "v"
+SKIP = ("live.json", "live/", MANIFEST, OUT_DIR + "/")
+SHARDED = {"results": ("season", ("results", "league")), "fixtures": ("month", ("fixtures",))}
+HOSTS = ("github-pages", "static")
+DEFAULTS = {"build": True, "host": "github-pages", "brotli": True, "season_start_month": 8}
+MIN_COMPRESS = 256        # bytes; smaller files aren't worth a compressed copy
+HEADERS = (
+    "/data/v/*\n  Cache-Control: public, max-age=31536000, immutable\n"
+    "/data/manifest.json\n  Cache-Control: no-cache\n"
+)
+
+def options(config=None):
+    """`site.build` from config.yml: a mapping, or just true/false."""
+    if isinstance(config, bool):
+        config = {"build": config}
+    opts = dict(DEFAULTS)
+    opts.update({k: v for k, v in (config or {}).items() if v is not None})
+    return opts
+
+def is_output(path):
+    """True for build outputs (site/data/manifest.json, site/data/v/…): never starter files."""
+    rel = path[len("site/data/"):] if path.startswith("site/data/") else None
+    return rel is not None and (rel.startswith(MANIFEST) or rel.startswith(OUT_DIR + "/"))
+
+def sources(config=None):
+    """Repo paths the build shards, when it's enabled."""
+    return [f"site/data/{name}.json" for name in SHARDED] if options(config)["build"] else []
+
+def minify(doc):
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def shard_key(item, by, opts):
+    date = parse_date(item.get("date")) if isinstance(item, dict) else None
+    if date is None:
+        return "undated"
+    return season_of(date, opts["season_start_month"]) if by == "season" else date[:7]
+
+def split(doc, by, lists, opts):
+    """({shard key: {list: [items]}}, other top-level fields) for a sharded document."""
+    shards = {}
+    for name in lists:
+        for item in (doc or {}).get(name) or []:
+            shards.setdefault(shard_key(item, by, opts), {n: [] for n in lists})[name].append(item)
+    meta = {k: v for k, v in (doc or {}).items() if k not in lists and k != "derived_from"}
+    return dict(sorted(shards.items())), meta
+
+class Writer:
+    """Writes hashed files (with compressed copies) under data/v/ and keeps totals."""
+    def __init__(self, data_dir, precompress=True, brotli=True):
+        self.data_dir = data_dir
+        self.precompress = precompress
+        self.brotli = None
+        if precompress and brotli:
+            try:
+                import brotli as _brotli
+                self.brotli = _brotli
+            except ImportError:
+                pass
+        self.stats = {"files": 0, "bytes": 0, "gzip_bytes": 0, "brotli_bytes": 0}
+
+    def write(self, rel, data):
+        path = os.path.join(self.data_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.stats["files"] += 1
+        self.stats["bytes"] += len(data)
+        if not self.precompress or len(data) < MIN_COMPRESS:
+            return
+        copies = [(".gz", "gzip_bytes", gzip.compress(data, 9, mtime=0))]
+        if self.brotli is not None:
+            copies.append((".br", "brotli_bytes", self.brotli.compress(data, quality=11)))
+        for ext, key, packed in copies:
+            if len(packed) < len(data):
+                with open(path + ext, "wb") as f:
+                    f.write(packed)
+                self.stats[key] += len(packed)
+
+    def hashed(self, name, doc):
+        """Site-relative URL of `doc` written as data/v/<name>.<hash>.json."""
+        data = minify(doc)
+        rel = f"{OUT_DIR}/{name}.{hashlib.sha256(data).hexdigest()[:10]}.json"
+        self.write(rel, data)
+        return f"data/{rel}"
+
+def data_files(data_dir):
+    """Logical names (path under data/ without .json) of the data files to hash."""
+    names = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for fn in sorted(files):
+            rel = os.path.relpath(os.path.join(root, fn), data_dir).replace(os.sep, "/")
+            if fn.endswith(".json") and not rel.startswith(SKIP):
+                names.append(rel[:-len(".json")])
+    return names
+
+def build(site_dir, config=None, now=None):
+    """Write data/v/ and data/manifest.json under `site_dir`; returns (manifest, stats)."""
+    opts = options(config)
+    if opts["host"] not in HOSTS:
+        raise ValueError(f"site.build.host must be one of: {', '.join(HOSTS)}")
+    static = opts["host"] == "static"
+    data_dir = os.path.join(site_dir, "data")
+    shutil.rmtree(os.path.join(data_dir, OUT_DIR), ignore_errors=True)
+    w = Writer(data_dir, precompress=static, brotli=opts["brotli"])
+    manifest = {"built": now or datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+                "files": {}, "shards": {}, "meta": {}}
+    for name in data_files(data_dir):
+        with open(os.path.join(data_dir, name + ".json"), "r", encoding="utf-8") as f:
+            try:
+                doc = json.load(f)
+            except ValueError as e:
+                raise ValueError(f"site/data/{name}.json: {e}") from None
+        if name in SHARDED:
+            by, lists = SHARDED[name]
+            shards, meta = split(doc, by, lists, opts)
+            manifest["shards"][name] = {key: w.hashed(f"{name}/{key}", part) for key, part in shards.items()}
+            manifest["meta"][name] = meta
+        else:
+            manifest["files"][name] = w.hashed(name, doc)
+    w.write(MANIFEST, minify(manifest))
+    headers = os.path.join(site_dir, "_headers")
+    if static:
+        with open(headers, "w", encoding="utf-8") as f:
+            f.write(HEADERS)
+    elif os.path.exists(headers):
+        os.remove(headers)
+    return manifest, dict(w.stats, shards=sum(len(s) for s in manifest["shards"].values()),
+                          brotli=w.brotli is not None)
+
+def load_config(path):
+    """The `site.build` section of agent/config.yml, if PyYAML is installed."""
+    try:
+        import yaml
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    except (ImportError, OSError):
+        return {}
+    build_cfg = (data.get("site") or {}).get("build")
+    return dict(build_cfg) if isinstance(build_cfg, dict) else {"build": build_cfg}
+
+def main(argv):
+    def opt(flag, default=None):
+        return argv[argv.index(flag) + 1] if flag in argv else default
+    if not argv or argv[0].startswith("--"):
+        print(__doc__.strip().splitlines()[3].strip())
+        return 2
+    here = os.path.dirname(os.path.abspath(__file__))
+    config = load_config(opt("--config", os.path.join(here, "config.yml")))
+    if "--no-brotli" in argv:
+        config["brotli"] = False
+    if opt("--host"):
+        config["host"] = opt("--host")
+    if not options(config)["build"]:
+        print("site.build is off; nothing to do")
+        return 0
+    manifest, stats = build(argv[0], config)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,256 @@
+# agent/standings.py
+"""
+League table derived from results.json.
+
+results.json holds the club's own results and, optionally, the rest of the league:
+
+    {"results": [{"date": "2025-09-09", "opp": "Borough", "home": true, "score": "2-1"}, …],   # score: ours-theirs
+     "league":  [{"date": "2025-09-09", "home": "Rovers", "away": "Town", "score": "0-3"}, …]} # score: home-away
+
+Results tagged with another "competition" (cups, friendlies) don't count. table.json
+carries a `derived_from` marker (season, rules, length and last entry of each list).
+When the writer passes the results.json the table was derived from and the new one
+only appends to it, just the appended results are parsed and folded into the rows
+they touch. Anything else (an edited or deleted result, a rule change, a new season,
+a hand-edited table) rebuilds the table from the full history. A hand-maintained
+table.json (no marker) is left alone until results.json has a "league" list.
+"""
+import datetime, hashlib, json, re
+
+SCORE = re.compile(r"^\s*(\d+)\s*[-–:]\s*(\d+)\s*$")
+DATE = re.compile(r"^\s*(\d{4})[-/.](\d{1,2})(?:[-/.](\d{1,2}))?")
+COUNTERS = ("p", "w", "d", "l", "gf", "ga", "gd", "pts")
+DEFAULTS = {
+    "team": "Syston Town Tigers",
+    "competition": "League",
+    "season": None,               # e.g. "2025-26"; default: the season of the latest result
+    "season_start_month": 8,
+    "points": {"win": 3, "draw": 1, "loss": 0},
+    "tiebreaks": ["pts", "gd", "gf", "team"],
+    "deductions": {},             # {"Team": 3}
+    "teams": [],                  # listed even before their first match
+}
+# Sort keys for everything but "h2h", which is resolved within tied groups.
+TIEBREAK_KEYS = {
+    "pts": lambda r: -r["pts"],
+    "gd": lambda r: -r["gd"],
+    "gf": lambda r: -r["gf"],
+    "w": lambda r: -r["w"],
+    "ga": lambda r: r["ga"],
+    "team": lambda r: r["team"].lower(),
+}
+
+def options(config=None):
+    opts = dict(DEFAULTS)
+    opts.update({k: v for k, v in (config or {}).items() if v is not None})
+    # config.yml sections arrive frozen (mapping proxies / tuples)
+    opts["points"] = {**DEFAULTS["points"], **dict(opts["points"])}
+    opts["deductions"] = dict(opts["deductions"])
+    opts["tiebreaks"], opts["teams"] = list(opts["tiebreaks"]), list(opts["teams"])
+    unknown = [t for t in opts["tiebreaks"] if t != "h2h" and t not in TIEBREAK_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown tiebreak(s): {', '.join(unknown)}")
+    return opts
+
+def parse_score(score):
+    m = SCORE.match(str(score or ""))
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+def parse_date(value):
+    """
+    "2025-09-09", "2025-9-9", "2025/09/09 15:00" → "2025-09-09" ("2025-09" stays a month);
+    None for anything that isn't a date, so one sloppy row can be skipped, not fail a write.
+    """
+    s = str(value or "").strip()
+    try:
+        return datetime.date.fromisoformat(s[:10]).isoformat()
+    except ValueError:
+        pass
+    m = DATE.match(s)
+    if not m:
+        return None
+    year, month, day = (int(g) if g else None for g in m.groups())
+    try:
+        return datetime.date(year, month, day or 1).isoformat()[:10 if day else 7]
+    except ValueError:
+        return None
+
+def season_of(date, start_month=8):
+    """"2025-09-09" → "2025-26" for an August start; a January start gives "2025". None if no date."""
+    date = parse_date(date)
+    if date is None:
+        return None
+    year, month = int(date[:4]), int(date[5:7])
+    if start_month <= 1:
+        return str(year)
+    start = year if month >= start_month else year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+def _counts(record, opts):
+    competition = record.get("competition")
+    return not competition or str(competition).lower() == str(opts["competition"]).lower()
+
+def _own(record, team):
+    """Own result → (home, away, home_goals, away_goals); the score is from our side."""
+    score, opp = parse_score(record.get("score")), record.get("opp")
+    if not score or not opp:
+        return None
+    ours, theirs = score
+    return (team, opp, ours, theirs) if record.get("home", True) else (opp, team, theirs, ours)
+
+def _other(record):
+    score = parse_score(record.get("score"))
+    if not score or not record.get("home") or not record.get("away"):
+        return None
+    return (record["home"], record["away"], score[0], score[1])
+
+LISTS = ("results", "league")
+
+def parse_matches(own, league, opts):
+    """Raw records → [(season, date, home, away, home_goals, away_goals)] that count, in feed order."""
+    start, team = opts["season_start_month"], opts["team"]
+    out = []
+    for records, parse in ((own, lambda r: _own(r, team)), (league, _other)):
+        for record in records:
+            date = parse_date(record.get("date"))
+            if date is None or not _counts(record, opts):
+                continue
+            match = parse(record)
+            if match:
+                out.append((season_of(date, start), date) + match)
+    return out
+
+def season_matches(results, opts, season=None):
+    """(season, matches) for `season` (default: configured, else the latest one in the feed)."""
+    tagged = parse_matches(*(((results or {}).get(k) or []) for k in LISTS), opts)
+    season = season or opts["season"] or max((m[0] for m in tagged), default=None)
+    return season, [m[1:] for m in tagged if m[0] == season]
+
+def tail_digest(lists):
+    last = [records[-1] if records else None for records in lists]
+    return hashlib.sha1(json.dumps(last, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def appended_from(lists, previous, marker):
+    """
+    Where the unseen records start in each list, if the table's marker matches `previous`
+    and `lists` only extend it; else None. The prefix check is a plain list comparison.
+    """
+    if previous is None:
+        return None
+    before = [(previous or {}).get(k) or [] for k in LISTS]
+    seen = [marker.get(k) for k in LISTS]
+    if seen != [len(b) for b in before] or marker.get("tail") != tail_digest(before):
+        return None
+    if any(len(now) < len(b) or now[:len(b)] != b for now, b in zip(lists, before)):
+        return None
+    return seen
+
+def rules_digest(opts):
+    rules = {k: opts[k] for k in ("team", "competition", "season", "season_start_month",
+                                  "points", "tiebreaks", "deductions", "teams")}
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+class Table:
+    def __init__(self, opts, rows=()):
+        self.points = opts["points"]
+        self.rows = {r["team"]: {"team": r["team"], **{k: r.get(k, 0) for k in COUNTERS}} for r in rows}
+
+    def row(self, team):
+        r = self.rows.get(team)
+        if r is None:
+            r = self.rows[team] = {"team": team, **{k: 0 for k in COUNTERS}}
+        return r
+
+    def add(self, home, away, hg, ag):
+        """Fold one result into the two rows it touches."""
+        for team, gf, ga in ((home, hg, ag), (away, ag, hg)):
+            r = self.row(team)
+            outcome = "w" if gf > ga else "d" if gf == ga else "l"
+            r["p"] += 1
+            r[outcome] += 1
+            r["gf"] += gf
+            r["ga"] += ga
+            r["gd"] = r["gf"] - r["ga"]
+            r["pts"] += self.points[{"w": "win", "d": "draw", "l": "loss"}[outcome]]
+
+    def ranked(self, tiebreaks, matches):
+        """Rows in table order; `matches()` (the season's matches) is only called for head-to-head ties."""
+        if "h2h" not in tiebreaks:
+            return sorted(self.rows.values(), key=_key(tiebreaks))
+        cut = tiebreaks.index("h2h")
+        before, after = _key(tiebreaks[:cut]), _key(tiebreaks[cut + 1:])
+        rows = sorted(self.rows.values(), key=before)
+        out, i, played = [], 0, None
+        while i < len(rows):
+            j = i + 1
+            while j < len(rows) and before(rows[j]) == before(rows[i]):
+                j += 1
+            group = rows[i:j]
+            if len(group) > 1:
+                played = matches() if played is None else played
+                mini = head_to_head({r["team"] for r in group}, played, self.points)
+                group.sort(key=lambda r: (mini[r["team"]], after(r)))
+            out.extend(group)
+            i = j
+        return out
+
+def _key(tiebreaks):
+    keys = [TIEBREAK_KEYS[t] for t in tiebreaks]
+    return lambda r: tuple(k(r) for k in keys)
+
+def head_to_head(teams, matches, points):
+    """{team: sort key} from the matches played among `teams` only (points, gd, gf)."""
+    mini = Table({"points": points}, [{"team": t} for t in teams])
+    for _date, home, away, hg, ag in matches:
+        if home in teams and away in teams:
+            mini.add(home, away, hg, ag)
+    return {t: (-r["pts"], -r["gd"], -r["gf"]) for t, r in mini.rows.items()}
+
+def derive_table(results, table=None, config=None, previous=None):
+    """
+    The table.json document for `results` (a results.json document). `table` is the
+    current table.json and `previous` the results.json it should have been derived
+    from; see the module docstring for when only the new results are applied.
+    Returns `table` itself when there is nothing new.
+    """
+    opts = options(config)
+    rules = rules_digest(opts)
+    marker = (table or {}).get("derived_from") or {}
+    lists = [(results or {}).get(k) or [] for k in LISTS]
+    if (table or {}).get("rows") and not marker and not lists[1]:
+        # A hand-maintained table is only taken over once results.json has the rest of the
+        # league: from our own results alone every other team would show one game.
+        return table
+    seen = appended_from(lists, previous, marker) if marker.get("rules") == rules else None
+    season = marker.get("season")
+    if seen is not None:
+        new = parse_matches(lists[0][seen[0]:], lists[1][seen[1]:], opts)
+        if season is None or (not opts["season"] and any(m[0] > season for m in new)):
+            seen = None                       # first result of a new season
+        elif not any(m[0] == season for m in new):
+            if seen == [len(records) for records in lists]:
+                return table
+            # Only cup games or older seasons were added: same rows, the marker moves on.
+            return dict(table, derived_from=dict(marker, results=len(lists[0]), league=len(lists[1]),
+                                                 tail=tail_digest(lists)))
+        else:
+            tab = Table(opts, table.get("rows") or [])
+            new = [m[1:] for m in new if m[0] == season]
+    if seen is None:
+        season, new = season_matches(results, opts)
+        tab = Table(opts)
+        for team in [opts["team"], *opts["teams"]]:
+            tab.row(team)
+        for team, pts in opts["deductions"].items():
+            tab.row(team)["pts"] -= int(pts)
+    for _date, home, away, hg, ag in new:
+        tab.add(home, away, hg, ag)
+
+    return {
+        "updated": datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+        "season": season,
+        # Head-to-head only needs the season's matches when there is a tie to break.
+        "rows": tab.ranked(opts["tiebreaks"], lambda: season_matches(results, opts, season)[1]),
+        "derived_from": {"source": "site/data/results.json", "season": season, "rules": rules,
+                         "results": len(lists[0]), "league": len(lists[1]), "tail": tail_digest(lists)},
+    }
@@ -0,0 +1,29 @@
+// Site data through data/manifest.json (written at deploy by agent/sitebuild.py).
+// The manifest maps logical names ("table", "players/smith") to content-hashed files and
+// lists the shards of results (per season) and fixtures (per month). Hashed files never
+// change, so the browser cache keeps them; only the manifest is revalidated on each load.
+// Without a manifest (a local checkout) the plain data/<name>.json files are used.
+const siteData = (() => {
+  let manifest = null;
+  const json = url => fetch(url).then(r => r.json());
+  const load = () => manifest = manifest ||
+    fetch('data/manifest.json', {cache: 'no-cache'}).then(r => r.ok ? r.json() : {}).catch(() => ({}));
+
+  async function get(name) {
+    const m = await load();
+    return json((m.files && m.files[name]) || `data/${name}.json`);
+  }
+
+  // {list: [items]} merged from the shards whose key passes `keep` (e.g. one season).
+  async function shards(name, keep = () => true) {
+    const m = await load();
+    const parts = m.shards && m.shards[name];
+    if (!parts) return json(`data/${name}.json`);
+    const docs = await Promise.all(Object.keys(parts).filter(keep).map(k => json(parts[k])));
+    const out = Object.assign({}, (m.meta || {})[name]);
+    docs.forEach(doc => Object.entries(doc).forEach(([k, v]) => out[k] = (out[k] || []).concat(v)));
+    return out;
+  }
+
+  return {get, shards, manifest: load};
+})();